@@ -1,40 +1,13 @@
 // State management
 import { useState, useCallback } from "react";
 
+// The chat endpoints need the session token from login
+import { authHeaders, storeRenewedToken } from "../Login_Signup/sessionToken";
+
 // Import the backend url 
 const SERVER_URL = import.meta.env.VITE_SERVER_URL;
 
 
-// In order to display the buttons from VF responses need to extract them from the json first
-const extractButtons = (traces) => {
-    // Check if traces is an array and default to empty if not
-    const list = Array.isArray(traces) ? traces : [];
-    const out = [];
-    
-    // Loop through each trace to find choice traces
-    for (const t of list) {
-        // Only process traces of type choice
-        if (t?.type !== "choice") continue;
-        const p = t.payload || {};
-
-        // Set each button to the buttons array
-        const buttons = 
-            (Array.isArray(p.buttons) && p.buttons) ||
-            [];
-
-        // Extract button data from the array
-        for (const b of buttons) {
-            out.push({
-                label: b.name || b.request?.payload?.label,  // Display text for the button
-                value: b.request?.payload?.label || b.name   // Value sent when button is clicked
-            });
-        } 
-    }
-    return out;
-};
-
-
-
 // Hook for interacting with Voiceflow Dialog Manager API
 // Sends user messages, launches the flow, and resets it
 export default function useVoiceflow () {
@@ -52,23 +25,24 @@ export default function useVoiceflow () {
         setError("");
 
         try {
-           // Send POST request to with user ID and message to voiceflow
+           // Send POST request with the message to voiceflow, the server knows the user from the session token
            const res = await fetch(`${SERVER_URL}/voiceflow/interact`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ user_email: email, message: text }),
+                headers: authHeaders(),
+                body: JSON.stringify({ message: text }),
             });
+            storeRenewedToken(res);
         
             // Parse response and handle result
             const data = await res.json();
 
             // Log response for error handling
             console.log(data.messages)
-            console.log(data.raw?.[4]?.payload?.buttons)
+            console.log(data.buttons)
 
-            // Extract messages and buttons from response
+            // Messages and buttons are extracted from the voiceflow traces by the server
             const messages  = Array.isArray(data.messages) ? data.messages: [];
-            const buttons = extractButtons(data.raw);
+            const buttons = Array.isArray(data.buttons) ? data.buttons: [];
 
             return { messages, buttons } ; // Return messages and buttons
 
@@ -92,9 +66,10 @@ export default function useVoiceflow () {
             // Send launch request to backend
             const res = await fetch(`${SERVER_URL}/voiceflow/interact`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ user_email: email, launch: true }),
+                headers: authHeaders(),
+                body: JSON.stringify({ launch: true }),
             }); 
+            storeRenewedToken(res);
 
             const data = await res.json();
             
@@ -124,11 +99,12 @@ export default function useVoiceflow () {
 
         try {
             // Send reset request to backend
-            await fetch(`${SERVER_URL}/voiceflow/reset`, {
+            const res = await fetch(`${SERVER_URL}/voiceflow/reset`, {
                 method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify({ user_email: email }),
+                headers: authHeaders(),
+                body: JSON.stringify({}),
               })
+            storeRenewedToken(res);
         } catch (e) {
             setError(e.message || "Voiceflow request failed");
             throw e;
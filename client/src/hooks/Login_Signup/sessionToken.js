@@ -0,0 +1,21 @@
+// The signed session token from /mongo_user/authentication is kept for the browser tab
+// The chat endpoints need it in the Authorization header, the server sends a renewed one in X-Session-Token when it's getting old
+const TOKEN_KEY = "session_token";
+
+export const getSessionToken = () => sessionStorage.getItem(TOKEN_KEY);
+
+export const setSessionToken = (token) => sessionStorage.setItem(TOKEN_KEY, token);
+
+export const clearSessionToken = () => sessionStorage.removeItem(TOKEN_KEY);
+
+// Headers for a JSON request to an endpoint that needs a logged in user
+export const authHeaders = () => ({
+    "Content-Type": "application/json",
+    Authorization: `Bearer ${getSessionToken()}`,
+});
+
+// Keep the renewed token if the server sent one back
+export const storeRenewedToken = (res) => {
+    const renewed = res.headers.get("X-Session-Token");
+    if (renewed) setSessionToken(renewed);
+};
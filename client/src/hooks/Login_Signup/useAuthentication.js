@@ -1,6 +1,9 @@
 // State management
 import { useState } from "react";
 
+// Session token storage
+import { setSessionToken, clearSessionToken } from "./sessionToken";
+
 // Import the backend url 
 const SERVER_URL = import.meta.env.VITE_SERVER_URL;
 
@@ -19,7 +22,8 @@ export default function authentication() {
     const res = await fetch(`${SERVER_URL}/mongo_user/authentication`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ user_email: email, user_password: password }),
+      // The browser's time zone so the daily grammar reset happens at the user's midnight
+      body: JSON.stringify({ user_email: email, user_password: password, time_zone: Intl.DateTimeFormat().resolvedOptions().timeZone }),
     });
 
     // Parse response and handle result
@@ -27,14 +31,18 @@ export default function authentication() {
     console.log(data.message)
 
     if (data.success) {
+        setSessionToken(data.token); // Keep the session token for the chatbot requests
         setIsAuthenticated(true); // Set authenicated to true if successful
     } else {
         throw new Error(data.message); // Throw error for failed login
     }
   };
 
-  // Set isAuthenticated state to false so user has a way to log out
-  const logout = () => setIsAuthenticated(false);
+  // Set isAuthenticated state to false and forget the session token so user has a way to log out
+  const logout = () => {
+    clearSessionToken();
+    setIsAuthenticated(false);
+  };
 
   return { isAuthenticated, login, logout };
 }
\ No newline at end of file
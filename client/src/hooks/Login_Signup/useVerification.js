@@ -25,6 +25,8 @@ export default function verification() {
             payload.user_password = password;
         if (name)
             payload.user_name = name;
+        // The browser's time zone so the daily grammar reset happens at the user's midnight
+        payload.time_zone = Intl.DateTimeFormat().resolvedOptions().timeZone;
 
         // Send verification request to backend
         const res = await fetch (`${SERVER_URL}/mongo_user/verification`, {
@@ -2,6 +2,8 @@
  * This file is written in typescipt as that is the language required by Railway in order to create CRON job
  * In Railway create a new function and paste the following code as the source code for that function
  * You also need to provide the backend url as a variable for the function
+ * When the server runs with GRAMMAR_ROLLOVER=TRUE it resets every user at midnight in their own time zone, remove this cron job then
+ * or users will be reset twice
 */
 
 // Get the backend URL in order to run the API call
@@ -0,0 +1,84 @@
+from quart import Quart
+from quart_cors import cors
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from werkzeug.exceptions import HTTPException
+import os
+
+# Import the async API endpoints
+from mongo.async_mongo_users import async_mongo_user
+from mongo.async_mongo_grammar import async_mongo_grammar
+from voiceflow.async_voiceflow import async_voiceflow
+from mongo.async_mongo_client import close_async_client
+from voiceflow.async_voiceflow_client import async_voiceflow_client
+from metrics.metrics import init_async_metrics
+
+# The Flask app still serves every endpoint that doesn't have an async version yet (signup, verification, stats...)
+from main import app as flask_app
+
+
+# ASGI entry point, run it with a production ASGI server from the app directory:
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+# Requests for the async endpoints are handled on the event loop, anything else is passed to the Flask app
+
+# Need to create a new instance of the Quart class
+async_app = Quart(__name__)
+
+# Enable CORS with specific methods
+async_app = cors(async_app, allow_origin="*", allow_headers=["Content-Type", "Authorization"], allow_methods=['GET', 'POST', 'PATCH', 'PUT', 'DELETE'], expose_headers=["X-Session-Token", "Retry-After"])
+
+# Register all the imported async endpoints under the same prefixes as the Flask app
+async_app.register_blueprint(async_mongo_user, url_prefix="/mongo_user")
+async_app.register_blueprint(async_mongo_grammar, url_prefix="/mongo_grammar")
+async_app.register_blueprint(async_voiceflow, url_prefix="/voiceflow")
+
+# Time every async request, they show up in the Flask app's /metrics since both apps share the same process
+init_async_metrics(async_app)
+
+
+# Close the shared async clients when a worker shuts down
+@async_app.after_serving
+async def close_clients():
+    await async_voiceflow_client.close()
+    close_async_client()
+
+
+# asgiref runs every WSGI request on one shared thread, so the Flask requests wait on each other and a request started
+# from the context of another one fails with "Single thread executor already being used, would deadlock"
+# Flask handles requests on any thread, so each one is run on the event loop's thread pool instead
+class ThreadPoolWsgiInstance(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func, thread_sensitive=False)
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+# Flask runs in a thread pool behind the ASGI adapter
+wsgi_fallback = ThreadPoolWsgiToAsgi(flask_app)
+
+
+# Check if the async app has a route for the request
+def has_async_route(scope):
+    adapter = async_app.url_map.bind("localhost")
+    try:
+        adapter.match(scope["path"], method=scope["method"])
+        return True
+    except HTTPException:
+        return False
+
+
+# Send lifespan events and requests with an async route to the Quart app, everything else to Flask
+async def app(scope, receive, send):
+    if scope["type"] == "http" and not has_async_route(scope):
+        await wsgi_fallback(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
+
+
+# Run with uvicorn directly, the number of worker processes comes from WEB_CONCURRENCY
+if __name__ == "__main__":
+    import uvicorn
+    port = int(os.environ.get('PORT', 5000))
+    workers = int(os.environ.get('WEB_CONCURRENCY', 4))
+    uvicorn.run("asgi:app", host="0.0.0.0", port=port, workers=workers)
@@ -0,0 +1,36 @@
+from flask import jsonify, request
+from dotenv import load_dotenv
+from functools import wraps
+import hmac
+import os
+
+
+# Load environment variables
+load_dotenv()
+
+# Shared secret for the maintenance endpoints (cache invalidation, question bank reload), sent in the X-Admin-Secret header
+# Without ADMIN_SECRET the endpoints are turned off, so nobody can force reloads on a server that wasn't given one
+ADMIN_SECRET = os.getenv("ADMIN_SECRET")
+ADMIN_SECRET_HEADER = "X-Admin-Secret"
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Check a secret sent by a client against ADMIN_SECRET in constant time
+def is_admin_secret(secret):
+    return bool(ADMIN_SECRET and secret) and hmac.compare_digest(secret.encode(), ADMIN_SECRET.encode())
+
+# Decorator for the maintenance endpoints, requests without the admin secret get a 403
+def require_admin(endpoint):
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_SECRET:
+            return jsonify({"success": False, "message": "Admin endpoints are turned off, set ADMIN_SECRET to use them."}), 403
+        if not is_admin_secret(request.headers.get(ADMIN_SECRET_HEADER)):
+            return jsonify({"success": False, "message": f"A valid {ADMIN_SECRET_HEADER} header is required."}), 403
+        return endpoint(*args, **kwargs)
+    return wrapper
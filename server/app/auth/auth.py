@@ -3,40 +3,58 @@ import os
 import random
 import resend
 
+# Background queue that sends the emails
+from auth.email_queue import queue_email
+from metrics.metrics import time_outbound
+
 
 # Load environment variables
 load_dotenv()
 
 resend.api_key = os.environ["RESEND_API_KEY"]
+resend.api_url = os.getenv("RESEND_API_URL", resend.api_url)
+
 
 # Generate a random 6 digit number to use as the OTP number
 def generate_OTP():
     return str(random.randint(100000, 999999))
 
 
+# Build the Resend parameters of the email with the OTP code included
+def build_OTP_email(user_email, otp_code):
+    # The html code to generate the body of the email
+    html = f"""
+        <div>
+            <h2>Email Verification</h2>
+            <p>Hello! Your verification code is:</p>
+            <div>{otp_code}</div>
+            <p>If you didn't request this, please ignore this email.</p>
+        </div>
+        """
+
+    # Resend parameters for sending emails
+    params: resend.Emails.SendParams = {
+        "from": "OSSLT Prep <alex@trystudyagent.com>",
+        "to": [user_email],
+        "subject": "Email Verification Code",
+        "html": html,
+    }
+    return params
+
+
+# Queue the email with the OTP code, it's sent in the background by the email queue workers
+def queue_OTP_email(user_email, otp_code):
+    return queue_email(build_OTP_email(user_email, otp_code))
+
+
 # Send an email to the users email with the OTP code included
 def send_OTP_email(user_email, otp_code):
     try:
-        # The html code to generate the body of the email
-        html = f"""
-            <div>
-                <h2>Email Verification</h2>
-                <p>Hello! Your verification code is:</p>
-                <div>{otp_code}</div>
-                <p>If you didn't request this, please ignore this email.</p>
-            </div>
-            """
-
-        # Resend parameters for sending emails
-        params: resend.Emails.SendParams = {
-            "from": "OSSLT Prep <alex@trystudyagent.com>",
-            "to": [user_email],
-            "subject": "Email Verification Code",
-            "html": html,
-        }
-
-        # Resend email sending function
-        email = resend.Emails.send(params)
+        params = build_OTP_email(user_email, otp_code)
+
+        # Resend email sending function, timed for /metrics
+        with time_outbound("resend", "send"):
+            email = resend.Emails.send(params)
 
         # Print email queued  and return true if success
         print(f"Email has been queued {email}")
@@ -0,0 +1,168 @@
+from dotenv import load_dotenv
+from metrics.metrics import time_outbound
+import os
+import queue
+import threading
+import time
+import resend
+
+
+# Load environment variables
+load_dotenv()
+
+# Outbound emails are handed to a pool of worker threads so endpoints don't wait on the Resend API
+# All of the settings can be changed with environment variables
+EMAIL_QUEUE_WORKERS = int(os.getenv("EMAIL_QUEUE_WORKERS", 2))
+EMAIL_QUEUE_MAX_SIZE = int(os.getenv("EMAIL_QUEUE_MAX_SIZE", 10000))
+EMAIL_BATCH_SIZE = min(int(os.getenv("EMAIL_BATCH_SIZE", 50)), 100)  # Resend accepts up to 100 emails per batch
+EMAIL_BATCH_WAIT = float(os.getenv("EMAIL_BATCH_WAIT", 0.05))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 4))
+EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", 1.0))
+
+email_queue = queue.Queue(maxsize=EMAIL_QUEUE_MAX_SIZE)
+
+# Workers are started on the first email, the pid is saved so a forked worker server starts its own
+email_workers_lock = threading.Lock()
+email_workers = {"pid": None}
+
+email_stats_lock = threading.Lock()
+email_stats = {
+    "queued": 0,
+    "sent": 0,
+    "failed": 0,
+    "dropped": 0,
+    "retries": 0,
+    "batches": 0,
+    "batch_failures": 0,
+    "single_sends": 0,
+    "send_seconds_total": 0.0,
+    "send_seconds_max": 0.0,
+    "queue_wait_seconds_total": 0.0
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Add an email to the queue, returns False if the queue is full and the email was dropped
+def queue_email(params):
+    start_email_workers()
+    try:
+        email_queue.put_nowait({"params": params, "attempts": 0, "queued_at": time.monotonic()})
+    except queue.Full:
+        with email_stats_lock:
+            email_stats["dropped"] += 1
+        print(f"Email queue is full, dropped email to {params.get('to')}")
+        return False
+
+    with email_stats_lock:
+        email_stats["queued"] += 1
+    return True
+
+# Start the worker threads if they aren't running in this process yet
+def start_email_workers():
+    pid = os.getpid()
+    if email_workers["pid"] == pid:
+        return
+    with email_workers_lock:
+        if email_workers["pid"] != pid:
+            for i in range(EMAIL_QUEUE_WORKERS):
+                threading.Thread(target=email_worker, name=f"email-worker-{i}", daemon=True).start()
+            email_workers["pid"] = pid
+
+# Take the next email plus any others that arrive shortly after it, up to the batch size
+def next_email_batch():
+    batch = [email_queue.get()]
+    deadline = time.monotonic() + EMAIL_BATCH_WAIT
+    while len(batch) < EMAIL_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        try:
+            batch.append(email_queue.get(timeout=remaining) if remaining > 0 else email_queue.get_nowait())
+        except queue.Empty:
+            break
+    return batch
+
+# Send one email on its own or several with the batch API, timed for /metrics
+def send_email_batch(batch):
+    if len(batch) == 1:
+        with time_outbound("resend", "send"):
+            resend.Emails.send(batch[0]["params"])
+    else:
+        with time_outbound("resend", "batch_send"):
+            resend.Batch.send([a["params"] for a in batch])
+
+# Put an email back on the queue after its backoff has passed
+def retry_email(item):
+    try:
+        email_queue.put_nowait(item)
+    except queue.Full:
+        with email_stats_lock:
+            email_stats["dropped"] += 1
+
+# Send emails and count them as sent, raises if the send fails
+def send_and_record(items):
+    start = time.monotonic()
+    send_email_batch(items)
+    elapsed = time.monotonic() - start
+
+    with email_stats_lock:
+        email_stats["sent"] += len(items)
+        email_stats["batches" if len(items) > 1 else "single_sends"] += 1
+        email_stats["send_seconds_total"] += elapsed
+        email_stats["send_seconds_max"] = max(email_stats["send_seconds_max"], elapsed)
+        email_stats["queue_wait_seconds_total"] += sum(start - a["queued_at"] for a in items)
+
+# Count a failed attempt of one email and retry it with exponential backoff, or give up after EMAIL_MAX_ATTEMPTS
+def email_failed(item, error):
+    print(f"Error sending email to {item['params'].get('to')}: {error}")
+    item["attempts"] += 1
+    if item["attempts"] >= EMAIL_MAX_ATTEMPTS:
+        with email_stats_lock:
+            email_stats["failed"] += 1
+        print(f"Giving up on email to {item['params'].get('to')} after {item['attempts']} attempts")
+    else:
+        with email_stats_lock:
+            email_stats["retries"] += 1
+        backoff = EMAIL_RETRY_BACKOFF * 2 ** (item["attempts"] - 1)
+        timer = threading.Timer(backoff, retry_email, args=(item,))
+        timer.daemon = True
+        timer.start()
+
+# Worker loop, sends batches and retries failed emails
+def email_worker():
+    while True:
+        batch = next_email_batch()
+        try:
+            try:
+                send_and_record(batch)
+            except Exception as e:
+                if len(batch) == 1:
+                    email_failed(batch[0], e)
+                    continue
+
+                # One bad email fails the whole batch, so send each on its own and only the ones that fail use up attempts
+                print(f"Error sending batch of {len(batch)} emails, sending them one at a time: {e}")
+                with email_stats_lock:
+                    email_stats["batch_failures"] += 1
+                for item in batch:
+                    try:
+                        send_and_record([item])
+                    except Exception as item_error:
+                        email_failed(item, item_error)
+
+        finally:
+            for _ in batch:
+                email_queue.task_done()
+
+# Queue depth, send latency and failure counters
+def get_email_queue_stats():
+    with email_stats_lock:
+        stats = dict(email_stats)
+    stats["depth"] = email_queue.qsize()
+    stats["workers"] = EMAIL_QUEUE_WORKERS
+    sends = stats["batches"] + stats["single_sends"]
+    stats["send_seconds_avg"] = stats["send_seconds_total"] / sends if sends else 0.0
+    return stats
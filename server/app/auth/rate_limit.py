@@ -0,0 +1,150 @@
+from flask import jsonify, request
+from dotenv import load_dotenv
+from collections import OrderedDict
+from functools import wraps
+import math
+import os
+import threading
+import time
+
+
+# Load environment variables
+load_dotenv()
+
+# Admission control for the endpoints that write to the DB and send emails for anyone who asks (signup, resend_otp, verification)
+# Every request takes a token from a bucket for its email and one for its client IP, a bucket refills at a steady rate up to its burst size
+# On top of that only a fixed number of these requests are handled at once, anything over the limits gets a 429 with Retry-After
+# All of the settings can be changed with environment variables
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT", "TRUE").upper() == "TRUE"
+RATE_LIMIT_EMAIL_BURST = float(os.getenv("RATE_LIMIT_EMAIL_BURST", 5))
+RATE_LIMIT_EMAIL_PER_MINUTE = float(os.getenv("RATE_LIMIT_EMAIL_PER_MINUTE", 3))
+RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", 20))
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", 20))
+RATE_LIMIT_MAX_CONCURRENT = int(os.getenv("RATE_LIMIT_MAX_CONCURRENT", 8))
+
+# Most buckets kept in memory, the least recently used are dropped first (a dropped bucket starts full again)
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 10000))
+
+# Number of proxies in front of the server that add to X-Forwarded-For (Railway adds one)
+RATE_LIMIT_PROXY_COUNT = int(os.getenv("RATE_LIMIT_PROXY_COUNT", 1))
+
+rate_limit_lock = threading.Lock()
+# (kind, email or IP) -> [tokens left, when it was last refilled]
+rate_limit_buckets = OrderedDict()
+rate_limit_slots = threading.BoundedSemaphore(RATE_LIMIT_MAX_CONCURRENT)
+rate_limit_stats = {
+    "allowed": 0,
+    "rejected_email": 0,
+    "rejected_ip": 0,
+    "rejected_concurrency": 0,
+    "evictions": 0,
+    "in_flight": 0
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Client IP as seen by the last trusted proxy, the entries before it in X-Forwarded-For can be made up by the client
+def client_ip():
+    route = request.access_route
+    if RATE_LIMIT_PROXY_COUNT and request.headers.get("X-Forwarded-For") and len(route) >= RATE_LIMIT_PROXY_COUNT:
+        return route[-RATE_LIMIT_PROXY_COUNT]
+    return request.remote_addr
+
+# Email from the request body, normalised so case and spaces can't be used to get a fresh bucket
+def request_email():
+    data = request.get_json(silent=True) or {}
+    email = data.get("user_email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+# Refill a bucket for the time since it was last used, new keys start with a full bucket
+def refill_bucket(key, burst, per_minute, now):
+    bucket = rate_limit_buckets.get(key)
+    if bucket is None:
+        bucket = [burst, now]
+        rate_limit_buckets[key] = bucket
+        while len(rate_limit_buckets) > RATE_LIMIT_MAX_KEYS:
+            rate_limit_buckets.popitem(last=False)
+            rate_limit_stats["evictions"] += 1
+    else:
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * per_minute / 60)
+        bucket[1] = now
+        rate_limit_buckets.move_to_end(key)
+    return bucket
+
+# Take a token from every bucket in limits if they all have one
+# limits is a list of (kind, key, burst, per_minute), returns 0 if the request is allowed, otherwise the seconds until it would be
+def take_tokens(limits):
+    now = time.monotonic()
+    with rate_limit_lock:
+        buckets = [(kind, refill_bucket(key, burst, per_minute, now), per_minute) for kind, key, burst, per_minute in limits]
+        waits = [(kind, (1 - bucket[0]) * 60 / per_minute) for kind, bucket, per_minute in buckets if bucket[0] < 1]
+        if waits:
+            kind, wait = max(waits, key=lambda w: w[1])
+            rate_limit_stats[f"rejected_{kind}"] += 1
+            return wait
+
+        for _, bucket, _ in buckets:
+            bucket[0] -= 1
+        rate_limit_stats["allowed"] += 1
+        return 0
+
+# 429 response telling the client when to try again
+def too_many_requests(wait):
+    retry_after = max(1, math.ceil(wait))
+    response = jsonify({
+        "success": False,
+        "message": f"Too many requests, please try again in {retry_after} seconds."
+    })
+    response.status_code = 429
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+# Decorator for the Flask endpoints that need admission control, runs before the endpoint does any DB or email work
+def rate_limited(endpoint):
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        if not RATE_LIMIT_ENABLED:
+            return endpoint(*args, **kwargs)
+
+        # Turn requests away straight away when too many are already being handled
+        if not rate_limit_slots.acquire(blocking=False):
+            with rate_limit_lock:
+                rate_limit_stats["rejected_concurrency"] += 1
+            return too_many_requests(1)
+
+        try:
+            limits = [("ip", ("ip", client_ip()), RATE_LIMIT_IP_BURST, RATE_LIMIT_IP_PER_MINUTE)]
+            email = request_email()
+            if email:
+                limits.append(("email", ("email", email), RATE_LIMIT_EMAIL_BURST, RATE_LIMIT_EMAIL_PER_MINUTE))
+
+            wait = take_tokens(limits)
+            if wait:
+                return too_many_requests(wait)
+
+            with rate_limit_lock:
+                rate_limit_stats["in_flight"] += 1
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                with rate_limit_lock:
+                    rate_limit_stats["in_flight"] -= 1
+        finally:
+            rate_limit_slots.release()
+    return wrapper
+
+# Counters of the rate limiter for the stats endpoint
+def get_rate_limit_stats():
+    with rate_limit_lock:
+        return dict(
+            rate_limit_stats,
+            enabled=RATE_LIMIT_ENABLED,
+            buckets=len(rate_limit_buckets),
+            max_buckets=RATE_LIMIT_MAX_KEYS,
+            max_concurrent=RATE_LIMIT_MAX_CONCURRENT
+        )
@@ -0,0 +1,109 @@
+from flask import g, jsonify, make_response, request
+from dotenv import load_dotenv
+from functools import wraps
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+
+
+# Load environment variables
+load_dotenv()
+
+# Signed session tokens issued by /mongo_user/authentication
+# A token is the base64 encoded claims (email, verified, expiry) followed by an HMAC-SHA256 of them,
+# so checking one is a hash in memory instead of a DB lookup
+# Every worker needs the same SESSION_TOKEN_SECRET, a token issued by one worker is rejected by the others if their secrets differ
+# A random secret is only used without it in development (SESSION_TOKEN_DEV=TRUE) or with a single worker (WEB_CONCURRENCY=1),
+# anywhere else the server refuses to start instead of logging users out whenever a request lands on another worker
+SESSION_TOKEN_SECRET = os.getenv("SESSION_TOKEN_SECRET")
+SESSION_TOKEN_DEV = os.getenv("SESSION_TOKEN_DEV", "FALSE").upper() == "TRUE"
+if not SESSION_TOKEN_SECRET:
+    if not SESSION_TOKEN_DEV and os.getenv("WEB_CONCURRENCY") != "1":
+        raise RuntimeError("SESSION_TOKEN_SECRET is not set, set it to the same long random string for every worker (or SESSION_TOKEN_DEV=TRUE when developing)")
+    print("WARNING: SESSION_TOKEN_SECRET is not set, using a random secret so session tokens only work in this worker")
+    SESSION_TOKEN_SECRET = secrets.token_hex(32)
+SESSION_TOKEN_KEY = SESSION_TOKEN_SECRET.encode()
+
+# How long a token is valid for in seconds
+SESSION_TOKEN_TTL = int(os.getenv("SESSION_TOKEN_TTL", 3600))
+
+# Once a token is past half its lifetime a renewed one is sent back in this response header
+SESSION_TOKEN_HEADER = "X-Session-Token"
+
+UNAUTHORIZED_MESSAGE = "A valid session token is required, please log in again."
+
+
+# Base64 without padding so tokens are safe in headers
+def b64encode(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def sign(payload):
+    return hmac.new(SESSION_TOKEN_KEY, payload.encode(), hashlib.sha256).digest()
+
+
+# Create a token for a user that just logged in
+def issue_session_token(user_email, verified):
+    claims = {
+        "email": user_email,
+        "verified": bool(verified),
+        "exp": int(time.time()) + SESSION_TOKEN_TTL
+    }
+    payload = b64encode(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{b64encode(sign(payload))}"
+
+
+# Check a token's signature and expiry, returns its claims or None if it isn't valid
+def verify_session_token(token):
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(b64decode(signature), sign(payload)):
+            return None
+        claims = json.loads(b64decode(payload))
+    except (AttributeError, ValueError):
+        # Malformed tokens fail to split, decode or parse
+        return None
+
+    if not isinstance(claims, dict) or not isinstance(claims.get("email"), str):
+        return None
+    if claims.get("exp", 0) <= time.time():
+        return None
+    return claims
+
+
+# Get the claims of the bearer token in an Authorization header, None if it's missing or not valid
+def session_from_authorization(header):
+    if not header or not header.startswith("Bearer "):
+        return None
+    return verify_session_token(header[len("Bearer "):].strip())
+
+
+# A renewed token for a session that's past half its lifetime, otherwise None
+def renewed_session_token(claims):
+    if claims["exp"] - time.time() < SESSION_TOKEN_TTL / 2:
+        return issue_session_token(claims["email"], claims["verified"])
+    return None
+
+
+# Decorator for Flask endpoints that need a logged in user
+# The token's claims are put in g.session, requests without a valid token from a verified user get a 401
+def require_session(endpoint):
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        claims = session_from_authorization(request.headers.get("Authorization"))
+        if claims is None or not claims.get("verified"):
+            return jsonify({"success": False, "message": UNAUTHORIZED_MESSAGE}), 401
+
+        g.session = claims
+        response = make_response(endpoint(*args, **kwargs))
+        renewed = renewed_session_token(claims)
+        if renewed:
+            response.headers[SESSION_TOKEN_HEADER] = renewed
+        return response
+    return wrapper
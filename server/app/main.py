@@ -1,16 +1,23 @@
-from flask import Flask
+from flask import Flask, Response, jsonify
 from flask_cors import CORS
 
 # Import all API endpoints
 from mongo.mongo_users import mongo_user
 from mongo.mongo_grammar import mongo_grammar
 from voiceflow.voiceflow import voiceflow
+from mongo.mongo_client import get_pool_stats
+from auth.email_queue import get_email_queue_stats
+from auth.rate_limit import get_rate_limit_stats
+from metrics.metrics import init_metrics, render_metrics
+from mongo.indexes import verify_indexes_on_startup
+from mongo.grammar_rollover import get_rollover_stats, start_rollover_scheduler
+import threading
 
 # Need to create a new instance of the Flask class
 app = Flask(__name__)
 
 # Enable CORS with specific methods
-CORS(app, methods=['GET', 'POST', 'PATCH', 'PUT', 'DELETE'])
+CORS(app, methods=['GET', 'POST', 'PATCH', 'PUT', 'DELETE'], expose_headers=['X-Session-Token', 'Retry-After'])
 
 
 
@@ -19,6 +26,62 @@ app.register_blueprint(mongo_user, url_prefix="/mongo_user")
 app.register_blueprint(mongo_grammar, url_prefix="/mongo_grammar")
 app.register_blueprint(voiceflow, url_prefix="/voiceflow")
 
+# Time every request and count the MongoDB commands it sends
+init_metrics(app)
+
+
+# Connection pool statistics of the MongoClient shared by all the blueprints
+@app.route("/mongo_pool_stats", methods=["GET"])
+def mongo_pool_stats():
+    return jsonify({
+        "success": True,
+        "pool": get_pool_stats()
+    }), 200
+
+
+# Depth, send latency and failure counters of the outbound email queue
+@app.route("/email_queue_stats", methods=["GET"])
+def email_queue_stats():
+    return jsonify({
+        "success": True,
+        "email_queue": get_email_queue_stats()
+    }), 200
+
+
+# Allowed and rejected counters of the rate limiter in front of signup, resend_otp and verification
+@app.route("/rate_limit_stats", methods=["GET"])
+def rate_limit_stats():
+    return jsonify({
+        "success": True,
+        "rate_limit": get_rate_limit_stats()
+    }), 200
+
+
+# Scheduler state and latest runs of the time zone grammar rollover
+@app.route("/grammar_rollover_stats", methods=["GET"])
+def grammar_rollover_stats():
+    try:
+        return jsonify({
+            "success": True,
+            "rollover": get_rollover_stats()
+        }), 200
+    except Exception as e:
+        print(f"Error getting grammar rollover stats: {e}")
+        return jsonify({"success": False, "message": f"Error getting grammar rollover stats: {str(e)}"}), 500
+
+
+# Request latency, MongoDB commands and outbound call timings in the Prometheus text format
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+# Warn about any missing MongoDB indexes, runs in the background so startup doesn't wait on the DB
+threading.Thread(target=verify_indexes_on_startup, daemon=True).start()
+
+# Reset users at midnight in their own time zone when GRAMMAR_ROLLOVER is on
+start_rollover_scheduler()
+
 
 # Railway deployment configuration
 # In order to run locally comment out the last three lines and uncomment the app.run line
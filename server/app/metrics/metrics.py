@@ -0,0 +1,221 @@
+from flask import g, request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pymongo import monitoring
+import threading
+import time
+
+
+# In process metrics for the /metrics endpoint, rendered in the Prometheus text format
+# Every worker process keeps its own numbers, so with several workers each scrape shows the worker that answered it
+# Recorded:
+#   - request latency per route, and the number and time of MongoDB commands each request sent
+#   - every MongoDB command by name, from a pymongo CommandListener on the shared clients
+#   - outbound calls to Voiceflow and Resend
+
+# Histogram buckets in seconds for request and outbound call latency
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Buckets in seconds for single MongoDB commands
+MONGO_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+# Buckets for the number of MongoDB commands in one request
+MONGO_COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+metrics_lock = threading.Lock()
+
+# Counters of the request being handled, the MongoDB listener adds to them while the request runs
+request_metrics = ContextVar("request_metrics", default=None)
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Quote a label value for the text format
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def format_labels(names, values, extra=()):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+# A counter with one value per combination of labels
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        with metrics_lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with metrics_lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+# A histogram with cumulative buckets per combination of labels
+class Histogram:
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        with metrics_lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with metrics_lock:
+            for labels, series in sorted(self.series.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {series['count']}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, streamed responses included",
+    ("method", "route", "status"), LATENCY_BUCKETS)
+REQUEST_MONGO_COMMANDS = Histogram(
+    "http_request_mongo_commands", "MongoDB commands sent while handling one request",
+    ("method", "route"), MONGO_COMMAND_COUNT_BUCKETS)
+REQUEST_MONGO_SECONDS = Histogram(
+    "http_request_mongo_seconds", "Time spent in MongoDB commands while handling one request",
+    ("method", "route"), LATENCY_BUCKETS)
+MONGO_COMMANDS = Counter(
+    "mongo_commands_total", "MongoDB commands sent, by command name and outcome",
+    ("command", "outcome"))
+MONGO_COMMAND_SECONDS = Histogram(
+    "mongo_command_duration_seconds", "Round trip time of a MongoDB command",
+    ("command",), MONGO_LATENCY_BUCKETS)
+OUTBOUND_SECONDS = Histogram(
+    "outbound_request_duration_seconds", "Time of calls to external services, status is the HTTP status, ok or error",
+    ("service", "operation", "status"), LATENCY_BUCKETS)
+
+ALL_METRICS = [REQUEST_SECONDS, REQUEST_MONGO_COMMANDS, REQUEST_MONGO_SECONDS, MONGO_COMMANDS, MONGO_COMMAND_SECONDS, OUTBOUND_SECONDS]
+
+
+# Counts every command sent by a MongoClient, and adds it to the request being handled when there is one
+# Motor runs each command on an executor thread with a copy of the caller's context, so request_metrics is the Quart request that sent it
+class MongoCommandListener(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self.record(event, "ok")
+
+    def failed(self, event):
+        self.record(event, "error")
+
+    @staticmethod
+    def record(event, outcome):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMANDS.inc((event.command_name, outcome))
+        MONGO_COMMAND_SECONDS.observe((event.command_name,), seconds)
+        current = request_metrics.get()
+        if current is not None:
+            # Commands a request runs at the same time finish on different threads
+            with metrics_lock:
+                current["mongo_commands"] += 1
+                current["mongo_seconds"] += seconds
+
+
+# Time a call to an external service, set call["status"] to the HTTP status once it's known
+@contextmanager
+def time_outbound(service, operation):
+    call = {"status": "ok"}
+    start = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call["status"] = "error"
+        raise
+    finally:
+        OUTBOUND_SECONDS.observe((service, operation, str(call["status"])), time.perf_counter() - start)
+
+
+# Route label of a request, the URL rule keeps the number of series small
+def route_label(req):
+    return req.url_rule.rule if req.url_rule is not None else "unmatched"
+
+
+# Start and finish the request counters, shared by the Flask and Quart hooks
+def start_request():
+    current = {"start": time.perf_counter(), "mongo_commands": 0, "mongo_seconds": 0.0, "status": 500}
+    request_metrics.set(current)
+    return current
+
+def finish_request(req, current):
+    request_metrics.set(None)
+    labels = (req.method, route_label(req))
+    REQUEST_SECONDS.observe(labels + (str(current["status"]),), time.perf_counter() - current["start"])
+    REQUEST_MONGO_COMMANDS.observe(labels, current["mongo_commands"])
+    REQUEST_MONGO_SECONDS.observe(labels, current["mongo_seconds"])
+
+
+# Record every request of a Flask app, teardown runs after a streamed response has finished
+def init_metrics(app):
+    @app.before_request
+    def start_request_metrics():
+        g.request_metrics = start_request()
+
+    @app.after_request
+    def save_response_status(response):
+        if "request_metrics" in g:
+            g.request_metrics["status"] = response.status_code
+        return response
+
+    @app.teardown_request
+    def record_request_metrics(exc):
+        current = g.pop("request_metrics", None)
+        if current is not None:
+            finish_request(request, current)
+
+
+# Record every request of the Quart app, the hooks run in the request's context so the motor commands it sends are counted too
+def init_async_metrics(async_app):
+    from quart import g as async_g, request as async_request
+
+    @async_app.before_request
+    async def start_request_metrics():
+        async_g.request_metrics = start_request()
+
+    @async_app.after_request
+    async def save_response_status(response):
+        if "request_metrics" in async_g:
+            async_g.request_metrics["status"] = response.status_code
+        return response
+
+    @async_app.teardown_request
+    async def record_request_metrics(exc):
+        current = async_g.pop("request_metrics", None)
+        if current is not None:
+            finish_request(async_request, current)
+
+
+# Every metric in the Prometheus text format
+def render_metrics():
+    lines = []
+    for metric in ALL_METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
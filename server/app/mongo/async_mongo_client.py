@@ -0,0 +1,59 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from metrics.metrics import MongoCommandListener
+import os
+
+# Use the same connection settings and listeners as the synchronous client
+from mongo.mongo_client import (
+    MONGODB_URI,
+    MONGODB_MAX_POOL_SIZE,
+    MONGODB_MIN_POOL_SIZE,
+    MONGODB_CONNECT_TIMEOUT_MS,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    MONGODB_SOCKET_TIMEOUT_MS,
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+    PoolStatsListener
+)
+
+
+# The one async client for this process, used by the ASGI endpoints
+# It's created on first use inside the worker's event loop and recreated in a forked worker
+async_client_state = {
+    "client": None,
+    "pid": None
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Get the shared AsyncIOMotorClient, creating it the first time it's needed in this process
+def get_async_client():
+    pid = os.getpid()
+    if async_client_state["client"] is None or async_client_state["pid"] != pid:
+        async_client_state["client"] = AsyncIOMotorClient(
+            MONGODB_URI,
+            maxPoolSize=MONGODB_MAX_POOL_SIZE,
+            minPoolSize=MONGODB_MIN_POOL_SIZE,
+            connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+            serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+            socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+            waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+            event_listeners=[PoolStatsListener(), MongoCommandListener()],
+            connect=False
+        )
+        async_client_state["pid"] = pid
+    return async_client_state["client"]
+
+# Get a database from the shared async client
+def get_async_database(name):
+    return get_async_client()[name]
+
+# Close the async client when the worker shuts down
+def close_async_client():
+    if async_client_state["client"] is not None:
+        async_client_state["client"].close()
+        async_client_state["client"] = None
+        async_client_state["pid"] = None
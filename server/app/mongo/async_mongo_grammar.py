@@ -0,0 +1,382 @@
+from quart import Blueprint, jsonify, request
+from pymongo import ReturnDocument
+import asyncio
+import random
+import time
+
+# Async versions of the grammar endpoints
+# The caches, update documents and request parsing are shared with the synchronous blueprint so both behave the same
+from mongo.async_mongo_client import get_async_database
+from mongo.async_mongo_users import find_user, get_async_users_collection
+from mongo.mongo_users import invalidate_user, clear_user_cache
+from mongo.mongo_grammar import (
+    CORRECTLY_ANSWERED_PROJECTION,
+    DAYS_COMPLETED_PROJECTION,
+    GRAMMAR_RESET_STEPS,
+    GRAMMAR_SUCCESS_UPDATE,
+    QUESTION_BANK_ENABLED,
+    QUESTION_PROJECTION,
+    build_grammar_batch_operations,
+    build_grammar_update_pipeline,
+    cached_grammar_days,
+    ensure_question_bank,
+    question_id_values,
+    random_question_pipeline,
+    store_grammar_days
+)
+from mongo.question_bank import has_day, random_unanswered_question, question_by_id
+from mongo.question_store import async_list_question_days, day_questions
+from mongo.leaderboard import LEADERBOARD_PROJECTION, invalidate_leaderboard, record_grammar_reset, record_grammar_success
+from mongo.review_queue import (
+    REVIEW_PROJECTION,
+    REVIEW_ROOT_PROJECTION,
+    REVIEW_WRITE_ATTEMPTS,
+    answers_change,
+    drop_question,
+    queue_root,
+    review_answers,
+    review_change_write,
+    review_conflict
+)
+
+
+# Create Quart Blueprint for the async MongoDB routes
+async_mongo_grammar = Blueprint('async_mongo_grammar', __name__)
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Grammar questions are in the grammar database, laid out by the question store
+def get_async_grammar_database():
+    return get_async_database("grammar")
+
+# Get the names of all grammar days, served from the shared day catalog cache while it's still fresh
+async def get_grammar_days():
+    days = cached_grammar_days()
+    if days is None:
+        days = store_grammar_days(await async_list_question_days(get_async_grammar_database()))
+    return days
+
+# Pick a random question from a grammar day that isn't in the correctly answered list
+# Returns None when every question of the day has been answered correctly
+async def sample_unanswered_question(collection, correctly_answered, day_filter=None):
+    async for question in collection.aggregate(random_question_pipeline(correctly_answered, day_filter)):
+        return question
+    return None
+
+# Read a user's review queue, apply change to it and save it, the motor side of mongo/review_queue.py
+async def update_review_queue(users, user_email, change):
+    for _ in range(REVIEW_WRITE_ATTEMPTS):
+        doc = await users.find_one({"user.email": user_email}, REVIEW_PROJECTION)
+        write = review_change_write(user_email, doc, change) if doc is not None else None
+        if write is None:
+            return False
+        if (await users.update_one(*write)).matched_count:
+            return True
+    return review_conflict(user_email)
+
+# Reschedule the answers of an /updates or /batch_updates body, same as the synchronous version
+# before is the user from the answer write itself, without it the queue is read first. Errors are only printed
+async def schedule_review_answers(users, user_email, answers, day, before=None):
+    change = answers_change(answers, day)
+    try:
+        if before is not None:
+            write = review_change_write(user_email, before, change)
+            if write is None:
+                return False
+            if (await users.update_one(*write)).matched_count:
+                return True
+        return await update_review_queue(users, user_email, change)
+    except Exception as e:
+        print(f"Error scheduling review answers of {user_email}: {e}")
+        return False
+
+# Root of a user's review queue as (found, entry)
+async def review_root(users, user_email):
+    return queue_root(await users.find_one({"user.email": user_email}, REVIEW_ROOT_PROJECTION))
+
+# Get a question of the review queue from the question bank when it has the day, otherwise from the question store
+async def find_review_question(day, question_id):
+    if QUESTION_BANK_ENABLED:
+        await asyncio.to_thread(ensure_question_bank)
+    if QUESTION_BANK_ENABLED and has_day(day):
+        return question_by_id(day, question_id)
+    collection, day_filter = day_questions(get_async_grammar_database(), day)
+    return await collection.find_one({**day_filter, "_id": {"$in": question_id_values([question_id])}}, QUESTION_PROJECTION)
+
+# Run the daily grammar reset, returns how many users had their streak reset and how many had grammar_completed set back to false
+async def reset_grammar_streaks(collection):
+    counts = []
+    for f, u in GRAMMAR_RESET_STEPS:
+        result = await collection.update_many(f, u)
+        counts.append(result.matched_count)
+    return tuple(counts)
+
+
+
+#######################
+# API Endpoints Below #
+#######################
+
+
+# Get a random grammar day that hasn't been completed yet
+@async_mongo_grammar.route("/get_uncompleted_grammar_day", methods=["POST"])
+async def get_uncompleted_grammar_day():
+    try:
+        data = await request.get_json()
+        user_email = data["user_email"]
+
+        # Find out how many grammar days user has left
+        doc = await find_user(user_email, DAYS_COMPLETED_PROJECTION)
+        days_completed = set(doc["grammar"]["days_completed"])
+        remaining = sorted(await get_grammar_days() - days_completed)
+
+        # If user has no grammar days left then reset the array and return the response
+        if not remaining:
+            await get_async_users_collection().update_one(
+                {"user.email": user_email},
+                {"$set": {"grammar.days_completed": []}}
+            )
+            invalidate_user(user_email)
+            return jsonify({
+                "success": False,
+                "message": "You completed all grammar days so in order to continue your streak your progress was reset. Your streak remains unaffected."
+                }), 200
+
+        # Select a random remaining grammar day and return it
+        return jsonify({
+            "success": True,
+            "day": random.choice(remaining),
+            "remaining_count": len(remaining)
+            }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error in getting an uncompleted grammar day: {e}")
+        return jsonify({"success": False, "message": f"Error getting uncompleted grammar day: {str(e)}"}), 500
+
+
+# Get a random question from the grammar day collection that hasn't been answered correctly
+@async_mongo_grammar.route("/get_random_question", methods=["POST"])
+async def get_random_question():
+    try:
+        data = await request.get_json()
+        user_email = data["user_email"]
+        chosen_day = data["chosen_day"]
+
+        doc = await find_user(user_email, CORRECTLY_ANSWERED_PROJECTION)
+        correctly_answered = doc.get("grammar", {}).get("correctly_answered", [])
+
+        # Days that are in the question bank don't need a DB read, any other day falls back to the DB
+        if QUESTION_BANK_ENABLED:
+            await asyncio.to_thread(ensure_question_bank)
+        if QUESTION_BANK_ENABLED and has_day(chosen_day):
+            chosen_question = random_unanswered_question(chosen_day, correctly_answered)
+        else:
+            collection, day_filter = day_questions(get_async_grammar_database(), chosen_day)
+            chosen_question = await sample_unanswered_question(collection, correctly_answered, day_filter)
+
+        if chosen_question:
+            # Need to convert ObjectIds to string first before returning
+            chosen_question["_id"] = str(chosen_question["_id"])
+            return jsonify({
+                "success": True,
+                "question": chosen_question
+                }), 200
+
+        # There are no unanswered questions remaining
+        return jsonify({
+            "success": True,
+            "message": "All questions have been answered correctly for the given day."
+            }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error getting grammar question: {e}")
+        return jsonify({"success": False, "message": f"Error getting grammar question: {str(e)}"}), 500
+
+
+# Get the most overdue question of the user's review queue, same as the synchronous endpoint
+@async_mongo_grammar.route("/get_review_question", methods=["POST"])
+async def get_review_question():
+    try:
+        data = await request.get_json()
+        user_email = data["user_email"]
+        users = get_async_users_collection()
+
+        # Only the root of the queue is read, a question that no longer exists is dropped and the next root is tried
+        for _ in range(REVIEW_WRITE_ATTEMPTS):
+            found, entry = await review_root(users, user_email)
+            if not found:
+                return jsonify({"success": False, "message": "User not found"}), 404
+            if entry is None:
+                return jsonify({
+                    "success": True,
+                    "message": "There are no questions to review."
+                    }), 200
+
+            due, question_id, day, _ = entry
+            now = int(time.time())
+            if due > now:
+                return jsonify({
+                    "success": True,
+                    "message": "No questions are due for review yet.",
+                    "next_due": due
+                    }), 200
+
+            question = await find_review_question(day, question_id)
+            if question:
+                # Need to convert ObjectIds to string first before returning
+                question["_id"] = str(question["_id"])
+                return jsonify({
+                    "success": True,
+                    "question": question,
+                    "day": day,
+                    "overdue_seconds": now - due
+                    }), 200
+
+            await update_review_queue(users, user_email, lambda queue: drop_question(queue, question_id))
+            invalidate_user(user_email)
+
+        return jsonify({"success": True, "message": "There are no questions to review."}), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error getting review question: {e}")
+        return jsonify({"success": False, "message": f"Error getting review question: {str(e)}"}), 500
+
+
+# Update completed_intro, correctly_answered, incorrectly_answered, and days_completed
+@async_mongo_grammar.route("/updates", methods=["POST"])
+async def updates():
+    try:
+        data = await request.get_json()
+        user_email = data.get("user_email")
+
+        update_pipeline = build_grammar_update_pipeline(data)
+        if update_pipeline is None:
+            return jsonify({
+                "success": False,
+                "message": "No updates to be made."
+            }), 200
+
+        # One atomic update, same as the synchronous endpoint, answers also bring back the review queue from before it
+        users = get_async_users_collection()
+        answers = review_answers(data)
+        if answers:
+            before = await users.find_one_and_update(
+                {"user.email": user_email},
+                update_pipeline,
+                projection=REVIEW_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+            matched = before is not None
+        else:
+            matched = (await users.update_one({"user.email": user_email}, update_pipeline)).matched_count > 0
+
+        if answers and matched:
+            await schedule_review_answers(users, user_email, answers, data.get("day"), before)
+        invalidate_user(user_email)
+        if not matched:
+            return jsonify({"success": False, "message": "Error updating user: user not found"}), 500
+
+        return jsonify({
+            "success": True,
+            "message": "Updated user succesfully"
+        }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error in grammar updates: {e}")
+        return jsonify({"success": False, "message": f"Error updating user: {str(e)}"}), 500
+
+
+# Apply a whole session of answers in one call, same as the synchronous endpoint
+@async_mongo_grammar.route("/batch_updates", methods=["POST"])
+async def batch_updates():
+    try:
+        data = await request.get_json()
+
+        try:
+            operations = build_grammar_batch_operations(data)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        if not operations:
+            return jsonify({
+                "success": False,
+                "message": "No updates to be made."
+            }), 200
+
+        result = await get_async_users_collection().bulk_write(operations, ordered=True)
+        answers = review_answers(data)
+        if answers and result.matched_count:
+            await schedule_review_answers(get_async_users_collection(), data.get("user_email"), answers, data.get("day"))
+        invalidate_user(data.get("user_email"))
+        if data.get("grammar_success"):
+            invalidate_leaderboard()
+        if result.matched_count == 0:
+            return jsonify({"success": False, "message": "Error updating user: user not found"}), 500
+
+        return jsonify({
+            "success": True,
+            "message": "Updated user succesfully",
+            "operations": len(operations)
+        }), 200
+
+    except Exception as e:
+        print(f"Error in grammar batch_updates: {e}")
+        return jsonify({"success": False, "message": f"Error updating user: {str(e)}"}), 500
+
+
+# Grammar day complete, increment streak +1, remove all correctly_answered questions from array, set grammar_completed to True
+@async_mongo_grammar.route("/grammar_success", methods=["POST"])
+async def grammar_success():
+    try:
+        data = await request.get_json()
+        user_email = data.get("user_email")
+
+        doc = await get_async_users_collection().find_one_and_update(
+            {"user.email": user_email},
+            GRAMMAR_SUCCESS_UPDATE,
+            projection=LEADERBOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        invalidate_user(user_email)
+        if doc:
+            record_grammar_success(doc)
+
+        return jsonify({
+            "success": True,
+            "message": "Streak incremented, correctly_answered array cleared, and grammar_completed set to true."
+        }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error in grammar_success: {e}")
+        return jsonify({"success": False, "message": f"Error updating user: {str(e)}"}), 500
+
+
+# Grammar daily reset
+@async_mongo_grammar.route("/grammar_reset", methods=["POST"])
+async def grammar_reset():
+    try:
+        streaks_reset, completed_reset = await reset_grammar_streaks(get_async_users_collection())
+        clear_user_cache()
+        record_grammar_reset()
+        reset_count = streaks_reset + completed_reset
+        print(f"Grammar reset complete. {reset_count} user's reset ({streaks_reset} streaks set to 0, {completed_reset} grammar completed set to false).")
+
+        return jsonify ({
+            "success": True,
+            "message": f"{reset_count} users updated"
+        }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error in grammar_reset: {e}")
+        return jsonify({"success": False, "message": f"Error reseting users: {str(e)}"}), 500
@@ -0,0 +1,192 @@
+from quart import Blueprint, jsonify, Response, request
+from bson import json_util
+from pymongo import ReturnDocument
+
+# Async versions of the read heavy user endpoints, the rest are served by the Flask app
+# The request parsing is shared with the synchronous blueprint so both behave the same
+from mongo.async_mongo_client import get_async_database
+from auth.session_tokens import issue_session_token, SESSION_TOKEN_TTL
+from mongo.mongo_users import (
+    USER_CACHE_ENABLED,
+    USER_LOGIN_PROJECTION,
+    build_user_info_projection,
+    build_user_updates,
+    get_cached_user,
+    login_time_zone_update,
+    invalidate_user,
+    project_document,
+    remove_secrets,
+    store_cached_user,
+    user_cache_generation
+)
+
+
+# Create Quart Blueprint for the async MongoDB routes
+async_mongo_user = Blueprint('async_mongo_user', __name__)
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Collections are looked up on the shared async client each time so nothing connects at import
+def get_async_users_collection():
+    return get_async_database("web_app").users
+
+def get_async_pending_users_collection():
+    return get_async_database("web_app").pending_users
+
+# Read a user or pending user through the shared user cache, same as the synchronous read_through_user
+async def read_through_user(collection_name, collection, user_email, projection):
+    doc = get_cached_user(collection_name, user_email)
+    if doc is None:
+        generation = user_cache_generation()
+        doc = await collection.find_one({"user.email": user_email})
+        if doc is None:
+            return None
+        store_cached_user(collection_name, user_email, doc, generation)
+    return project_document(doc, projection)
+
+# Find a pending document by email, returns None if it doesn't exist
+async def find_pending_user(user_email, projection=None):
+    if USER_CACHE_ENABLED:
+        return await read_through_user("pending_users", get_async_pending_users_collection(), user_email, projection)
+    return await get_async_pending_users_collection().find_one({"user.email": user_email}, projection)
+
+# Find a user document by email, returns None if it doesn't exist
+async def find_user(user_email, projection=None):
+    if USER_CACHE_ENABLED:
+        return await read_through_user("users", get_async_users_collection(), user_email, projection)
+    return await get_async_users_collection().find_one({"user.email": user_email}, projection)
+
+# Update any verified user fields
+async def update_user_fields(user_email, updates):
+    doc = await get_async_users_collection().find_one_and_update(
+        {"user.email": user_email},
+        {"$set": updates},
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_user(user_email)
+    return doc
+
+
+
+#######################
+# API Endpoints Below #
+#######################
+
+
+# Retrieve a users document from MongoDB
+@async_mongo_user.route("/get_user_info", methods=["POST"])
+async def get_user_info():
+    try:
+        data = await request.get_json()
+        user_email = data["user_email"]
+
+        # Only fetch the fields that were asked for, the password and OTP are never returned
+        try:
+            projection = build_user_info_projection(data.get("fields"))
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        # Try to find a user that has been verified
+        user = await find_user(user_email, projection)
+        if user:
+            return Response(json_util.dumps({
+                                "status": "verified",
+                                "user": remove_secrets(user)
+                            }), mimetype="application/json"), 200
+
+        # Look for the email in the pending state
+        user = await find_pending_user(user_email, projection)
+        if user:
+            return Response(json_util.dumps({
+                                "status": "pending",
+                                "user": remove_secrets(user)
+                            }), mimetype="application/json"), 200
+
+        # If the user's email doesn't exist, return Not Found
+        return jsonify({
+                        "success": False,
+                        "message": "User not found"
+                    }), 400
+
+    except Exception as e:
+        print(f"Error in get_user_info: {e}")
+        return jsonify({
+                        "success": False,
+                        "message": f"Error getting user: {str(e)}"
+                    }), 500
+
+
+# Update user password, intro_completed, and verification
+@async_mongo_user.route("/updates", methods=["POST"])
+async def update_user():
+    try:
+        data = await request.get_json()
+        user_email = data["user_email"]
+
+        updates = build_user_updates(data)
+        if not updates:
+            return jsonify({
+                "success": False,
+                "message": "No data provided for changes."
+            }), 400
+
+        # Push any changes to the user provided in user_email
+        doc = await update_user_fields(user_email, updates)
+        if not doc:
+            return jsonify({
+                "success": False,
+                "message": "User not found"
+            }), 400
+
+        return jsonify({
+            "success": True,
+            "message": "User updated successfully"
+        }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error in user updates: {e}")
+        return jsonify({"success": False, "message": f"Error updating user: {str(e)}"}), 500
+
+
+# Verify that user provides valid email and password for login
+@async_mongo_user.route("/authentication", methods=["POST"])
+async def authentication():
+    try:
+        data = await request.get_json()
+        input_email = data.get("user_email")
+        input_password = data.get("user_password")
+
+        user = await find_user(input_email, USER_LOGIN_PROJECTION)
+        if not user:
+            return jsonify({
+                "success": False,
+                "message": "Email does not exist."
+            }), 400
+
+        if user["user"]["password"] == input_password:
+            # Keep the saved time zone up to date for the daily grammar rollover
+            time_zone = login_time_zone_update(user, data)
+            if time_zone:
+                await update_user_fields(input_email, {"user.time_zone": time_zone})
+
+            return jsonify({
+                "success": True,
+                "message": "Successful login!",
+                "token": issue_session_token(input_email, user["user"].get("verified", False)),
+                "expires_in": SESSION_TOKEN_TTL
+            }), 200
+        else:
+            return jsonify({
+                "success": False,
+                "message": "Incorrect password provided."
+            }), 400
+
+    except Exception as e:
+        print(f"Error authenticating user: {e}")
+        return jsonify({"success": False, "message": f"Error authenticating user: {str(e)}"}), 500
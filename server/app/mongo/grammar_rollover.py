@@ -0,0 +1,266 @@
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import os
+import socket
+import threading
+import time
+import uuid
+
+# The rollover runs the same two updates as /grammar_reset, only for one time zone and a chunk of users at a time
+from mongo.mongo_client import get_database
+from mongo.mongo_users import get_users_collection, clear_user_cache
+from mongo.mongo_grammar import GRAMMAR_RESET_STEPS
+from mongo.leaderboard import invalidate_leaderboard
+
+
+# Load environment variables
+load_dotenv()
+
+# In process replacement for the midnight UTC cron job, every user is rolled over to the next grammar day at midnight in their own time zone
+# Users are grouped by user.time_zone, users without a (valid) time zone are rolled over at midnight UTC
+# Each group is processed in chunks of users ordered by _id, and the last _id of every chunk is saved in the grammar_rollovers collection
+# so a run that was interrupted carries on from there. Every user is marked with the day they were rolled over for, so a chunk
+# that runs twice doesn't reset anyone twice
+# Every worker runs the scheduler, a run is claimed with a lease so only one of them works on a time zone at a time
+# When GRAMMAR_ROLLOVER is TRUE the Railway cron job calling /grammar_reset has to be removed, otherwise users are reset twice
+GRAMMAR_ROLLOVER_ENABLED = os.getenv("GRAMMAR_ROLLOVER", "FALSE").upper() == "TRUE"
+
+# Seconds between checks for time zones that have passed midnight
+GRAMMAR_ROLLOVER_INTERVAL = float(os.getenv("GRAMMAR_ROLLOVER_INTERVAL", 60))
+
+# Users reset per chunk, every chunk is one read and two updates
+GRAMMAR_ROLLOVER_CHUNK_SIZE = int(os.getenv("GRAMMAR_ROLLOVER_CHUNK_SIZE", 500))
+
+# A time zone is only rolled over in the first hours after its midnight, so turning the scheduler on (or a server that was down)
+# never resets users in the middle of their day
+GRAMMAR_ROLLOVER_WINDOW_HOURS = float(os.getenv("GRAMMAR_ROLLOVER_WINDOW_HOURS", 6))
+
+# Seconds a claimed run stays with its worker without a checkpoint before another worker can take it over
+GRAMMAR_ROLLOVER_LEASE_SECONDS = float(os.getenv("GRAMMAR_ROLLOVER_LEASE_SECONDS", 120))
+
+DEFAULT_TIME_ZONE = "UTC"
+
+# Scheduler thread of this process
+rollover_lock = threading.Lock()
+rollover_state = {
+    "pid": None,
+    "owner": None,
+    "ticks": 0,
+    "runs_completed": 0,
+    "errors": 0,
+    "last_error": None,
+    "last_tick": None
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# One document per (day, time zone) run with its checkpoint, lease and counters
+def get_rollovers_collection():
+    return get_database("web_app").grammar_rollovers
+
+# Every valid time zone users have saved, plus the default one
+def user_time_zones(users):
+    zones = {DEFAULT_TIME_ZONE}
+    for name in users.distinct("user.time_zone"):
+        try:
+            if isinstance(name, str) and name:
+                ZoneInfo(name)
+                zones.add(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            pass
+    return sorted(zones)
+
+# Filter for the users of a time zone, the default zone also gets every user without a valid one
+def time_zone_filter(zone, zones):
+    if zone == DEFAULT_TIME_ZONE:
+        return {"user.time_zone": {"$nin": [z for z in zones if z != DEFAULT_TIME_ZONE]}}
+    return {"user.time_zone": zone}
+
+# The grammar day that has to be closed in a time zone, the local date of yesterday
+# None when it's more than the window past local midnight, that day was either already rolled over or is too late to roll over
+def due_day(zone, now):
+    local = now.astimezone(ZoneInfo(zone))
+    midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+    if local - midnight > timedelta(hours=GRAMMAR_ROLLOVER_WINDOW_HOURS):
+        return None
+    return (local.date() - timedelta(days=1)).isoformat()
+
+# Claim the run of a day and time zone for this worker
+# Returns the run document, or None when it's finished or another worker holds an unexpired lease on it
+def claim_run(rollovers, zone, day, owner, now):
+    try:
+        return rollovers.find_one_and_update(
+            {
+                "_id": f"{day}:{zone}",
+                "status": {"$ne": "done"},
+                "$or": [{"lease_until": {"$lt": now}}, {"owner": owner}]
+            },
+            {
+                "$set": {"owner": owner, "lease_until": now + timedelta(seconds=GRAMMAR_ROLLOVER_LEASE_SECONDS)},
+                "$setOnInsert": {
+                    "zone": zone,
+                    "day": day,
+                    "status": "running",
+                    "started_at": now,
+                    "started_time": time.time(),
+                    "last_id": None,
+                    "users_scanned": 0,
+                    "streaks_reset": 0,
+                    "completed_reset": 0,
+                    "chunks": 0,
+                    "active_seconds": 0.0
+                },
+                "$inc": {"claims": 1}
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    except DuplicateKeyError:
+        # The run exists but didn't match, it's done or another worker has it
+        return None
+
+# Reset one chunk of users for a day, the same two updates as /grammar_reset limited to the chunk
+# Users already marked with the day are skipped, so running a chunk again changes nothing
+def reset_chunk(users, ids, day):
+    counts = []
+    for user_filter, update in GRAMMAR_RESET_STEPS:
+        result = users.update_many(
+            {**user_filter, "_id": {"$in": ids}, "grammar.rolled_over": {"$ne": day}},
+            {"$set": {**update["$set"], "grammar.rolled_over": day}}
+        )
+        counts.append(result.modified_count)
+    return tuple(counts)
+
+# Roll the users of one time zone over to the next day, starting from the run's checkpoint
+# Returns the finished run document, or None when the run couldn't be claimed or the lease was lost to another worker
+def run_rollover(zone, day, zones, owner):
+    users = get_users_collection()
+    rollovers = get_rollovers_collection()
+    run = claim_run(rollovers, zone, day, owner, datetime.now(timezone.utc))
+    if run is None:
+        return None
+
+    run_id = run["_id"]
+    last_id = run.get("last_id")
+    zone_filter = time_zone_filter(zone, zones)
+    while True:
+        chunk_start = time.perf_counter()
+        query = dict(zone_filter)
+        if last_id is not None:
+            query["_id"] = {"$gt": last_id}
+        ids = [doc["_id"] for doc in users.find(query, {"_id": 1}).sort("_id", 1).limit(GRAMMAR_ROLLOVER_CHUNK_SIZE)]
+        if not ids:
+            break
+
+        streaks_reset, completed_reset = reset_chunk(users, ids, day)
+        clear_user_cache()
+        invalidate_leaderboard()
+        last_id = ids[-1]
+
+        # Save the checkpoint and extend the lease, stop if another worker has taken the run over
+        result = rollovers.update_one(
+            {"_id": run_id, "owner": owner},
+            {
+                "$set": {
+                    "last_id": last_id,
+                    "lease_until": datetime.now(timezone.utc) + timedelta(seconds=GRAMMAR_ROLLOVER_LEASE_SECONDS)
+                },
+                "$inc": {
+                    "users_scanned": len(ids),
+                    "streaks_reset": streaks_reset,
+                    "completed_reset": completed_reset,
+                    "chunks": 1,
+                    "active_seconds": time.perf_counter() - chunk_start
+                }
+            }
+        )
+        if result.matched_count == 0:
+            print(f"Grammar rollover {run_id} was taken over by another worker")
+            return None
+
+    # Record how long the run took and how fast it went
+    run = rollovers.find_one({"_id": run_id})
+    duration = time.time() - run["started_time"]
+    finished = rollovers.find_one_and_update(
+        {"_id": run_id, "owner": owner},
+        {"$set": {
+            "status": "done",
+            "finished_at": datetime.now(timezone.utc),
+            "duration_seconds": duration,
+            "users_per_second": run["users_scanned"] / run["active_seconds"] if run["active_seconds"] else None
+        }},
+        return_document=ReturnDocument.AFTER
+    )
+    if finished:
+        print(f"Grammar rollover {run_id} complete. {finished['users_scanned']} users in {finished['chunks']} chunks "
+              f"({finished['streaks_reset']} streaks set to 0, {finished['completed_reset']} grammar completed set to false) in {duration:.1f}s")
+    return finished
+
+# Roll over every time zone that has passed midnight and hasn't been rolled over yet
+def rollover_tick(owner, now=None):
+    now = now or datetime.now(timezone.utc)
+    zones = user_time_zones(get_users_collection())
+    completed = []
+    for zone in zones:
+        day = due_day(zone, now)
+        if day is None:
+            continue
+        run = run_rollover(zone, day, zones, owner)
+        if run is not None:
+            completed.append(run)
+    return completed
+
+def rollover_scheduler(owner):
+    while True:
+        try:
+            completed = rollover_tick(owner)
+            with rollover_lock:
+                rollover_state["ticks"] += 1
+                rollover_state["runs_completed"] += len(completed)
+                rollover_state["last_tick"] = datetime.now(timezone.utc).isoformat()
+        except Exception as e:
+            # Keep the scheduler alive, the run is picked up again from its checkpoint on the next tick
+            print(f"Error in grammar rollover: {e}")
+            with rollover_lock:
+                rollover_state["errors"] += 1
+                rollover_state["last_error"] = str(e)
+        time.sleep(GRAMMAR_ROLLOVER_INTERVAL)
+
+# Start the scheduler thread if it's enabled and isn't running in this process yet
+def start_rollover_scheduler():
+    if not GRAMMAR_ROLLOVER_ENABLED:
+        return
+    pid = os.getpid()
+    with rollover_lock:
+        if rollover_state["pid"] == pid:
+            return
+        rollover_state["pid"] = pid
+        rollover_state["owner"] = f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:8]}"
+        owner = rollover_state["owner"]
+    threading.Thread(target=rollover_scheduler, args=(owner,), name="grammar-rollover", daemon=True).start()
+
+# Scheduler state of this process and the latest runs of every worker for the stats endpoint
+def get_rollover_stats(limit=20):
+    runs = list(get_rollovers_collection().find({}, {"started_time": 0}).sort("started_at", -1).limit(limit))
+    for run in runs:
+        run["last_id"] = str(run["last_id"]) if run.get("last_id") is not None else None
+        for field in ("started_at", "finished_at", "lease_until"):
+            if run.get(field) is not None:
+                run[field] = run[field].isoformat()
+    with rollover_lock:
+        scheduler = dict(rollover_state, enabled=GRAMMAR_ROLLOVER_ENABLED)
+    return {"scheduler": scheduler, "runs": runs}
+
+
+if __name__ == "__main__":
+    # Roll over any time zone that's due right now without waiting for the scheduler: cd app && python -m mongo.grammar_rollover
+    for finished_run in rollover_tick(f"{socket.gethostname()}:{os.getpid()}:manual"):
+        print(finished_run["_id"], finished_run["users_scanned"], "users")
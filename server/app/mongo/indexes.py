@@ -0,0 +1,93 @@
+from pymongo import IndexModel
+from pymongo.errors import PyMongoError
+import sys
+
+# Import the shared client so indexes are built with the same connection settings as the app
+from mongo.mongo_client import get_database
+from mongo.question_store import QUESTIONS_COLLECTION, QUESTION_STORE_INDEXES, is_consolidated
+
+
+# Every index the app relies on, grouped by (database, collection)
+# Build them with: cd app && python -m mongo.indexes build
+# Check them with: cd app && python -m mongo.indexes verify
+INDEXES = {
+    ("web_app", "users"): [
+        # find_user, authenticate and every grammar endpoint look users up by email
+        {"keys": [("user.email", 1)], "name": "user_email_unique", "unique": True},
+        # The daily grammar reset splits users by grammar_completed
+        {"keys": [("grammar.grammar_completed", 1)], "name": "grammar_completed"},
+        # The grammar rollover walks the users of each time zone in _id order
+        {"keys": [("user.time_zone", 1), ("_id", 1)], "name": "user_time_zone"},
+        # The leaderboard reads the top streaks and counts the users above a streak from this index
+        {"keys": [("grammar.streak", -1), ("_id", 1)], "name": "grammar_streak"}
+    ],
+    ("web_app", "pending_users"): [
+        # find_pending_user looks pending users up by email
+        {"keys": [("user.email", 1)], "name": "user_email_unique", "unique": True},
+        # Auto delete any unverified users after 15 minutes
+        {"keys": [("created_at", 1)], "name": "created_at_1", "expireAfterSeconds": 900}
+    ]
+}
+
+# The consolidated question store's indexes are only needed when it's in use
+if is_consolidated():
+    INDEXES[("grammar", QUESTIONS_COLLECTION)] = QUESTION_STORE_INDEXES
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Build every index in the registry, existing indexes with the same definition are left alone
+# Returns a list of (namespace, index name, error) for the indexes that couldn't be built
+def build_indexes():
+    failed = []
+    for (database, collection), indexes in INDEXES.items():
+        for index in indexes:
+            options = {k: v for k, v in index.items() if k != "keys"}
+            try:
+                get_database(database)[collection].create_indexes([
+                    IndexModel(index["keys"], background=True, **options)
+                ])
+                print(f"Index {index['name']} ready on {database}.{collection}")
+            except PyMongoError as e:
+                print(f"Error building index {index['name']} on {database}.{collection}: {e}")
+                failed.append((f"{database}.{collection}", index["name"], str(e)))
+    return failed
+
+# Compare the registry with the indexes that exist in the DB and warn about any that are missing
+# Indexes are matched on their keys so an index built under another name still counts
+# Returns a list of (namespace, index name) for the missing indexes
+def verify_indexes():
+    missing = []
+    for (database, collection), indexes in INDEXES.items():
+        existing = get_database(database)[collection].index_information()
+        existing_keys = [[tuple(a) for a in info["key"]] for info in existing.values()]
+
+        for index in indexes:
+            if [tuple(a) for a in index["keys"]] not in existing_keys:
+                missing.append((f"{database}.{collection}", index["name"]))
+                print(f"WARNING: index {index['name']} is missing on {database}.{collection}, run 'python -m mongo.indexes build'")
+    return missing
+
+# Run the index check without holding up startup, any error is only printed
+def verify_indexes_on_startup():
+    try:
+        missing = verify_indexes()
+        if not missing:
+            print("All MongoDB indexes are in place.")
+    except Exception as e:
+        print(f"Error verifying MongoDB indexes: {e}")
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    if command == "build":
+        sys.exit(1 if build_indexes() else 0)
+    elif command == "verify":
+        sys.exit(1 if verify_indexes() else 0)
+    else:
+        print("Usage: python -m mongo.indexes [build|verify]")
+        sys.exit(2)
@@ -0,0 +1,148 @@
+from bisect import bisect_left, insort
+from dotenv import load_dotenv
+import os
+import threading
+import time
+
+
+# Load environment variables
+load_dotenv()
+
+# In memory copy of the longest grammar streaks so the leaderboard is served without reading the users collection
+# Entries are (-streak, _id, name, completed) tuples kept sorted, so the best streak comes first and ties are broken by _id
+# exactly like the grammar_streak index (grammar.streak descending, _id). Only users with a streak above 0 are on the board
+# grammar_success moves the user up in place and grammar_reset drops the users whose streak went back to 0
+# Every worker keeps its own copy, so it's reloaded from the index after LEADERBOARD_TTL seconds to pick up the others' writes
+LEADERBOARD_SIZE = int(os.getenv("LEADERBOARD_SIZE", 100))
+LEADERBOARD_TTL = float(os.getenv("LEADERBOARD_TTL", 60))
+
+# Index the top streaks and ranks are read from, declared in mongo/indexes.py
+STREAK_INDEX = "grammar_streak"
+
+# The user fields an entry is built from
+LEADERBOARD_PROJECTION = {"user.name": 1, "grammar.streak": 1, "grammar.grammar_completed": 1}
+
+leaderboard_lock = threading.Lock()
+leaderboard = {
+    "entries": [],
+    # True when every user with a streak is in entries, so nobody can be below the last entry
+    "complete": False,
+    "loaded_at": 0.0,
+    "loads": 0,
+    "hits": 0,
+    "incremental_updates": 0,
+    "invalidations": 0,
+    "memory_ranks": 0,
+    "index_ranks": 0
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Leaderboard entry for a user document, None when the user has no streak
+def leaderboard_entry(doc):
+    grammar = doc.get("grammar") or {}
+    streak = grammar.get("streak")
+    if not isinstance(streak, int) or streak <= 0:
+        return None
+    return (-streak, doc["_id"], (doc.get("user") or {}).get("name"), grammar.get("grammar_completed") != "FALSE")
+
+# Read the top streaks from the grammar_streak index and swap them in, only LEADERBOARD_SIZE users are read
+def load_leaderboard(users):
+    cursor = users.find({"grammar.streak": {"$gt": 0}}, LEADERBOARD_PROJECTION) \
+        .sort([("grammar.streak", -1), ("_id", 1)]).limit(LEADERBOARD_SIZE).hint(STREAK_INDEX)
+    entries = [entry for entry in map(leaderboard_entry, cursor) if entry]
+    with leaderboard_lock:
+        leaderboard["entries"] = entries
+        leaderboard["complete"] = len(entries) < LEADERBOARD_SIZE
+        leaderboard["loaded_at"] = time.monotonic()
+        leaderboard["loads"] += 1
+
+# Load the leaderboard when it's empty, expired or was invalidated
+def ensure_leaderboard(users):
+    with leaderboard_lock:
+        loaded_at = leaderboard["loaded_at"]
+        if loaded_at and time.monotonic() - loaded_at < LEADERBOARD_TTL:
+            leaderboard["hits"] += 1
+            return
+    load_leaderboard(users)
+
+# Drop the leaderboard so the next request reads it from the index again, for writes that change streaks in bulk
+def invalidate_leaderboard():
+    with leaderboard_lock:
+        leaderboard["loaded_at"] = 0.0
+        leaderboard["invalidations"] += 1
+
+# Move a user up after grammar_success, doc is the user document after the update
+def record_grammar_success(doc):
+    entry = leaderboard_entry(doc)
+    if entry is None:
+        return
+    with leaderboard_lock:
+        if not leaderboard["loaded_at"]:
+            return
+        entries = leaderboard["entries"]
+        previous = next((i for i, e in enumerate(entries) if e[1] == entry[1]), None)
+        if previous is not None:
+            del entries[previous]
+        elif not leaderboard["complete"] and entries and entry > entries[-1]:
+            # Not on the board and still below the last entry
+            return
+        insort(entries, entry)
+        if len(entries) > LEADERBOARD_SIZE:
+            entries.pop()
+            leaderboard["complete"] = False
+        leaderboard["incremental_updates"] += 1
+
+# Apply the daily reset: users that didn't complete the day drop off the board, everyone else starts the new day not completed
+def record_grammar_reset():
+    with leaderboard_lock:
+        if not leaderboard["loaded_at"]:
+            return
+        entries = leaderboard["entries"]
+        kept = [(streak, _id, name, False) for streak, _id, name, completed in entries if completed]
+        leaderboard["entries"] = kept
+        leaderboard["incremental_updates"] += 1
+        # Users below the old board could move up into the free places, read them on the next request
+        if len(kept) < len(entries) and not leaderboard["complete"]:
+            leaderboard["loaded_at"] = 0.0
+
+# The top limit streaks as {"rank", "name", "streak"}, users with the same streak share a rank
+def top_streaks(users, limit):
+    ensure_leaderboard(users)
+    with leaderboard_lock:
+        entries = leaderboard["entries"][:limit]
+    rows = []
+    for i, (streak, _id, name, completed) in enumerate(entries):
+        rank = rows[-1]["rank"] if rows and rows[-1]["streak"] == -streak else i + 1
+        rows.append({"rank": rank, "name": name, "streak": -streak})
+    return rows
+
+# Rank of a streak, 1 + the number of users with a longer streak
+# Streaks that reach the board are ranked from memory, anything lower is a count over the grammar_streak index, never a collection scan
+def streak_rank(users, streak):
+    ensure_leaderboard(users)
+    with leaderboard_lock:
+        entries = leaderboard["entries"]
+        if leaderboard["complete"] or (entries and -streak <= entries[-1][0]):
+            leaderboard["memory_ranks"] += 1
+            return bisect_left(entries, (-streak,)) + 1
+        leaderboard["index_ranks"] += 1
+    return users.count_documents({"grammar.streak": {"$gt": streak}}, hint=STREAK_INDEX) + 1
+
+# Counters for the stats endpoint
+def leaderboard_stats():
+    with leaderboard_lock:
+        loaded_at = leaderboard["loaded_at"]
+        return {
+            "size": LEADERBOARD_SIZE,
+            "ttl_seconds": LEADERBOARD_TTL,
+            "entries": len(leaderboard["entries"]),
+            "complete": leaderboard["complete"],
+            "age_seconds": time.monotonic() - loaded_at if loaded_at else None,
+            **{key: leaderboard[key] for key in ("loads", "hits", "incremental_updates", "invalidations", "memory_ranks", "index_ranks")}
+        }
@@ -0,0 +1,140 @@
+from pymongo import MongoClient, monitoring
+from dotenv import load_dotenv
+from metrics.metrics import MongoCommandListener
+import os
+import threading
+
+
+# Load environment variables
+load_dotenv()
+
+# Connection settings shared by every blueprint, all of them can be changed with environment variables
+MONGODB_URI = os.getenv('MONGODB_URI')
+MONGODB_MAX_POOL_SIZE = int(os.getenv('MONGODB_MAX_POOL_SIZE', 50))
+MONGODB_MIN_POOL_SIZE = int(os.getenv('MONGODB_MIN_POOL_SIZE', 0))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', 5000))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', 10000))
+MONGODB_SOCKET_TIMEOUT_MS = int(os.getenv('MONGODB_SOCKET_TIMEOUT_MS', 15000))
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv('MONGODB_WAIT_QUEUE_TIMEOUT_MS', 5000))
+
+# The one client for this process, it's only created the first time a database is needed
+# The pid is saved so a forked worker never reuses the connections of its parent
+client_lock = threading.Lock()
+client_state = {
+    "client": None,
+    "pid": None
+}
+
+# Connection pool statistics filled in by PoolStatsListener
+pool_stats_lock = threading.Lock()
+pool_stats = {
+    "connections_open": 0,
+    "connections_in_use": 0,
+    "checkouts": 0,
+    "checkout_failures": 0,
+    "checkout_wait_seconds_total": 0.0,
+    "checkout_wait_seconds_max": 0.0,
+    "pool_clears": 0
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Keeps track of how many connections are open and in use and how long requests wait to check one out
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with pool_stats_lock:
+            pool_stats["pool_clears"] += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with pool_stats_lock:
+            pool_stats["connections_open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with pool_stats_lock:
+            pool_stats["connections_open"] -= 1
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with pool_stats_lock:
+            pool_stats["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        wait = event.duration or 0.0
+        with pool_stats_lock:
+            pool_stats["checkouts"] += 1
+            pool_stats["connections_in_use"] += 1
+            pool_stats["checkout_wait_seconds_total"] += wait
+            pool_stats["checkout_wait_seconds_max"] = max(pool_stats["checkout_wait_seconds_max"], wait)
+
+    def connection_checked_in(self, event):
+        with pool_stats_lock:
+            pool_stats["connections_in_use"] -= 1
+
+
+# Forget the parent's client in a forked worker, the child creates its own on first use
+def reset_client_after_fork():
+    client_state["client"] = None
+    client_state["pid"] = None
+    with pool_stats_lock:
+        for key in pool_stats:
+            pool_stats[key] = type(pool_stats[key])()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_client_after_fork)
+
+
+# Get the shared MongoClient, creating it the first time it's needed in this process
+def get_client():
+    pid = os.getpid()
+    if client_state["client"] is not None and client_state["pid"] == pid:
+        return client_state["client"]
+
+    with client_lock:
+        if client_state["client"] is None or client_state["pid"] != pid:
+            # connect=False means no connection is opened until the first operation
+            client_state["client"] = MongoClient(
+                MONGODB_URI,
+                maxPoolSize=MONGODB_MAX_POOL_SIZE,
+                minPoolSize=MONGODB_MIN_POOL_SIZE,
+                connectTimeoutMS=MONGODB_CONNECT_TIMEOUT_MS,
+                serverSelectionTimeoutMS=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+                socketTimeoutMS=MONGODB_SOCKET_TIMEOUT_MS,
+                waitQueueTimeoutMS=MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+                event_listeners=[PoolStatsListener(), MongoCommandListener()],
+                connect=False
+            )
+            client_state["pid"] = pid
+        return client_state["client"]
+
+# Get a database from the shared client
+def get_database(name):
+    return get_client()[name]
+
+# Copy of the pool statistics along with the configured pool size
+def get_pool_stats():
+    with pool_stats_lock:
+        stats = dict(pool_stats)
+    stats["max_pool_size"] = MONGODB_MAX_POOL_SIZE
+    stats["min_pool_size"] = MONGODB_MIN_POOL_SIZE
+    stats["checkout_wait_seconds_avg"] = stats["checkout_wait_seconds_total"] / stats["checkouts"] if stats["checkouts"] else 0.0
+    return stats
@@ -1,14 +1,40 @@
 from flask import Blueprint, jsonify, request
-from pymongo import MongoClient
 from dotenv import load_dotenv
 from bson import ObjectId
+from pymongo import UpdateOne, ReturnDocument
 import os
 import random
+import threading
+import time
 
 
 # Import all required variables and functions to construct the API calls for the users
+from auth.admin import require_admin
 from mongo.mongo_users import find_user
-from mongo.mongo_users import users_collection
+from mongo.mongo_users import get_users_collection
+from mongo.mongo_users import invalidate_user, clear_user_cache
+from mongo.mongo_client import get_database
+from mongo.question_bank import load_question_bank, has_day, random_unanswered_question, question_by_id, question_bank_report
+from mongo.question_store import list_question_days, day_questions
+from mongo.leaderboard import (
+    LEADERBOARD_PROJECTION,
+    LEADERBOARD_SIZE,
+    invalidate_leaderboard,
+    leaderboard_stats,
+    record_grammar_reset,
+    record_grammar_success,
+    streak_rank,
+    top_streaks
+)
+from mongo.review_queue import (
+    REVIEW_PROJECTION,
+    REVIEW_WRITE_ATTEMPTS,
+    drop_question,
+    review_answers,
+    review_root,
+    schedule_review_answers,
+    update_review_queue
+)
 
 
 # Create flask Blueprint for MongoDB routes
@@ -17,10 +43,264 @@ mongo_grammar = Blueprint('mongo_grammar', __name__)
 # Load environment variables
 load_dotenv()
 
-# Connections to the MongoDB database needed
-MONGODB_URI = os.getenv('MONGODB_URI')
-client = MongoClient(MONGODB_URI)
-grammar_database = client.grammar
+
+# Only the question fields the chatbot flow renders are returned to the client
+QUESTION_PROJECTION = {
+    "question": 1,
+    "options": 1,
+    "answer": 1,
+    "reasoning": 1
+}
+
+# The user fields the grammar endpoints read, the answer arrays are only fetched where they're needed
+DAYS_COMPLETED_PROJECTION = {"grammar.days_completed": 1}
+CORRECTLY_ANSWERED_PROJECTION = {"grammar.correctly_answered": 1}
+STREAK_PROJECTION = {"grammar.streak": 1}
+
+# The two updates of the daily grammar reset, in the order they have to run
+GRAMMAR_RESET_STEPS = [
+    # If grammar completed is false then streak will be reset to 0
+    (
+        {"grammar.grammar_completed": "FALSE"},
+        {"$set": {
+            "grammar.streak": 0,
+            "grammar.correctly_answered": [],
+            "grammar.incorrectly_answered": []
+        }}
+    ),
+    # If it's true then just grammar_completed will be changed to false
+    (
+        {"grammar.grammar_completed": {"$exists": True, "$ne": "FALSE"}},
+        {"$set": {"grammar.grammar_completed": "FALSE"}}
+    )
+]
+
+# Grammar day complete, increment streak +1, clear correctly_answered and set grammar_completed to true
+GRAMMAR_SUCCESS_UPDATE = {
+    "$inc": {"grammar.streak": 1},
+    "$set": {
+        "grammar.grammar_completed": "TRUE",
+        "grammar.correctly_answered": []
+        }
+}
+
+# Streaks returned by /leaderboard when no limit is sent, at most LEADERBOARD_SIZE can be asked for
+LEADERBOARD_DEFAULT_LIMIT = 10
+
+# Most answers a single /batch_updates call can carry
+GRAMMAR_BATCH_MAX_ANSWERS = int(os.getenv('GRAMMAR_BATCH_MAX_ANSWERS', 500))
+
+# Optionally serve questions from the in memory question bank instead of the DB
+# Enable it by setting GRAMMAR_QUESTION_BANK=TRUE, the bank is loaded on the first question request
+# Every worker loads it again once it's older than GRAMMAR_QUESTION_BANK_TTL seconds, so imported questions reach all of them
+QUESTION_BANK_ENABLED = os.getenv('GRAMMAR_QUESTION_BANK', 'FALSE').upper() == 'TRUE'
+GRAMMAR_QUESTION_BANK_TTL = float(os.getenv('GRAMMAR_QUESTION_BANK_TTL', 300))
+question_bank_load_lock = threading.Lock()
+question_bank_state = {"loaded": False, "loaded_at": 0.0}
+
+# In process cache of the grammar day collection names so the catalog isn't listed on every request
+# The TTL (in seconds) can be changed with the GRAMMAR_DAY_CATALOG_TTL environment variable
+GRAMMAR_DAY_CATALOG_TTL = float(os.getenv('GRAMMAR_DAY_CATALOG_TTL', 300))
+day_catalog_lock = threading.Lock()
+day_catalog = {
+    "days": None,
+    "loaded_at": 0.0,
+    "hits": 0,
+    "misses": 0,
+    "invalidations": 0
+}
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Grammar questions are in the grammar database, laid out by the question store (mongo/question_store.py)
+def get_grammar_database():
+    return get_database("grammar")
+
+# Run the daily grammar reset with one server side update per grammar_completed state
+# Users that didn't complete grammar are updated first so the second update doesn't pick them up again
+# Returns how many users had their streak reset and how many had grammar_completed set back to false
+def reset_grammar_streaks(collection):
+    return tuple(collection.update_many(f, u).matched_count for f, u in GRAMMAR_RESET_STEPS)
+
+# Get the cached grammar day names while they're still fresh, None means they have to be listed again
+def cached_grammar_days():
+    with day_catalog_lock:
+        if day_catalog["days"] is not None and time.monotonic() - day_catalog["loaded_at"] < GRAMMAR_DAY_CATALOG_TTL:
+            day_catalog["hits"] += 1
+            return day_catalog["days"]
+        day_catalog["misses"] += 1
+        return None
+
+# Save freshly listed grammar day names to the day catalog cache
+def store_grammar_days(day_names):
+    days = frozenset(day_names)
+    with day_catalog_lock:
+        day_catalog["days"] = days
+        day_catalog["loaded_at"] = time.monotonic()
+    return days
+
+# Get the names of all grammar days, served from the day catalog cache while it's still fresh
+def get_grammar_days():
+    days = cached_grammar_days()
+    if days is None:
+        # Cache is empty or expired so list the days from the question store again
+        days = store_grammar_days(list_question_days(get_grammar_database()))
+    return days
+
+# Convert question IDs saved as strings back to ObjectIds so they can be matched against _id
+# Both forms are kept since questions answered before could be saved either way
+def question_id_values(question_ids):
+    values = []
+    for question_id in question_ids:
+        values.append(question_id)
+        if isinstance(question_id, str) and ObjectId.is_valid(question_id):
+            values.append(ObjectId(question_id))
+    return values
+
+# Aggregation that picks a random question from a grammar day that isn't in the correctly answered list
+# Filtering and sampling both run in the DB so only the chosen question is sent back
+# day_filter selects the day's questions when they share a collection with other days (the consolidated question store)
+def random_question_pipeline(correctly_answered, day_filter=None):
+    return [
+        {"$match": {**(day_filter or {}), "_id": {"$nin": question_id_values(correctly_answered)}}},
+        {"$sample": {"size": 1}},
+        {"$project": QUESTION_PROJECTION}
+    ]
+
+# Pick a random question from a grammar day that isn't in the correctly answered list
+# Returns None when every question of the day has been answered correctly
+def sample_unanswered_question(collection, correctly_answered, day_filter=None):
+    for question in collection.aggregate(random_question_pipeline(correctly_answered, day_filter)):
+        return question
+    return None
+
+# Get a question of the review queue from the question bank when it has the day, otherwise from the question store
+def find_review_question(day, question_id):
+    if QUESTION_BANK_ENABLED:
+        ensure_question_bank()
+    if QUESTION_BANK_ENABLED and has_day(day):
+        return question_by_id(day, question_id)
+    collection, day_filter = day_questions(get_grammar_database(), day)
+    return collection.find_one({**day_filter, "_id": {"$in": question_id_values([question_id])}}, QUESTION_PROJECTION)
+
+# Expression for an array field with value appended when it isn't already in it, the pipeline version of $addToSet
+def add_to_set_expression(array, value):
+    return {"$cond": [
+        {"$in": [{"$literal": value}, array]},
+        array,
+        {"$concatArrays": [array, {"$literal": [value]}]}
+    ]}
+
+# Work out the updates to a user's grammar progress from the request body of /updates
+# Everything is one update pipeline so the answer is applied atomically in a single round trip:
+# the correctly answered question is removed from incorrectly_answered, then intro_completed is set and the lists are added to
+# Returns None when there is nothing to update
+def build_grammar_update_pipeline(data):
+    updates = {}
+    if "intro_completed" in data:
+        updates["grammar.intro_completed"] = {"$literal": data["intro_completed"]}
+
+    for key in ("days_completed", "correctly_answered"):
+        if key in data:
+            updates[f"grammar.{key}"] = add_to_set_expression({"$ifNull": [f"$grammar.{key}", []]}, data[key])
+
+    incorrectly_answered = {"$ifNull": ["$grammar.incorrectly_answered", []]}
+    if data.get("correctly_answered") is not None:
+        incorrectly_answered = {"$filter": {
+            "input": incorrectly_answered,
+            "cond": {"$ne": ["$$this", {"$literal": data["correctly_answered"]}]}
+        }}
+        updates["grammar.incorrectly_answered"] = incorrectly_answered
+    if "incorrectly_answered" in data:
+        updates["grammar.incorrectly_answered"] = add_to_set_expression(incorrectly_answered, data["incorrectly_answered"])
+
+    if not updates:
+        return None
+    return [{"$set": updates}]
+
+# Work out the writes for a /batch_updates request, the same updates a client would make one answer at a time:
+# intro_completed, each incorrect answer, each correct answer, days_completed, then grammar_success if it's true
+# Every answer is its own update pipeline so an ordered bulk_write applies them exactly like separate /updates calls
+# Raises ValueError when the request body isn't valid
+def build_grammar_batch_operations(data):
+    user_filter = {"user.email": data.get("user_email")}
+    correctly_answered = data.get("correctly_answered", [])
+    incorrectly_answered = data.get("incorrectly_answered", [])
+    days_completed = data.get("days_completed", [])
+    if not isinstance(days_completed, list):
+        days_completed = [days_completed]
+
+    if not isinstance(correctly_answered, list) or not isinstance(incorrectly_answered, list):
+        raise ValueError("correctly_answered and incorrectly_answered must be lists of question IDs")
+
+    # Skip empty values the same way the review queue does, a null days_completed would otherwise add None to the completed days
+    correctly_answered = [q for q in correctly_answered if q is not None and q != ""]
+    incorrectly_answered = [q for q in incorrectly_answered if q is not None and q != ""]
+    days_completed = [d for d in days_completed if d is not None and d != ""]
+    if len(correctly_answered) + len(incorrectly_answered) > GRAMMAR_BATCH_MAX_ANSWERS:
+        raise ValueError(f"A batch can have at most {GRAMMAR_BATCH_MAX_ANSWERS} answers")
+
+    bodies = []
+    if "intro_completed" in data:
+        bodies.append({"intro_completed": data["intro_completed"]})
+    bodies += [{"incorrectly_answered": q} for q in incorrectly_answered]
+    bodies += [{"correctly_answered": q} for q in correctly_answered]
+    bodies += [{"days_completed": d} for d in days_completed]
+
+    operations = [UpdateOne(user_filter, build_grammar_update_pipeline(body)) for body in bodies]
+    if data.get("grammar_success"):
+        operations.append(UpdateOne(user_filter, GRAMMAR_SUCCESS_UPDATE))
+    return operations
+
+# Check if the question bank has been loaded and isn't older than its TTL
+def question_bank_fresh():
+    return question_bank_state["loaded"] and time.monotonic() - question_bank_state["loaded_at"] < GRAMMAR_QUESTION_BANK_TTL
+
+# Load the question bank and mark it fresh
+def reload_question_bank():
+    day_count = load_question_bank(get_grammar_database(), QUESTION_PROJECTION.keys())
+    question_bank_state["loaded"] = True
+    question_bank_state["loaded_at"] = time.monotonic()
+    return day_count
+
+# Load the question bank the first time it's needed and again once it has expired
+# While one request reloads an expired bank the others keep using the current one instead of waiting
+def ensure_question_bank():
+    if question_bank_fresh():
+        return
+    if not question_bank_load_lock.acquire(blocking=not question_bank_state["loaded"]):
+        return
+    try:
+        if question_bank_fresh():
+            return
+        try:
+            reload_question_bank()
+        except Exception as e:
+            if not question_bank_state["loaded"]:
+                raise
+            # Keep serving the current bank and try again after another TTL
+            print(f"Error reloading question bank, keeping the current one: {e}")
+            question_bank_state["loaded_at"] = time.monotonic()
+    finally:
+        question_bank_load_lock.release()
+
+# Check the limit sent to /leaderboard, raises ValueError when it isn't a number between 1 and LEADERBOARD_SIZE
+def leaderboard_limit(data):
+    limit = data.get("limit", min(LEADERBOARD_DEFAULT_LIMIT, LEADERBOARD_SIZE))
+    if isinstance(limit, bool) or not isinstance(limit, int) or not 1 <= limit <= LEADERBOARD_SIZE:
+        raise ValueError(f"limit must be a number from 1 to {LEADERBOARD_SIZE}")
+    return limit
+
+# Drop the cached grammar days so the next request reloads them, used whenever grammar content changes
+def invalidate_grammar_days():
+    with day_catalog_lock:
+        day_catalog["days"] = None
+        day_catalog["invalidations"] += 1
+
 
 
 #######################
@@ -37,20 +317,20 @@ def get_uncompleted_grammar_day():
         user_email = data["user_email"]
 
         # Find the user in the DB
-        doc = find_user(user_email)
+        doc = find_user(user_email, DAYS_COMPLETED_PROJECTION)
 
         # Find out how many grammar days user has left
-        days_completed = doc["grammar"]["days_completed"]
-        day_collections = [a for a in grammar_database.list_collection_names()]
-        remaining = [a for a in day_collections if a not in days_completed]
+        days_completed = set(doc["grammar"]["days_completed"])
+        remaining = sorted(get_grammar_days() - days_completed)
 
         # If user has no grammar days left then reset the array and return the response
         if not remaining:
             # Reset the completed days array to be able to start working on grammar questions from the start
-            users_collection.update_one(
+            get_users_collection().update_one(
                 {"user.email": user_email},
                 {"$set": {"grammar.days_completed": []}}
             )
+            invalidate_user(user_email)
             return jsonify({
                 "success": False, 
                 "message": "You completed all grammar days so in order to continue your streak your progress was reset. Your streak remains unaffected."
@@ -72,6 +352,64 @@ def get_uncompleted_grammar_day():
         return jsonify({"success": False, "message": f"Error getting uncompleted grammar day: {str(e)}"}), 500
 
 
+# Return the day catalog cache counters so it's possible to confirm the catalog isn't listed on every request
+@mongo_grammar.route("/day_catalog_stats", methods=["GET"])
+def day_catalog_stats():
+    with day_catalog_lock:
+        return jsonify({
+            "success": True,
+            "cached": day_catalog["days"] is not None,
+            "day_count": len(day_catalog["days"] or ()),
+            "ttl_seconds": GRAMMAR_DAY_CATALOG_TTL,
+            "hits": day_catalog["hits"],
+            "misses": day_catalog["misses"],
+            "invalidations": day_catalog["invalidations"]
+        }), 200
+
+
+# Clear the day catalog cache after grammar content has been reloaded, only in the worker that answers
+@mongo_grammar.route("/day_catalog_invalidate", methods=["POST"])
+@require_admin
+def day_catalog_invalidate():
+    invalidate_grammar_days()
+    return jsonify({
+        "success": True,
+        "message": "Grammar day catalog cache cleared."
+    }), 200
+
+
+# Reload the question bank and day catalog after grammar content has been updated, only in the worker that answers
+# The other workers pick up the new questions once their bank and catalog expire
+@mongo_grammar.route("/question_bank/reload", methods=["POST"])
+@require_admin
+def question_bank_reload():
+    try:
+        invalidate_grammar_days()
+        with question_bank_load_lock:
+            day_count = reload_question_bank()
+
+        return jsonify({
+            "success": True,
+            "message": f"Question bank reloaded with {day_count} days."
+        }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error reloading question bank: {e}")
+        return jsonify({"success": False, "message": f"Error reloading question bank: {str(e)}"}), 500
+
+
+# Memory footprint of the question bank for each day
+@mongo_grammar.route("/question_bank/stats", methods=["GET"])
+def question_bank_stats():
+    return jsonify({
+        "success": True,
+        "enabled": QUESTION_BANK_ENABLED,
+        "ttl_seconds": GRAMMAR_QUESTION_BANK_TTL,
+        **question_bank_report()
+    }), 200
+
+
 # Get a random question from the grammar day collection that hasn't been answered correctly
 @mongo_grammar.route("/get_random_question", methods=["POST"])
 def get_random_question():
@@ -82,17 +420,22 @@ def get_random_question():
         chosen_day = data["chosen_day"]
 
         # Find the user in the DB
-        doc = find_user(user_email)
+        doc = find_user(user_email, CORRECTLY_ANSWERED_PROJECTION)
 
-        # Save all questions that haven't been answered to a list
-        # Convert all ObjectIds to strings for valid comparison
-        correctly_answered = set(str(x) for x in doc.get("grammar", {}).get("correctly_answered", []))
-        grammar_questions = list(grammar_database[chosen_day].find())
-        unanswered_questions = [a for a in grammar_questions if str(a["_id"]) not in correctly_answered]
+        # Let the DB filter out the correctly answered questions and pick a random one from the rest
+        correctly_answered = doc.get("grammar", {}).get("correctly_answered", [])
+
+        # Days that are in the question bank don't need a DB read, any other day falls back to the DB
+        if QUESTION_BANK_ENABLED:
+            ensure_question_bank()
+        if QUESTION_BANK_ENABLED and has_day(chosen_day):
+            chosen_question = random_unanswered_question(chosen_day, correctly_answered)
+        else:
+            collection, day_filter = day_questions(get_grammar_database(), chosen_day)
+            chosen_question = sample_unanswered_question(collection, correctly_answered, day_filter)
 
-        # If there are any unanswered questions chose a random one and return it
-        if unanswered_questions:
-            chosen_question = random.choice(unanswered_questions)
+        # If there are any unanswered questions return the chosen one
+        if chosen_question:
             # Need to convert ObjectIds to string first before returning
             chosen_question["_id"] = str(chosen_question["_id"])
             return jsonify({
@@ -114,6 +457,58 @@ def get_random_question():
         return jsonify({"success": False, "message": f"Error getting grammar question: {str(e)}"}), 500
 
 
+# Get the most overdue question of the user's review queue, the questions they got wrong come back after
+# 10 minutes, 1, 3, 7 and 21 days (GRAMMAR_REVIEW_INTERVALS) until they're answered right at every interval
+@mongo_grammar.route("/get_review_question", methods=["POST"])
+def get_review_question():
+    try:
+        # Parse data from request body
+        data = request.get_json()
+        user_email = data["user_email"]
+        users = get_users_collection()
+
+        # Only the root of the queue is read, a question that no longer exists is dropped and the next root is tried
+        for _ in range(REVIEW_WRITE_ATTEMPTS):
+            found, entry = review_root(users, user_email)
+            if not found:
+                return jsonify({"success": False, "message": "User not found"}), 404
+            if entry is None:
+                return jsonify({
+                    "success": True,
+                    "message": "There are no questions to review."
+                    }), 200
+
+            due, question_id, day, _ = entry
+            now = int(time.time())
+            if due > now:
+                return jsonify({
+                    "success": True,
+                    "message": "No questions are due for review yet.",
+                    "next_due": due
+                    }), 200
+
+            question = find_review_question(day, question_id)
+            if question:
+                # Need to convert ObjectIds to string first before returning
+                question["_id"] = str(question["_id"])
+                return jsonify({
+                    "success": True,
+                    "question": question,
+                    "day": day,
+                    "overdue_seconds": now - due
+                    }), 200
+
+            update_review_queue(users, user_email, lambda queue: drop_question(queue, question_id))
+            invalidate_user(user_email)
+
+        return jsonify({"success": True, "message": "There are no questions to review."}), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error getting review question: {e}")
+        return jsonify({"success": False, "message": f"Error getting review question: {str(e)}"}), 500
+
+
 # Update completed_intro, correctly_answered, incorrectly_answered, and days_completed
 @mongo_grammar.route("/updates", methods=["POST"])
 def updates():
@@ -122,69 +517,94 @@ def updates():
         data = request.get_json()
         user_email = data.get("user_email")
 
-        # Find user in the DB
-        doc = find_user(user_email)
-
-        # Create a list of all the IDs of the incorrctly answered questions
-        incorrectly_answered = doc.get("grammar", {}).get("incorrectly_answered", [])
-        print(f"Incorrectly answered: {incorrectly_answered}")
-
-        # Save correctly answered to its own var
-        correctly_answered = data.get("correctly_answered")
-        print(f"Correctly answered: {correctly_answered}")
-
-        # If there exists a correctly_answered question ID from data in the incorrectly_answered array, then remove it
-        if correctly_answered is not None: 
-            if data["correctly_answered"] in incorrectly_answered:
-                users_collection.update_one(
-                    {"user.email": user_email},
-                    {"$pull": {"grammar.incorrectly_answered": data.get("correctly_answered")}}
-                )
-                print("hello")
-            
-
-        # If the value of intro_completed or layout_value exists in data then prepare to update the user's DB
-        set_updates = {}
-        if "intro_completed" in data: 
-            set_updates["grammar.intro_completed"] = data.get("intro_completed")
-
-        # If either days_completed, or corrcetly_completed, or incorrectly_completed exist in data then prepare to push the update(s) to each respective list
-        push_updates = {}
-        if "days_completed" in data: 
-            push_updates["grammar.days_completed"] = data.get("days_completed")
-
-        if "correctly_answered" in data: 
-            push_updates["grammar.correctly_answered"] = data.get("correctly_answered")
-
-        if "incorrectly_answered" in data: 
-            push_updates["grammar.incorrectly_answered"] = data["incorrectly_answered"]      
-
-        # If any either set_updates or push_updates have prepared changes then commit them
-        if set_updates or push_updates:
-            # Push any changes to the user provided in user_email
-            users_collection.find_one_and_update(
-                    {"user.email": user_email},
-                    {
-                        "$set": set_updates,
-                        "$addToSet": push_updates
-                    })
-
-            # Return success
+        # Prepare the updates to the user's grammar progress
+        update_pipeline = build_grammar_update_pipeline(data)
+
+        # If there are no prepared changes there are no updates to be made
+        if update_pipeline is None:
             return jsonify({
-                "success": True,
-                "message": "Updated user succesfully"
+                "success": False,
+                "message": "No updates to be made."
             }), 200
-        
-        # If set_updates or push_updates don't exist there are no updates to be made
+
+        # Apply all the changes to the user provided in user_email in one atomic update
+        # Answers also bring back the review queue from before the update so it can be rescheduled without reading it again
+        users = get_users_collection()
+        answers = review_answers(data)
+        if answers:
+            before = users.find_one_and_update(
+                {"user.email": user_email},
+                update_pipeline,
+                projection=REVIEW_PROJECTION,
+                return_document=ReturnDocument.BEFORE
+            )
+            matched = before is not None
         else:
+            matched = users.update_one({"user.email": user_email}, update_pipeline).matched_count > 0
+
+        # Reschedule the answered questions in the review queue, "day" is the grammar day they came from
+        if answers and matched:
+            schedule_review_answers(users, user_email, answers, data.get("day"), before)
+        invalidate_user(user_email)
+        if not matched:
+            return jsonify({"success": False, "message": "Error updating user: user not found"}), 500
+
+        # Return success
+        return jsonify({
+            "success": True,
+            "message": "Updated user succesfully"
+        }), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error in grammar updates: {e}")
+        return jsonify({"success": False, "message": f"Error updating user: {str(e)}"}), 500
+
+
+# Apply a whole session of answers in one call, optionally finishing the grammar day as well
+# Same result as calling /updates for each answer and then /grammar_success, but sent to the DB in one ordered bulk write
+@mongo_grammar.route("/batch_updates", methods=["POST"])
+def batch_updates():
+    try:
+        # Parse data from request body
+        data = request.get_json()
+
+        # Prepare one write per answer, plus the success update if the day was completed
+        try:
+            operations = build_grammar_batch_operations(data)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        # If there are no prepared changes there are no updates to be made
+        if not operations:
             return jsonify({
                 "success": False,
                 "message": "No updates to be made."
             }), 200
 
+        # Apply all the writes in order in a single round trip
+        result = get_users_collection().bulk_write(operations, ordered=True)
+
+        # Reschedule the answered questions in the review queue, "day" is the grammar day they came from
+        answers = review_answers(data)
+        if answers and result.matched_count:
+            schedule_review_answers(get_users_collection(), data.get("user_email"), answers, data.get("day"))
+        invalidate_user(data.get("user_email"))
+        if data.get("grammar_success"):
+            invalidate_leaderboard()
+        if result.matched_count == 0:
+            return jsonify({"success": False, "message": "Error updating user: user not found"}), 500
+
+        # Return success
+        return jsonify({
+            "success": True,
+            "message": "Updated user succesfully",
+            "operations": len(operations)
+        }), 200
+
     # Take care of any exceptions that may come up with working with the DB
     except Exception as e:
-        print(f"Error in grammar updates: {e}")
+        print(f"Error in grammar batch_updates: {e}")
         return jsonify({"success": False, "message": f"Error updating user: {str(e)}"}), 500
 
 
@@ -196,20 +616,16 @@ def grammar_success():
         data = request.get_json()
         user_email = data.get("user_email")
 
-        # Find user in the DB
-        doc = find_user(user_email)
-
-        # Prepare success updates to the user's document
-        update = {
-            "$inc": {"grammar.streak": 1},
-            "$set": {
-                "grammar.grammar_completed": "TRUE",
-                "grammar.correctly_answered": []
-                }
-        }
-        
-        # Push updates to the DB
-        users_collection.update_one({"user.email": user_email}, update)
+        # Push success updates to the user's document, the updated streak comes back in the same round trip for the leaderboard
+        doc = get_users_collection().find_one_and_update(
+            {"user.email": user_email},
+            GRAMMAR_SUCCESS_UPDATE,
+            projection=LEADERBOARD_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        invalidate_user(user_email)
+        if doc:
+            record_grammar_success(doc)
 
         # Return success if no errors
         return jsonify({
@@ -229,44 +645,14 @@ def grammar_success():
 @mongo_grammar.route("/grammar_reset", methods=["POST"])
 def grammar_reset():
     try:
-        # Get all users in the database
-        users = list(users_collection.find({}))
-        reset_count = 0
-
-        # Run through all the users that exist in the DB
-        for user in users:
-            user_email = user.get('user', {}).get('email')
-
-            doc = find_user(user_email)
-
-            # Parse users grammar_completed value in order to determine the next action
-            grammar_completed = doc["grammar"]["grammar_completed"]
-
-            # If grammar completed is false then streak will be reset to 0
-            # If it's true then just grammar_completed will be changed to false
-            if grammar_completed == "FALSE":
-                update = {
-                    "$set": {
-                        "grammar.streak": 0,
-                        "grammar.correctly_answered": [],
-                        "grammar.incorrectly_answered": []
-                    }
-                }
-                users_collection.update_one({"user.email": user_email}, update)
-                reset_count += 1
-                print(f"Reset streak to 0 for user: {user_email}")
-            else:
-                update = {
-                    "$set": {
-                        "grammar.grammar_completed": "FALSE"
-                    }
-                }
-                users_collection.update_one({"user.email": user_email}, update)
-                reset_count += 1
-                print(f"Set grammar completed to false for user: {user_email}")
+        # Reset all the users in the DB with a fixed number of server side updates
+        streaks_reset, completed_reset = reset_grammar_streaks(get_users_collection())
+        clear_user_cache()
+        record_grammar_reset()
+        reset_count = streaks_reset + completed_reset
 
         # Print how many users were updated
-        print(f"Grammar reset complete. {reset_count} user's reset.")
+        print(f"Grammar reset complete. {reset_count} user's reset ({streaks_reset} streaks set to 0, {completed_reset} grammar completed set to false).")
 
         return jsonify ({
             "success": True,
@@ -276,4 +662,50 @@ def grammar_reset():
     # Take care of any exceptions that may come up with working with the DB
     except Exception as e:
         print(f"Error in grammar_reset: {e}")
-        return jsonify({"success": False, "message": f"Error reseting users: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"success": False, "message": f"Error reseting users: {str(e)}"}), 500
+
+
+# Top grammar streaks, plus the streak and rank of user_email when it's sent
+@mongo_grammar.route("/leaderboard", methods=["POST"])
+def grammar_leaderboard():
+    try:
+        # Parse data from request body
+        data = request.get_json(silent=True) or {}
+        try:
+            limit = leaderboard_limit(data)
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
+
+        users = get_users_collection()
+        response = {
+            "success": True,
+            "leaderboard": top_streaks(users, limit)
+        }
+
+        # Rank the user against everyone else
+        user_email = data.get("user_email")
+        if user_email:
+            doc = find_user(user_email, STREAK_PROJECTION)
+            if doc is None:
+                return jsonify({"success": False, "message": "User not found"}), 404
+            streak = doc.get("grammar", {}).get("streak") or 0
+            response["user"] = {
+                "streak": streak,
+                "rank": streak_rank(users, streak)
+            }
+
+        return jsonify(response), 200
+
+    # Take care of any exceptions that may come up with working with the DB
+    except Exception as e:
+        print(f"Error getting leaderboard: {e}")
+        return jsonify({"success": False, "message": f"Error getting leaderboard: {str(e)}"}), 500
+
+
+# Leaderboard counters, shows how often it's served from memory and how many ranks needed the index
+@mongo_grammar.route("/leaderboard_stats", methods=["GET"])
+def grammar_leaderboard_stats():
+    return jsonify({
+        "success": True,
+        **leaderboard_stats()
+    }), 200
@@ -1,30 +1,58 @@
 from flask import Blueprint, jsonify, Response, request
 from bson import json_util
-from pymongo import ReturnDocument, MongoClient
-from dotenv import load_dotenv
+from pymongo import ReturnDocument
 from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from collections import OrderedDict
+import copy
 import os
+import threading
+import time
 
 # Import all required variables and functions to construct the API calls for the users
 from auth.auth import generate_OTP
-from auth.auth import send_OTP_email
+from auth.auth import queue_OTP_email
+from auth.session_tokens import issue_session_token, SESSION_TOKEN_TTL
+from auth.rate_limit import rate_limited
+from auth.admin import require_admin
+from mongo.mongo_client import get_database
 
 
 # Create flask Blueprint for MongoDB routes
 mongo_user = Blueprint('mongo_user', __name__)
 
-# Load environment variables
-load_dotenv()
-
-# Connections to all the MongoDB collections needed
-MONGODB_URI = os.getenv('MONGODB_URI')
-client = MongoClient(MONGODB_URI)
-
-users_collection = client.web_app.users
-pending_users_collection = client.web_app.pending_users
-
-# Index to auto delete any unverified users
-pending_users_collection.create_index("created_at", expireAfterSeconds=900)
+# Indexes for the users and pending users collections are declared in mongo/indexes.py
+
+# Projections for the user lookups so each caller only fetches the fields it reads
+USER_EXISTS_PROJECTION = {"_id": 1}
+USER_LOGIN_PROJECTION = {"user.password": 1, "user.verified": 1, "user.time_zone": 1}
+USER_OTP_PROJECTION = {"user.OTP": 1}
+
+# Fields that are never sent back to the client
+USER_SECRET_FIELDS = ("password", "OTP")
+
+# get_user_info returns the whole document apart from the secrets unless the request asks for specific fields
+USER_INFO_PROJECTION = {f"user.{field}": 0 for field in USER_SECRET_FIELDS}
+
+# Optional in process LRU cache of user and pending user documents keyed by email
+# A grammar session reads the same user many times, with the cache on only the first read goes to the DB
+# Every write to a user calls invalidate_user so the next read gets the new document, entries also expire after USER_CACHE_TTL seconds
+# Each worker process has its own cache and a write in one worker can't invalidate the others,
+# so it's off by default and should only be turned on (USER_CACHE=TRUE) when the server runs a single worker
+USER_CACHE_ENABLED = os.getenv('USER_CACHE', 'FALSE').upper() == 'TRUE'
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 1000))
+USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))
+user_cache_lock = threading.Lock()
+user_cache = {
+    "entries": OrderedDict(),
+    # Bumped by every invalidation so a read that raced with a write doesn't cache the old document
+    "generation": 0,
+    "hits": 0,
+    "misses": 0,
+    "evictions": 0,
+    "expirations": 0,
+    "invalidations": 0
+}
 
 
 
@@ -33,20 +61,134 @@ pending_users_collection.create_index("created_at", expireAfterSeconds=900)
 #####################
 
 
-# Find a pending document by email
-def find_pending_user(user_email):
+# Collections are looked up on the shared client each time so nothing connects at import
+def get_users_collection():
+    return get_database("web_app").users
+
+def get_pending_users_collection():
+    return get_database("web_app").pending_users
+
+# Get a cached document, returns None when it isn't cached or has expired
+def get_cached_user(collection_name, user_email):
+    key = (collection_name, user_email)
+    with user_cache_lock:
+        entry = user_cache["entries"].get(key)
+        if entry is not None and time.monotonic() - entry["stored_at"] >= USER_CACHE_TTL:
+            del user_cache["entries"][key]
+            user_cache["expirations"] += 1
+            entry = None
+        if entry is None:
+            user_cache["misses"] += 1
+            return None
+        user_cache["entries"].move_to_end(key)
+        user_cache["hits"] += 1
+        return entry["doc"]
+
+# Current cache generation, taken before reading a document from the DB
+def user_cache_generation():
+    with user_cache_lock:
+        return user_cache["generation"]
+
+# Save a document read from the DB, unless the user was written to since the read started
+# The least recently used documents are evicted once the cache is full
+def store_cached_user(collection_name, user_email, doc, generation):
+    with user_cache_lock:
+        if generation != user_cache["generation"]:
+            return
+        entries = user_cache["entries"]
+        entries[(collection_name, user_email)] = {"doc": doc, "stored_at": time.monotonic()}
+        entries.move_to_end((collection_name, user_email))
+        while len(entries) > USER_CACHE_SIZE:
+            entries.popitem(last=False)
+            user_cache["evictions"] += 1
+
+# Drop the cached user and pending user documents for an email, called after every write to them
+def invalidate_user(user_email):
+    if not USER_CACHE_ENABLED:
+        return
+    with user_cache_lock:
+        user_cache["generation"] += 1
+        user_cache["invalidations"] += 1
+        user_cache["entries"].pop(("users", user_email), None)
+        user_cache["entries"].pop(("pending_users", user_email), None)
+
+# Drop every cached document, used by writes that touch many users like the grammar reset
+def clear_user_cache():
+    with user_cache_lock:
+        user_cache["generation"] += 1
+        user_cache["invalidations"] += 1
+        user_cache["entries"].clear()
+
+# Copy the value at a dotted path from one document to another, like an inclusion projection
+def copy_path(source, target, parts):
+    if not isinstance(source, dict) or parts[0] not in source:
+        return
+    if len(parts) == 1:
+        target[parts[0]] = copy.deepcopy(source[parts[0]])
+    elif isinstance(source[parts[0]], dict):
+        copy_path(source[parts[0]], target.setdefault(parts[0], {}), parts[1:])
+
+# Remove the value at a dotted path from a document, like an exclusion projection
+def remove_path(doc, parts):
+    if not isinstance(doc, dict) or parts[0] not in doc:
+        return
+    if len(parts) == 1:
+        del doc[parts[0]]
+    else:
+        remove_path(doc[parts[0]], parts[1:])
+
+# Copy of a cached document with only the fields find_one would have returned for the projection
+# Callers get their own copy so changing it never changes the cache
+def project_document(doc, projection):
+    if not projection:
+        return copy.deepcopy(doc)
+
+    fields = {path: value for path, value in projection.items() if path != "_id"}
+    include_id = projection.get("_id", 1)
+    if any(fields.values()) or (not fields and include_id):
+        result = {"_id": doc["_id"]} if include_id and "_id" in doc else {}
+        for path in fields:
+            copy_path(doc, result, path.split("."))
+        return result
+
+    result = copy.deepcopy(doc)
+    if not include_id:
+        result.pop("_id", None)
+    for path in fields:
+        remove_path(result, path.split("."))
+    return result
+
+# Read a user or pending user through the cache, the whole document is cached and the projection is applied to a copy
+def read_through_user(collection_name, collection, user_email, projection):
+    doc = get_cached_user(collection_name, user_email)
+    if doc is None:
+        generation = user_cache_generation()
+        doc = collection.find_one({"user.email": user_email})
+        if doc is None:
+            return None
+        store_cached_user(collection_name, user_email, doc, generation)
+    return project_document(doc, projection)
+
+# Find a pending document by email, only the fields in projection are fetched when one is given
+def find_pending_user(user_email, projection=None):
+    if USER_CACHE_ENABLED:
+        return read_through_user("pending_users", get_pending_users_collection(), user_email, projection)
+
     # Search MongoDB for a user with the email provided
-    user = pending_users_collection.find_one({"user.email": user_email})
+    user = get_pending_users_collection().find_one({"user.email": user_email}, projection)
     if user:
         return user
     else:
         # If no user document exists with the email then return None
         return None
 
-# Find a user document by email
-def find_user(user_email):
+# Find a user document by email, only the fields in projection are fetched when one is given
+def find_user(user_email, projection=None):
+    if USER_CACHE_ENABLED:
+        return read_through_user("users", get_users_collection(), user_email, projection)
+
     # Search MongoDB for a user with the email provided
-    user = users_collection.find_one({"user.email": user_email})
+    user = get_users_collection().find_one({"user.email": user_email}, projection)
     if user:
         return user
     else:
@@ -54,7 +196,7 @@ def find_user(user_email):
         return None
 
 # Create a new user document
-def create_new_user(user_name, user_email, user_password, otp):
+def create_new_user(user_name, user_email, user_password, otp, time_zone=None):
     user_document = {
         "user": {
             "name": user_name,
@@ -73,14 +215,19 @@ def create_new_user(user_name, user_email, user_password, otp):
             "grammar_completed": "FALSE"
         }
     }
+    # The daily grammar rollover resets users at midnight in this time zone, users without one are reset at midnight UTC
+    if time_zone:
+        user_document["user"]["time_zone"] = time_zone
+
     # Get the new user ID and return it as a success of the method
-    new_user = users_collection.insert_one(user_document).inserted_id
+    new_user = get_users_collection().insert_one(user_document).inserted_id
+    invalidate_user(user_email)
     return f"Successfully created new user with ID {new_user}"
     
 # Create a new pending user document that expires after a set amount of time if not verified
 def create_pending_user(user_email, otp):
-    doc1 = find_user(user_email)
-    doc2 = find_pending_user(user_email)
+    doc1 = find_user(user_email, USER_EXISTS_PROJECTION)
+    doc2 = find_pending_user(user_email, USER_EXISTS_PROJECTION)
 
     if doc1:
         return "Email already exists"
@@ -97,44 +244,110 @@ def create_pending_user(user_email, otp):
             "created_at": datetime.utcnow() 
         }
         # Get the new user ID and return it as a success of the method
-        pending_user = pending_users_collection.insert_one(user_document).inserted_id
+        pending_user = get_pending_users_collection().insert_one(user_document).inserted_id
+        invalidate_user(user_email)
         return f"User is pending verification with ID {pending_user}"
 
 # Delete pending user doc
 def delete_pending_user(user_email):
-    pending_users_collection.delete_one({"user.email": user_email})
+    get_pending_users_collection().delete_one({"user.email": user_email})
+    invalidate_user(user_email)
 
 # Update any verified user fields
 def update_user_fields(user_email: str, updates: dict):
-    return users_collection.find_one_and_update(
+    doc = get_users_collection().find_one_and_update(
         {"user.email": user_email},
         {"$set": updates},
         return_document=ReturnDocument.AFTER
 )
+    invalidate_user(user_email)
+    return doc
 
 # Update any pending user fields
 def update_pending_user_fields(user_email: str, updates: dict):
-    return pending_users_collection.find_one_and_update(
+    doc = get_pending_users_collection().find_one_and_update(
         {"user.email": user_email},
         {"$set": updates},
         return_document=ReturnDocument.AFTER
 )
+    invalidate_user(user_email)
+    return doc
+
+# Work out the user fields to $set from the request body of /updates
+def build_user_updates(data):
+    updates = {}
+    if "password" in data: 
+        updates["user.password"] = data["password"]
+    if "verified" in data: 
+        updates["user.verified"] = data["verified"]
+    if "intro_completed" in data: 
+        updates["user.intro_completed"] = data["intro_completed"]
+    if normalize_time_zone(data.get("time_zone")):
+        updates["user.time_zone"] = normalize_time_zone(data["time_zone"])
+    return updates
+
+# IANA time zone name sent by the client (e.g. "America/Toronto"), None if it's missing or not a zone the server knows
+def normalize_time_zone(name):
+    if not isinstance(name, str) or not name or len(name) > 64:
+        return None
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+    return name
+
+# Time zone to save for a user that just logged in, None when the client didn't send a valid one or it hasn't changed
+# Users that signed up before time zones were saved get theirs the next time they log in
+def login_time_zone_update(user, data):
+    time_zone = normalize_time_zone(data.get("time_zone"))
+    if time_zone and time_zone != user["user"].get("time_zone"):
+        return time_zone
+    return None
+
+# Work out the projection for get_user_info from the optional list of fields in the request body
+# Raises ValueError when fields isn't a list of field names
+# MongoDB rejects a projection with a path inside another one ("user" and "user.name"), so only the outer path is kept
+def build_user_info_projection(fields):
+    if fields is None:
+        return USER_INFO_PROJECTION
+    if not isinstance(fields, list) or not fields or not all(is_field_path(f) for f in fields):
+        raise ValueError("fields must be a list of field names, e.g. [\"user.name\", \"grammar.streak\"]")
+
+    projection = {}
+    # Shorter paths first so a path is only added when none of the ones before it contain it
+    for field in sorted(set(fields), key=lambda f: f.count(".")):
+        parts = field.split(".")
+        if not any(".".join(parts[:i]) in projection for i in range(1, len(parts))):
+            projection[field] = 1
+    return projection
+
+# A dotted field path without empty or operator parts, e.g. "user.name"
+def is_field_path(field):
+    return isinstance(field, str) and all(part and not part.startswith("$") for part in field.split("."))
+
+# Remove the password and OTP from a user document before it's returned, even if they were asked for
+def remove_secrets(doc):
+    user = doc.get("user")
+    if isinstance(user, dict):
+        for field in USER_SECRET_FIELDS:
+            user.pop(field, None)
+    return doc
 
 # Athenticate user when they log in
 def authenticate(user_email, user_password):
-    user = users_collection.find_one({
+    user = get_users_collection().find_one({
         "user.email": user_email,
         "user.password": user_password
-    })
+    }, USER_EXISTS_PROJECTION)
 
     if user:
         # If user with the user_email and user_password exists then return success
         return "Authentication successful!"
     else:
         # try to find user by the email provided
-        user = users_collection.find_one({
+        user = get_users_collection().find_one({
             "user.email": user_email
-        })
+        }, USER_EXISTS_PROJECTION)
 
         if user:
             # If the email is found in the DB output incorrect password provided
@@ -156,23 +369,29 @@ def get_user_info():
     try:
         data = request.get_json()
         user_email = data["user_email"]    
+
+        # Only fetch the fields that were asked for, the password and OTP are never returned
+        try:
+            projection = build_user_info_projection(data.get("fields"))
+        except ValueError as e:
+            return jsonify({"success": False, "message": str(e)}), 400
         
         # Try to find a user that has been verified
-        user = find_user(user_email)
+        user = find_user(user_email, projection)
         if user:
-            # If the user's email exists, then return the entire JSON object
+            # If the user's email exists, then return the requested fields of the JSON object
             return Response(json_util.dumps({
                                 "status": "verified",
-                                "user": user
+                                "user": remove_secrets(user)
                             }), mimetype="application/json"), 200
         else:
             # Look for the email in the pending state
-            user = find_pending_user(user_email)
+            user = find_pending_user(user_email, projection)
             if user:
-                 # If the pending user's email exists, then return the entire JSON object
+                 # If the pending user's email exists, then return the requested fields of the JSON object
                 return Response(json_util.dumps({
                                     "status": "pending",
-                                    "user": user
+                                    "user": remove_secrets(user)
                                 }), mimetype="application/json"), 200
                                 
             # If the user's email doesn't exist, return Not Found
@@ -198,13 +417,7 @@ def update_user():
         user_email = data["user_email"]
 
         # If password and verified status are set in the request body then save them to the updates array
-        updates = {}
-        if "password" in data: 
-            updates["user.password"] = data["password"]
-        if "verified" in data: 
-            updates["user.verified"] = data["verified"]
-        if "intro_completed" in data: 
-            updates["user.intro_completed"] = data["intro_completed"]
+        updates = build_user_updates(data)
 
         # If no values are set then return "No data provided"
         if not updates:
@@ -237,6 +450,7 @@ def update_user():
 
 # API endpiont that generates pending state for user with OTP and sends email with OTP
 @mongo_user.route("/signup", methods=["POST"])
+@rate_limited
 def signup():
     try:
         # Get the user email from the json body
@@ -247,19 +461,19 @@ def signup():
         otp = generate_OTP()
 
         # Verify that email doesn't already exist
-        user = find_user(user_email)
+        user = find_user(user_email, USER_EXISTS_PROJECTION)
         if user:
             return jsonify({
                 "success": False,
                 "message": "Email already exists."
             }), 400
-        user = find_pending_user(user_email)
+        user = find_pending_user(user_email, USER_EXISTS_PROJECTION)
         # If user already exists in the pending state, resend otp code
         if user:
             updates = {}
             updates["user.OTP"] = otp
             update_pending_user_fields(user_email, updates)
-            send_OTP_email(user_email, otp)
+            queue_OTP_email(user_email, otp)
             return jsonify({
                 "success": True,
                 "message": "Email already exists. Resending the OTP code for sign up."
@@ -267,7 +481,7 @@ def signup():
 
         # If email didn't already exist, then create a new pending user and send an email with OTP code
         create_pending_user(user_email, otp)
-        send_OTP_email(user_email, otp)
+        queue_OTP_email(user_email, otp)
 
         return jsonify({
             "success": True,
@@ -281,6 +495,7 @@ def signup():
 
 # To verify OTP codes for both pending and verified users
 @mongo_user.route("/verification", methods=["POST"])
+@rate_limited
 def verification():
     try:
         # Get user data from the json body
@@ -290,7 +505,7 @@ def verification():
         input_otp = data["input_otp"]
 
         # Find user by email
-        user = find_user(user_email)
+        user = find_user(user_email, USER_OTP_PROJECTION)
 
         # If user exists, then compare the OTP code saved in their json document to the one they provide to verify them
         # This will be used for password resets
@@ -303,9 +518,10 @@ def verification():
                 new_OTP = generate_OTP()
                 set_updates["user.OTP"] = new_OTP
 
-                doc = users_collection.find_one_and_update(
+                doc = get_users_collection().find_one_and_update(
                     {"user.email": user_email},
                     {"$set": set_updates,})
+                invalidate_user(user_email)
 
                 return jsonify({
                 "success": True,
@@ -324,7 +540,7 @@ def verification():
             user_name = data["user_name"]
             user_password = data["user_password"]
 
-            pending_user = find_pending_user(user_email)
+            pending_user = find_pending_user(user_email, USER_OTP_PROJECTION)
             generated_otp = pending_user["user"]["OTP"]
 
             # If email doesn't exist in pending users doc, then the email doesn't exist in the DB
@@ -337,7 +553,7 @@ def verification():
             # Compare to see if the OTP code from the user doc matches the OTP code provided by the user
             # If they match then create a new verified user in the verified user doc and delete the doc from the pending user doc
             if generated_otp == input_otp:
-                create_new_user(user_name, user_email, user_password, input_otp)
+                create_new_user(user_name, user_email, user_password, input_otp, normalize_time_zone(data.get("time_zone")))
                 delete_pending_user(user_email)
 
                 # Create a new OTP code and push it to the database so user can't use the same one again
@@ -345,9 +561,10 @@ def verification():
                 new_OTP = generate_OTP()
                 set_updates["user.OTP"] = new_OTP
 
-                doc = users_collection.find_one_and_update(
+                doc = get_users_collection().find_one_and_update(
                     {"user.email": user_email},
                     {"$set": set_updates,})
+                invalidate_user(user_email)
 
                 return jsonify({
                     "success": True,
@@ -368,6 +585,7 @@ def verification():
 
 # Resend OTP code to both pending and verified users
 @mongo_user.route("/resend_otp", methods=["PATCH"])
+@rate_limited
 def resend_otp():
     try:
         data = request.get_json()
@@ -387,7 +605,7 @@ def resend_otp():
                         "message": "Email doesn't exist, please sign up."
                     }), 400
         
-        send_OTP_email(user_email, new_otp)
+        queue_OTP_email(user_email, new_otp)
 
         return jsonify({
                     "success": True,
@@ -407,7 +625,7 @@ def authentication():
         input_email = data.get("user_email")
         input_password = data.get("user_password")
 
-        user = find_user(input_email)
+        user = find_user(input_email, USER_LOGIN_PROJECTION)
 
         if not user:
             return jsonify({
@@ -417,10 +635,18 @@ def authentication():
 
         actual_password = user["user"]["password"]
 
+        # Send back a signed session token so the chat endpoints don't have to look the user up again
         if actual_password == input_password:
+            # Keep the saved time zone up to date for the daily grammar rollover
+            time_zone = login_time_zone_update(user, data)
+            if time_zone:
+                update_user_fields(input_email, {"user.time_zone": time_zone})
+
             return jsonify({
                 "success": True,
-                "message": "Successful login!"
+                "message": "Successful login!",
+                "token": issue_session_token(input_email, user["user"].get("verified", False)),
+                "expires_in": SESSION_TOKEN_TTL
             }), 200
         else:
             return jsonify({
@@ -430,4 +656,33 @@ def authentication():
 
     except Exception as e:
         print(f"Error authenticating user: {e}")
-        return jsonify({"success": False, "message": f"Error authenticating user: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"success": False, "message": f"Error authenticating user: {str(e)}"}), 500
+
+
+# Hit, miss and eviction counters for this worker's user document cache
+@mongo_user.route("/user_cache_stats", methods=["GET"])
+def user_cache_stats():
+    with user_cache_lock:
+        return jsonify({
+            "success": True,
+            "enabled": USER_CACHE_ENABLED,
+            "size": len(user_cache["entries"]),
+            "max_size": USER_CACHE_SIZE,
+            "ttl_seconds": USER_CACHE_TTL,
+            "hits": user_cache["hits"],
+            "misses": user_cache["misses"],
+            "evictions": user_cache["evictions"],
+            "expirations": user_cache["expirations"],
+            "invalidations": user_cache["invalidations"]
+        }), 200
+
+
+# Clear this worker's user document cache, e.g. after users were edited directly in the DB
+@mongo_user.route("/user_cache_invalidate", methods=["POST"])
+@require_admin
+def user_cache_invalidate():
+    clear_user_cache()
+    return jsonify({
+        "success": True,
+        "message": "User cache cleared."
+    }), 200
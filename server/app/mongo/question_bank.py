@@ -0,0 +1,135 @@
+import random
+import sys
+import threading
+import time
+
+from mongo.question_store import iter_day_questions
+
+
+# In memory copy of every grammar day so questions can be picked without a DB read
+# Each day keeps its questions in dense arrays (position i is question i) plus a map from question ID to position
+question_bank_lock = threading.Lock()
+question_bank = {
+    "fields": (),
+    "days": {},
+    "loaded_at": None,
+    "load_seconds": 0.0,
+    "reloads": 0
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Load every grammar day from the question store and swap it in as the new question bank
+# Only the fields passed in are kept for each question, in the same order for every question
+def load_question_bank(grammar_database, fields):
+    start = time.perf_counter()
+    fields = tuple(fields)
+    projection = {field: 1 for field in fields}
+
+    days = {}
+    for day, questions in iter_day_questions(grammar_database, projection):
+        ids = []
+        rows = []
+        for question in questions:
+            ids.append(str(question["_id"]))
+            rows.append(tuple(question.get(field) for field in fields))
+
+        days[day] = {
+            "ids": tuple(ids),
+            "rows": tuple(rows),
+            "index": {question_id: i for i, question_id in enumerate(ids)}
+        }
+
+    # Replace the whole bank at once so requests never see a half loaded bank
+    with question_bank_lock:
+        question_bank["fields"] = fields
+        question_bank["days"] = days
+        question_bank["loaded_at"] = time.time()
+        question_bank["load_seconds"] = time.perf_counter() - start
+        question_bank["reloads"] += 1
+
+    print(f"Question bank loaded {len(days)} days in {question_bank['load_seconds']:.3f}s")
+    return len(days)
+
+# Check if a day is available in the question bank
+def has_day(day):
+    return day in question_bank["days"]
+
+# Pick a random question from a day that isn't in the correctly answered list
+# Only the answered positions that belong to this day are looked at, the day itself is never copied or scanned
+# Returns None when every question of the day has been answered correctly
+def random_unanswered_question(day, correctly_answered):
+    fields = question_bank["fields"]
+    day_questions = question_bank["days"].get(day)
+    if day_questions is None:
+        return None
+
+    # Positions of the questions of this day the user already answered correctly
+    index = day_questions["index"]
+    answered = sorted({index[str(a)] for a in correctly_answered if str(a) in index})
+
+    remaining = len(day_questions["ids"]) - len(answered)
+    if remaining <= 0:
+        return None
+
+    # Choose the r-th unanswered question and step over every answered position at or before it
+    position = random.randrange(remaining)
+    for answered_position in answered:
+        if answered_position <= position:
+            position += 1
+        else:
+            break
+
+    question = dict(zip(fields, day_questions["rows"][position]))
+    question["_id"] = day_questions["ids"][position]
+    return question
+
+# Get one question of a day by its ID, None when it isn't in the question bank
+def question_by_id(day, question_id):
+    fields = question_bank["fields"]
+    day_questions = question_bank["days"].get(day)
+    position = day_questions["index"].get(str(question_id)) if day_questions else None
+    if position is None:
+        return None
+
+    question = dict(zip(fields, day_questions["rows"][position]))
+    question["_id"] = day_questions["ids"][position]
+    return question
+
+# Rough size in bytes of an object and everything it holds
+def deep_sizeof(obj, seen=None):
+    seen = seen if seen is not None else set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(a, seen) for a in obj)
+    return size
+
+# Memory footprint of the question bank for each day
+def question_bank_report():
+    with question_bank_lock:
+        days = question_bank["days"]
+        report = {
+            day: {
+                "questions": len(day_questions["ids"]),
+                "bytes": deep_sizeof(day_questions)
+            }
+            for day, day_questions in sorted(days.items())
+        }
+        return {
+            "loaded_at": question_bank["loaded_at"],
+            "load_seconds": question_bank["load_seconds"],
+            "reloads": question_bank["reloads"],
+            "total_bytes": sum(a["bytes"] for a in report.values()),
+            "days": report
+        }
@@ -0,0 +1,270 @@
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from dotenv import load_dotenv
+from datetime import datetime, timezone
+from itertools import islice
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+
+# Import the shared client so imports use the same connection settings as the app
+from mongo.mongo_client import get_database
+from mongo.question_store import GRAMMAR_METADATA_PREFIX, is_consolidated, day_questions, ensure_question_store_indexes, refresh_day_counts
+
+
+# Load environment variables
+load_dotenv()
+
+# Streaming importer for grammar question files, writes to whichever question store is in use (see mongo/question_store.py)
+# Files are read a batch at a time so memory stays the same whatever the size of the file
+# Each question gets an import_key (its "key" from the file, or a hash of the question text) and a hash of its content:
+#   - a question whose key isn't in its day yet is inserted
+#   - a question whose content hash changed is updated in place, so its _id (saved in users' answer arrays) never changes
+#   - anything else isn't written at all
+# Questions that were added by hand get an import_key from their text the first time their day is imported, so they keep their _id too
+# Usage (from the app directory): python -m mongo.question_import questions.jsonl [more.csv ...] [--dry-run]
+#
+# JSONL: one question per line
+#   {"day": "day_1", "key": "optional-stable-id", "question": "...", "options": {"option_a": "...", ...}, "answer": "option_a", "reasoning": "..."}
+# CSV: a header row with day, question, answer, reasoning, an option_ column per option and an optional key column
+# Either can be gzipped (.gz)
+
+# Questions per batch, one lookup and one bulk write per day in the batch
+QUESTION_IMPORT_BATCH_SIZE = int(os.getenv("QUESTION_IMPORT_BATCH_SIZE", 1000))
+
+# Fields of a question that are imported, the content hash covers all of them
+QUESTION_CONTENT_FIELDS = ("question", "options", "answer", "reasoning")
+
+# Import runs are kept in a metadata collection of the grammar database, the _ prefix means it's never a grammar day
+IMPORT_RUNS_COLLECTION = f"{GRAMMAR_METADATA_PREFIX}imports"
+
+# Names of days created by the importer, letters, digits, _ and - only
+DAY_NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+# Most invalid rows listed in the report, every one of them is still counted
+MAX_REPORTED_ERRORS = 50
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# SHA-256 of a question's content, the same content always gives the same hash whatever the key order
+def content_hash(question):
+    content = {field: question.get(field) for field in QUESTION_CONTENT_FIELDS}
+    return hashlib.sha256(json.dumps(content, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode()).hexdigest()
+
+# Key of a question without one in the file, the hash of its text with case and spacing ignored
+def question_text_key(text):
+    return hashlib.sha256(" ".join(text.split()).casefold().encode()).hexdigest()
+
+# Open a question file, gzipped or not
+def open_question_file(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+# Yield (line number, row) for every question in a file, row is a dict or an error message for lines that can't be parsed
+def read_question_rows(path):
+    is_csv = path.removesuffix(".gz").lower().endswith(".csv")
+    with open_question_file(path) as f:
+        if is_csv:
+            # Options are the option_ columns that have a value
+            reader = csv.DictReader(f)
+            for row in reader:
+                options = {k: v for k, v in row.items() if k and k.startswith("option_") and v}
+                question = {k: v for k, v in row.items() if k and not k.startswith("option_") and v != ""}
+                question["options"] = options
+                yield f"{path}:{reader.line_num}", question
+        else:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield f"{path}:{line_number}", json.loads(line)
+                except ValueError as e:
+                    yield f"{path}:{line_number}", f"invalid JSON: {e}"
+
+# Check a row and turn it into the document that's saved, returns (document, None) or (None, error)
+def validate_question(row):
+    if not isinstance(row, dict):
+        return None, row if isinstance(row, str) else "not a JSON object"
+
+    day = row.get("day")
+    if not isinstance(day, str) or not DAY_NAME_PATTERN.match(day):
+        return None, "day must be letters, digits, _ or - (at most 64)"
+    question = row.get("question")
+    if not isinstance(question, str) or not question.strip():
+        return None, "question is missing"
+    options = row.get("options")
+    if not isinstance(options, dict) or len(options) < 2 or not all(isinstance(k, str) and isinstance(v, str) and v for k, v in options.items()):
+        return None, "options must have at least two options with text"
+    answer = row.get("answer")
+    if answer not in options:
+        return None, f"answer {answer!r} isn't one of the options"
+    reasoning = row.get("reasoning")
+    if reasoning is not None and not isinstance(reasoning, str):
+        return None, "reasoning must be text"
+    key = row.get("key")
+    if key is not None and (not isinstance(key, str) or not key):
+        return None, "key must be text"
+
+    doc = {"question": question, "options": options, "answer": answer}
+    if reasoning:
+        doc["reasoning"] = reasoning
+    doc["import_key"] = key or question_text_key(question)
+    doc["content_hash"] = content_hash(doc)
+    return (day, doc), None
+
+# Give questions added by hand an import_key and content hash so the import matches them instead of adding copies
+# Runs in batches, a question whose text key is already taken keeps its own _id as key
+# day_filter selects the day's questions in the consolidated store
+def backfill_import_keys(collection, day_filter=None, batch_size=QUESTION_IMPORT_BATCH_SIZE):
+    backfilled = 0
+    day_filter = day_filter or {}
+    cursor = collection.find({**day_filter, "import_key": {"$exists": False}}, {field: 1 for field in QUESTION_CONTENT_FIELDS})
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            return backfilled
+
+        keys = {}
+        seen = set()
+        for question in batch:
+            key = question_text_key(question.get("question") or str(question["_id"]))
+            keys[question["_id"]] = str(question["_id"]) if key in seen else key
+            seen.add(key)
+        taken = {d["import_key"] for d in collection.find({**day_filter, "import_key": {"$in": list(keys.values())}}, {"import_key": 1})}
+        collection.bulk_write([
+            UpdateOne({"_id": question["_id"]}, {"$set": {
+                "import_key": str(question["_id"]) if keys[question["_id"]] in taken else keys[question["_id"]],
+                "content_hash": content_hash(question)
+            }})
+            for question in batch
+        ], ordered=False)
+        backfilled += len(batch)
+
+# Get a day ready for importing the first time it's seen in a run
+def prepare_day(grammar_database, day, dry_run):
+    if dry_run:
+        return 0
+    collection, day_filter = day_questions(grammar_database, day)
+    backfilled = backfill_import_keys(collection, day_filter)
+    if is_consolidated():
+        ensure_question_store_indexes(grammar_database)
+    else:
+        collection.create_index("import_key", name="import_key_unique", unique=True)
+    return backfilled
+
+# Write one batch of questions, only new and changed questions are written
+def import_batch(grammar_database, batch, stats, prepared_days, dry_run):
+    # Group by day, the last copy of a key in the batch wins
+    days = {}
+    for day, doc in batch:
+        days.setdefault(day, {})[doc["import_key"]] = doc
+
+    for day, docs in days.items():
+        collection, day_filter = day_questions(grammar_database, day)
+        if day not in prepared_days:
+            stats["backfilled"] += prepare_day(grammar_database, day, dry_run)
+            prepared_days.add(day)
+
+        existing = {d["import_key"]: d for d in collection.find({**day_filter, "import_key": {"$in": list(docs)}}, {"import_key": 1, "content_hash": 1})}
+        operations = []
+        for key, doc in docs.items():
+            current = existing.get(key)
+            if current is None:
+                operations.append(InsertOne({**day_filter, **doc}))
+                stats["inserted"] += 1
+            elif current.get("content_hash") != doc["content_hash"]:
+                update = {"$set": doc}
+                removed = {field: "" for field in QUESTION_CONTENT_FIELDS if field not in doc}
+                if removed:
+                    update["$unset"] = removed
+                operations.append(UpdateOne({"_id": current["_id"]}, update))
+                stats["updated"] += 1
+            else:
+                stats["unchanged"] += 1
+
+        if operations and not dry_run:
+            collection.bulk_write(operations, ordered=False)
+
+# Import question files a batch at a time, returns the counters of the run
+def import_question_files(paths, batch_size=QUESTION_IMPORT_BATCH_SIZE, dry_run=False):
+    grammar_database = get_database("grammar")
+    stats = {
+        "files": list(paths),
+        "dry_run": dry_run,
+        "rows": 0,
+        "invalid": 0,
+        "inserted": 0,
+        "updated": 0,
+        "unchanged": 0,
+        "backfilled": 0,
+        "errors": []
+    }
+    prepared_days = set()
+    start = time.perf_counter()
+
+    def valid_questions():
+        for path in paths:
+            for location, row in read_question_rows(path):
+                stats["rows"] += 1
+                question, error = validate_question(row)
+                if error:
+                    stats["invalid"] += 1
+                    if len(stats["errors"]) < MAX_REPORTED_ERRORS:
+                        stats["errors"].append(f"{location}: {error}")
+                    continue
+                yield question
+
+    questions = valid_questions()
+    while True:
+        batch = list(islice(questions, batch_size))
+        if not batch:
+            break
+        import_batch(grammar_database, batch, stats, prepared_days, dry_run)
+
+    stats["days"] = sorted(prepared_days)
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else None
+
+    # The consolidated store lists days from their question counts
+    if not dry_run and is_consolidated():
+        refresh_day_counts(grammar_database, stats["days"])
+
+    # Keep a record of every import next to the days it wrote to
+    if not dry_run:
+        grammar_database[IMPORT_RUNS_COLLECTION].insert_one(dict(stats, finished_at=datetime.now(timezone.utc)))
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import grammar questions from JSONL or CSV files")
+    parser.add_argument("paths", nargs="+", help="question files (.jsonl, .csv, optionally .gz)")
+    parser.add_argument("--batch-size", type=int, default=QUESTION_IMPORT_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="validate and count without writing anything (questions added by hand count as new)")
+    args = parser.parse_args()
+
+    try:
+        result = import_question_files(args.paths, args.batch_size, args.dry_run)
+    except (OSError, BulkWriteError, PyMongoError) as e:
+        print(f"Error importing questions: {e}")
+        sys.exit(1)
+
+    for error in result["errors"]:
+        print(f"Skipped {error}")
+    print(f"{result['rows']} rows in {result['seconds']:.1f}s: {result['inserted']} inserted, {result['updated']} updated, "
+          f"{result['unchanged']} unchanged, {result['invalid']} invalid, {result['backfilled']} existing questions given an import key"
+          + (" (dry run, nothing written)" if args.dry_run else ""))
+    if not args.dry_run and (result["inserted"] or result["updated"]):
+        print("Running servers pick up the new questions once their question bank (GRAMMAR_QUESTION_BANK_TTL) and day catalog (GRAMMAR_DAY_CATALOG_TTL) expire")
+    sys.exit(1 if result["invalid"] else 0)
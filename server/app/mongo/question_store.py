@@ -0,0 +1,167 @@
+from pymongo import ReplaceOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from dotenv import load_dotenv
+from datetime import datetime, timezone
+from itertools import groupby, islice
+import os
+import sys
+import time
+
+# Import the shared client so the migration uses the same connection settings as the app
+from mongo.mongo_client import get_database
+
+
+# Load environment variables
+load_dotenv()
+
+# Where the grammar questions are stored, set with GRAMMAR_QUESTION_STORE
+#   collections  - one collection per day in the grammar database, the original layout
+#   consolidated - every question in grammar._questions with its day (indexed on day, _id) and the question count of
+#                  every day in grammar._days, so listing days is one indexed read instead of listing the whole catalog
+# The grammar endpoints, the question bank and the importer all go through the functions below so they work with either one
+# Move the questions over with: cd app && python -m mongo.question_store migrate
+QUESTION_STORE = os.getenv("GRAMMAR_QUESTION_STORE", "collections").lower()
+CONSOLIDATED_STORE = "consolidated"
+
+# Collections in the grammar database starting with _ hold the consolidated store and import metadata, they're never days
+GRAMMAR_METADATA_PREFIX = "_"
+QUESTIONS_COLLECTION = "_questions"
+DAYS_COLLECTION = "_days"
+
+# Days listed by the consolidated store, the ones that have questions
+DAYS_WITH_QUESTIONS = {"question_count": {"$gt": 0}}
+
+# Questions copied per bulk write by the migration
+QUESTION_MIGRATION_BATCH_SIZE = int(os.getenv("QUESTION_MIGRATION_BATCH_SIZE", 1000))
+
+# Indexes of the consolidated store, also registered in mongo/indexes.py when it's in use
+QUESTION_STORE_INDEXES = [
+    # Picking a random question and loading a day both filter on day
+    {"keys": [("day", 1), ("_id", 1)], "name": "day_id"},
+    # The importer matches questions of a day on their import_key
+    {"keys": [("day", 1), ("import_key", 1)], "name": "day_import_key_unique", "unique": True,
+     "partialFilterExpression": {"import_key": {"$exists": True}}}
+]
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+def is_consolidated(store=None):
+    return (store or QUESTION_STORE) == CONSOLIDATED_STORE
+
+# In the per day layout every collection in the grammar database is a day apart from the metadata and system collections
+def is_grammar_day(name):
+    return not name.startswith(GRAMMAR_METADATA_PREFIX) and not name.startswith("system.")
+
+# The collection that holds a day's questions and the filter that selects them
+def day_questions(grammar_database, day, store=None):
+    if is_consolidated(store):
+        return grammar_database[QUESTIONS_COLLECTION], {"day": day}
+    return grammar_database[day], {}
+
+# Names of every grammar day
+def list_question_days(grammar_database, store=None):
+    if is_consolidated(store):
+        return [d["_id"] for d in grammar_database[DAYS_COLLECTION].find(DAYS_WITH_QUESTIONS, {"_id": 1})]
+    return [name for name in grammar_database.list_collection_names() if is_grammar_day(name)]
+
+# Same as list_question_days for a motor database
+async def async_list_question_days(grammar_database, store=None):
+    if is_consolidated(store):
+        return [d["_id"] async for d in grammar_database[DAYS_COLLECTION].find(DAYS_WITH_QUESTIONS, {"_id": 1})]
+    return [name for name in await grammar_database.list_collection_names() if is_grammar_day(name)]
+
+# Yield (day, questions) for every day with its questions sorted by _id, for loading every question at once
+# The consolidated store reads everything with one cursor over the (day, _id) index instead of one query per day
+def iter_day_questions(grammar_database, projection, store=None):
+    if is_consolidated(store):
+        cursor = grammar_database[QUESTIONS_COLLECTION].find({}, {**projection, "day": 1}).sort([("day", 1), ("_id", 1)])
+        yield from groupby(cursor, key=lambda question: question["day"])
+        return
+    for day in list_question_days(grammar_database, store):
+        yield day, grammar_database[day].find({}, projection).sort("_id", 1)
+
+# Build the indexes of the consolidated store, existing indexes with the same definition are left alone
+def ensure_question_store_indexes(grammar_database):
+    for index in QUESTION_STORE_INDEXES:
+        options = {k: v for k, v in index.items() if k != "keys"}
+        grammar_database[QUESTIONS_COLLECTION].create_index(index["keys"], **options)
+
+# Count the questions of some days again and save the counts in the days collection
+def refresh_day_counts(grammar_database, days):
+    counts = {}
+    for day in days:
+        counts[day] = grammar_database[QUESTIONS_COLLECTION].count_documents({"day": day})
+        grammar_database[DAYS_COLLECTION].update_one(
+            {"_id": day},
+            {"$set": {"question_count": counts[day], "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    return counts
+
+# Copy every day collection into the consolidated store, questions keep their _id so users' answer arrays still match
+# Safe to run again, questions that were already copied are replaced with the current version
+# The day collections are left in place, drop them by hand once the server runs on the consolidated store
+def migrate_to_consolidated(grammar_database, batch_size=QUESTION_MIGRATION_BATCH_SIZE, verbose=True):
+    start = time.perf_counter()
+    ensure_question_store_indexes(grammar_database)
+    questions = grammar_database[QUESTIONS_COLLECTION]
+    stats = {"days": 0, "copied": 0, "conflicts": 0, "mismatched_days": []}
+
+    for day in sorted(filter(is_grammar_day, grammar_database.list_collection_names())):
+        cursor = grammar_database[day].find().sort("_id", 1)
+        while True:
+            batch = list(islice(cursor, batch_size))
+            if not batch:
+                break
+            # Matching on day as well means a question _id that's already used by another day fails instead of being moved
+            operations = [ReplaceOne({"_id": q["_id"], "day": day}, dict(q, day=day), upsert=True) for q in batch]
+            try:
+                questions.bulk_write(operations, ordered=False)
+                stats["copied"] += len(batch)
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                stats["conflicts"] += len(errors)
+                stats["copied"] += len(batch) - len(errors)
+                for error in errors[:5]:
+                    print(f"Couldn't copy question {batch[error['index']]['_id']} of {day}: {error.get('errmsg')}")
+
+        # Check the copy against the source
+        count = refresh_day_counts(grammar_database, [day])[day]
+        if count != grammar_database[day].count_documents({}):
+            stats["mismatched_days"].append(day)
+        stats["days"] += 1
+        if verbose:
+            print(f"Copied {day} ({count} questions)")
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+if __name__ == "__main__":
+    # cd app && python -m mongo.question_store migrate  - copy the day collections into the consolidated store
+    # cd app && python -m mongo.question_store counts   - recount the questions of every day in the consolidated store
+    command = sys.argv[1] if len(sys.argv) > 1 else None
+    grammar = get_database("grammar")
+    try:
+        if command == "migrate":
+            result = migrate_to_consolidated(grammar)
+            print(f"Copied {result['copied']} questions of {result['days']} days in {result['seconds']:.1f}s, {result['conflicts']} conflicts")
+            if result["mismatched_days"]:
+                print(f"Question counts don't match for: {', '.join(result['mismatched_days'])}")
+            if result["conflicts"] or result["mismatched_days"]:
+                sys.exit(1)
+            print("Set GRAMMAR_QUESTION_STORE=consolidated and build the indexes (python -m mongo.indexes build) to use it")
+        elif command == "counts":
+            counts = refresh_day_counts(grammar, grammar[QUESTIONS_COLLECTION].distinct("day"))
+            print(f"Counted the questions of {len(counts)} days")
+        else:
+            print("Usage: python -m mongo.question_store [migrate|counts]")
+            sys.exit(1)
+    except PyMongoError as e:
+        print(f"Error in question store {command}: {e}")
+        sys.exit(1)
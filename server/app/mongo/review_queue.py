@@ -0,0 +1,206 @@
+from dotenv import load_dotenv
+import os
+import time
+
+
+# Load environment variables
+load_dotenv()
+
+# Spaced repetition review queue of the questions a user got wrong, kept in their document as grammar.review
+# The queue is a binary heap in heapq order of compact [due, question_id, day, step] entries:
+#   due  - unix time in seconds when the question should be reviewed, the root of the heap is the most overdue question
+#   step - position in GRAMMAR_REVIEW_INTERVALS, how many times in a row the question has been answered correctly since it was missed
+# Picking a review question only reads the root with a $slice projection, so it costs the same however long the queue gets
+# Answers sent through /updates and /batch_updates reschedule the question:
+#   a wrong answer puts it (back) on the first interval, a right answer moves it to the next one, after the last it leaves the queue
+# Rescheduling finds an entry through a question_id -> position map built once per loaded queue and sifts it up or down,
+# so each answer costs O(log n). Only dropping the entry due last when the queue is over GRAMMAR_REVIEW_QUEUE_MAX scans the leaves
+# grammar.review_rev changes on every write so answers saved at the same time don't overwrite each other's changes
+GRAMMAR_REVIEW_INTERVALS = tuple(int(a) for a in os.getenv("GRAMMAR_REVIEW_INTERVALS", "600,86400,259200,604800,1814400").split(","))
+
+# Most questions kept in a user's queue, the one due last is dropped when another is added
+GRAMMAR_REVIEW_QUEUE_MAX = int(os.getenv("GRAMMAR_REVIEW_QUEUE_MAX", 200))
+
+# Times a queue write is retried when another write changed the queue in between
+REVIEW_WRITE_ATTEMPTS = 3
+
+# The whole queue for rescheduling and only its root for picking a question
+REVIEW_PROJECTION = {"grammar.review": 1, "grammar.review_rev": 1}
+REVIEW_ROOT_PROJECTION = {"grammar.review": {"$slice": 1}, "grammar.review_rev": 1}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# The answers in an /updates or /batch_updates body as (question_id, correct), in the order they're applied
+def review_answers(data):
+    answers = []
+    for key, correct in (("incorrectly_answered", False), ("correctly_answered", True)):
+        values = data.get(key)
+        for question_id in values if isinstance(values, list) else [values]:
+            if question_id is not None and question_id != "":
+                answers.append((str(question_id), correct))
+    return answers
+
+# Position of every question in a queue
+def queue_positions(queue):
+    return {entry[1]: i for i, entry in enumerate(queue)}
+
+# Put an entry at position i of the queue and keep the position map up to date
+def place(queue, positions, i, entry):
+    queue[i] = entry
+    positions[entry[1]] = i
+
+# Move the entry at position i towards the root while it's due before its parent
+def sift_up(queue, positions, i):
+    entry = queue[i]
+    while i > 0:
+        parent = (i - 1) // 2
+        if not entry < queue[parent]:
+            break
+        place(queue, positions, i, queue[parent])
+        i = parent
+    place(queue, positions, i, entry)
+
+# Move the entry at position i towards the leaves while one of its children is due before it
+def sift_down(queue, positions, i):
+    entry = queue[i]
+    while True:
+        child = 2 * i + 1
+        if child >= len(queue):
+            break
+        if child + 1 < len(queue) and queue[child + 1] < queue[child]:
+            child += 1
+        if not queue[child] < entry:
+            break
+        place(queue, positions, i, queue[child])
+        i = child
+    place(queue, positions, i, entry)
+
+# Replace the entry at position i and restore the heap order around it
+def replace_entry(queue, positions, i, entry):
+    place(queue, positions, i, entry)
+    sift_up(queue, positions, i)
+    sift_down(queue, positions, positions[entry[1]])
+
+# Remove the entry at position i, the last entry takes its place and is sifted into order
+def remove_entry(queue, positions, i):
+    removed = queue[i]
+    last = queue.pop()
+    del positions[removed[1]]
+    if i < len(queue):
+        replace_entry(queue, positions, i, last)
+
+# Add an entry to the queue
+def push_entry(queue, positions, entry):
+    queue.append(entry)
+    positions[entry[1]] = len(queue) - 1
+    sift_up(queue, positions, len(queue) - 1)
+
+# Reschedule a question after an answer, returns False when the queue didn't change
+# Questions that aren't in the queue are only added when they were answered wrong and their day is known
+def schedule_answer(queue, positions, question_id, day, correct, now):
+    i = positions.get(question_id)
+    if i is None:
+        if correct or not day:
+            return False
+        push_entry(queue, positions, [now + GRAMMAR_REVIEW_INTERVALS[0], question_id, day, 0])
+        if len(queue) > GRAMMAR_REVIEW_QUEUE_MAX:
+            # Drop the entry due last, it's one of the leaves
+            first_leaf = len(queue) // 2
+            remove_entry(queue, positions, max(range(first_leaf, len(queue)), key=queue.__getitem__))
+        return True
+
+    step = queue[i][3] + 1 if correct else 0
+    if step >= len(GRAMMAR_REVIEW_INTERVALS):
+        remove_entry(queue, positions, i)
+    else:
+        replace_entry(queue, positions, i, [now + GRAMMAR_REVIEW_INTERVALS[step], question_id, day or queue[i][2], step])
+    return True
+
+# Apply every answer to a queue, returns False when none of them changed it
+def apply_answers(queue, answers, day, now):
+    positions = queue_positions(queue)
+    return any([schedule_answer(queue, positions, question_id, day, correct, now) for question_id, correct in answers])
+
+# Drop a question from the queue, for questions that no longer exist
+def drop_question(queue, question_id):
+    positions = queue_positions(queue)
+    i = positions.get(question_id)
+    if i is None:
+        return False
+    remove_entry(queue, positions, i)
+    return True
+
+# Filter and update that save a changed queue, only matching while the queue is still the one that was read
+def review_write(user_email, grammar, queue):
+    return (
+        {"user.email": user_email, "grammar.review_rev": grammar.get("review_rev")},
+        {"$set": {"grammar.review": queue}, "$inc": {"grammar.review_rev": 1}}
+    )
+
+# Apply change to the queue of a user read with REVIEW_PROJECTION, returns the write that saves it or None when it didn't change
+# change gets the queue and returns False when there's nothing to save
+def review_change_write(user_email, doc, change):
+    grammar = doc.get("grammar") or {}
+    queue = grammar.get("review") or []
+    if not change(queue):
+        return None
+    return review_write(user_email, grammar, queue)
+
+# The change that reschedules answers, the time is fixed so a retry schedules them the same way
+def answers_change(answers, day):
+    now = int(time.time())
+    return lambda queue: apply_answers(queue, answers, day, now)
+
+# Root of a queue read with REVIEW_ROOT_PROJECTION as (found, entry), entry is None when the queue is empty
+def queue_root(doc):
+    if doc is None:
+        return False, None
+    queue = (doc.get("grammar") or {}).get("review") or []
+    return True, queue[0] if queue else None
+
+# Gave up after REVIEW_WRITE_ATTEMPTS writes lost to other ones, returns False like a queue that wasn't saved
+def review_conflict(user_email):
+    print(f"Review queue of {user_email} kept changing, answers weren't scheduled")
+    return False
+
+
+# The reads and writes below are the synchronous side, mongo/async_mongo_grammar.py has the same ones for motor
+
+# Read a user's queue, apply change to it and save it, retrying when another write got in first
+# Returns True when the queue was saved
+def update_review_queue(users, user_email, change):
+    for _ in range(REVIEW_WRITE_ATTEMPTS):
+        doc = users.find_one({"user.email": user_email}, REVIEW_PROJECTION)
+        write = review_change_write(user_email, doc, change) if doc is not None else None
+        if write is None:
+            return False
+        if users.update_one(*write).matched_count:
+            return True
+    return review_conflict(user_email)
+
+# Reschedule the answers of an /updates or /batch_updates body, day is the grammar day the questions came from
+# before is the user from the answer write itself (find_one_and_update with REVIEW_PROJECTION), so the queue isn't read again
+# Without it (bulk writes don't return the user) or when another write changed the queue since, the queue is read first
+# The queue is only written when an answer changed it. The answers are already saved by then, so errors are only printed
+def schedule_review_answers(users, user_email, answers, day, before=None):
+    change = answers_change(answers, day)
+    try:
+        if before is not None:
+            write = review_change_write(user_email, before, change)
+            if write is None:
+                return False
+            if users.update_one(*write).matched_count:
+                return True
+        return update_review_queue(users, user_email, change)
+    except Exception as e:
+        print(f"Error scheduling review answers of {user_email}: {e}")
+        return False
+
+# Root of a user's queue, the most overdue question, as (found, entry)
+def review_root(users, user_email):
+    return queue_root(users.find_one({"user.email": user_email}, REVIEW_ROOT_PROJECTION))
@@ -0,0 +1,215 @@
+from quart import Blueprint, request, jsonify, Response, g, make_response
+from functools import wraps
+import httpx
+
+# Async versions of the voiceflow endpoints
+# Trace parsing, request building and the launch cache are shared with the synchronous blueprint
+from voiceflow.async_voiceflow_client import async_voiceflow_client
+from voiceflow.voiceflow_client import VoiceflowError
+from voiceflow.voiceflow import parse_trace, parse_traces, build_request_payload, sse_event
+from auth.session_tokens import (
+    SESSION_TOKEN_HEADER,
+    UNAUTHORIZED_MESSAGE,
+    renewed_session_token,
+    session_from_authorization
+)
+from voiceflow.launch_cache import (
+    cached_launch_traces,
+    launch_cache_enabled,
+    launch_cache_entry,
+    launch_cache_error,
+    personalize_state,
+    store_launch_state
+)
+
+
+# Create Quart Blueprint for the async voiceflow routes
+async_voiceflow = Blueprint('async_voiceflow', __name__)
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Serve a launch from the cache, the awaited side of serve_cached_launch in voiceflow/launch_cache.py
+async def serve_cached_launch(user_id, payload):
+    entry = launch_cache_entry(async_voiceflow_client.version_id, payload)
+    if entry is None:
+        return None
+    resp = await async_voiceflow_client.put_state(user_id, personalize_state(entry["state"], user_id))
+    return cached_launch_traces(entry, resp)
+
+# After a normal launch save its traces and the user's resulting state for the next launches
+async def remember_launch(user_id, payload, traces):
+    if not launch_cache_enabled():
+        return
+    try:
+        resp = await async_voiceflow_client.get_state(user_id)
+        store_launch_state(async_voiceflow_client.version_id, payload, traces, resp)
+    except Exception as e:
+        launch_cache_error(e)
+
+# Async version of require_session, the token's claims are put in g.session and requests without a valid one get a 401
+def require_session(endpoint):
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        claims = session_from_authorization(request.headers.get("Authorization"))
+        if claims is None or not claims.get("verified"):
+            return jsonify({"success": False, "message": UNAUTHORIZED_MESSAGE}), 401
+
+        g.session = claims
+        response = await make_response(await endpoint(*args, **kwargs))
+        renewed = renewed_session_token(claims)
+        if renewed:
+            response.headers[SESSION_TOKEN_HEADER] = renewed
+        return response
+    return wrapper
+
+# Server sent events for the messages and buttons in one trace
+def trace_events(t):
+    messages, buttons = parse_trace(t)
+    events = [sse_event("message", {"message": msg}) for msg in messages]
+    if buttons:
+        events.append(sse_event("buttons", {"buttons": buttons}))
+    return events
+
+# Response for when the credentials are missing
+def not_configured():
+    return jsonify({
+        "success": False,
+        "message": "VOICEFLOW_API_KEY or VOICEFLOW_VERSION_ID not configured"
+    }), 500
+
+# Response for a text request without a message
+def message_required():
+    return jsonify({
+        "success": False,
+        "message": "message (text) is required"
+        }), 400
+
+
+
+#######################
+# API Endpoints Below #
+#######################
+
+
+# Endpoint to send messages to and recieve responses from voiceflow chatbot
+@async_voiceflow.route('/interact', methods=['POST'])
+@require_session
+async def voiceflow_interact():
+    if not async_voiceflow_client.is_configured():
+        return not_configured()
+
+    data = await request.get_json() or {}
+    user_id = g.session["email"]
+    payload = build_request_payload(data)
+    if payload is None:
+        return message_required()
+
+    try:
+        # Launches are the same for every user so serve them from the launch cache when possible
+        is_launch = payload["request"]["type"] == "launch"
+        traces = await serve_cached_launch(user_id, payload) if is_launch else None
+
+        if traces is None:
+            resp = await async_voiceflow_client.interact(user_id, payload)
+            if resp.status_code >= 400:
+                return jsonify({
+                    "success": False,
+                    "message": f"Voiceflow error {resp.status_code}",
+                    "detail": resp.text
+                }), 400
+            traces = resp.json()
+            if is_launch:
+                await remember_launch(user_id, payload, traces)
+
+        messages, buttons = parse_traces(traces)
+        response = {
+            "success": True,
+            "messages": messages,
+            "buttons": buttons
+        }
+
+        # Only send the full traces back when debugging
+        if data.get("debug"):
+            response["raw"] = traces
+
+        return jsonify(response), 200
+
+    except httpx.HTTPError as e:
+        # Network error reaching voiceflow
+        return jsonify({"success": False, "message": f"Network error: {str(e)}"}), 500
+
+
+# Streaming version of /interact, sends each message and set of buttons as a server sent event
+@async_voiceflow.route('/interact/stream', methods=['POST'])
+@require_session
+async def voiceflow_interact_stream():
+    if not async_voiceflow_client.is_configured():
+        return not_configured()
+
+    data = await request.get_json() or {}
+    user_id = g.session["email"]
+    payload = build_request_payload(data)
+    if payload is None:
+        return message_required()
+
+    async def generate():
+        try:
+            traces = None
+            if payload["request"]["type"] == "launch":
+                traces = await serve_cached_launch(user_id, payload)
+
+            if traces is not None:
+                for t in traces:
+                    for event in trace_events(t):
+                        yield event
+            else:
+                async for t in async_voiceflow_client.interact_stream(user_id, payload):
+                    for event in trace_events(t):
+                        yield event
+
+        except VoiceflowError as e:
+            yield sse_event("error", {"message": str(e), "detail": e.detail})
+        except httpx.HTTPError as e:
+            yield sse_event("error", {"message": f"Network error: {str(e)}"})
+
+        yield sse_event("end", {})
+
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+    # Streams stay open for as long as voiceflow takes to answer
+    response.timeout = None
+    return response
+
+
+# Endpoint to reset the vocieflow flow for user
+@async_voiceflow.route('/reset', methods=["POST"])
+@require_session
+async def reset():
+    if not async_voiceflow_client.is_configured():
+        return not_configured()
+
+    data = await request.get_json() or {}
+    user_id = g.session["email"]
+
+    try:
+        resp = await async_voiceflow_client.reset(user_id)
+        if resp.status_code >= 400:
+            return jsonify({
+                "success": False,
+                "message": f"Voiceflow error {resp.status_code}",
+                "detail": resp.text
+            }), 400
+
+        return jsonify({
+            "success": True
+        }), 200
+
+    except httpx.HTTPError as e:
+        return jsonify({"success": False, "message": f"Network error: {str(e)}"}), 500
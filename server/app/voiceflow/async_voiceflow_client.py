@@ -0,0 +1,168 @@
+import asyncio
+import json
+import os
+import httpx
+
+from metrics.metrics import time_outbound
+
+# Use the same settings and errors as the synchronous client
+from voiceflow.voiceflow_client import (
+    VOICEFLOW_BASE_URL,
+    VOICEFLOW_POOL_SIZE,
+    VOICEFLOW_MAX_RETRIES,
+    VOICEFLOW_RETRY_BACKOFF,
+    VOICEFLOW_TIMEOUT,
+    VOICEFLOW_PROJECT_ID,
+    VOICEFLOW_ENVIRONMENT,
+    VoiceflowError,
+    RETRY_STATUSES,
+    IDEMPOTENT_METHODS,
+    STREAM_UNSUPPORTED_STATUSES
+)
+
+# Errors raised before the request was sent, so it's safe to send any request again
+CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+# Async client for the Voiceflow Dialog Manager API, used by the ASGI endpoints
+# One httpx client with a sized keep-alive pool is shared by every call, it's created inside the worker's event loop
+# Failed requests are retried with exponential backoff honouring Retry-After: any request after a 429 or a connection error,
+# GET, PUT and DELETE after a 5xx or any other transport error too
+class AsyncVoiceflowClient:
+    def __init__(self, api_key, version_id, base_url=VOICEFLOW_BASE_URL, pool_size=VOICEFLOW_POOL_SIZE,
+                 max_retries=VOICEFLOW_MAX_RETRIES, retry_backoff=VOICEFLOW_RETRY_BACKOFF, timeout=VOICEFLOW_TIMEOUT,
+                 project_id=VOICEFLOW_PROJECT_ID, environment=VOICEFLOW_ENVIRONMENT):
+        self.api_key = api_key
+        self.version_id = version_id
+        self.base_url = base_url.rstrip("/")
+        self.pool_size = pool_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.timeout = timeout
+        self.project_id = project_id
+        self.environment = environment
+        self.http = None
+
+    # Both the runtime API key and the version ID are needed for any call
+    def is_configured(self):
+        return bool(self.api_key and self.version_id)
+
+    # Create the httpx client the first time it's needed
+    def get_http(self):
+        if self.http is None:
+            self.http = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                timeout=self.timeout,
+                headers={
+                    "Authorization": self.api_key or "",
+                    "Content-Type": "application/json"
+                }
+            )
+        return self.http
+
+    # Voiceflow endpoint for a specific version and user
+    def user_url(self, user_id):
+        return f"{self.base_url}/state/{self.version_id}/user/{user_id}"
+
+    # How long to wait before the next attempt
+    def retry_delay(self, attempt, resp=None):
+        retry_after = resp.headers.get("Retry-After") if resp is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return self.retry_backoff * 2 ** attempt
+
+    # Send a request, retrying on retryable statuses and connection errors
+    # Timed for /metrics with its retries included
+    async def request(self, operation, method, url, **kwargs):
+        idempotent = method in IDEMPOTENT_METHODS
+        retry_statuses = RETRY_STATUSES if idempotent else (429,)
+        retry_errors = httpx.TransportError if idempotent else CONNECT_ERRORS
+        with time_outbound("voiceflow", operation) as call:
+            for attempt in range(self.max_retries + 1):
+                last_attempt = attempt == self.max_retries
+                try:
+                    resp = await self.get_http().request(method, url, **kwargs)
+                except retry_errors:
+                    if last_attempt:
+                        raise
+                    await asyncio.sleep(self.retry_delay(attempt))
+                    continue
+
+                if resp.status_code not in retry_statuses or last_attempt:
+                    call["status"] = resp.status_code
+                    return resp
+                await asyncio.sleep(self.retry_delay(attempt, resp))
+
+    # Send a request (launch or text) to the flow for a user
+    async def interact(self, user_id, payload):
+        return await self.request("interact", "POST", f"{self.user_url(user_id)}/interact", json=payload)
+
+    # Send a request to the flow and yield each trace as soon as it's available
+    # Uses the streaming interact API when a project ID is configured, otherwise yields the traces of a normal interact call,
+    # as it does when the project can't stream. Raises VoiceflowError when Voiceflow answers with an error status
+    async def interact_stream(self, user_id, payload):
+        if self.project_id:
+            url = f"{self.base_url}/v2/project/{self.project_id}/user/{user_id}/interact/stream"
+            http = self.get_http()
+            request = http.build_request("POST", url, params={"environment": self.environment},
+                                         json={"action": payload.get("request")},
+                                         headers={"Accept": "text/event-stream"})
+            # Timed until the headers arrive, reading the stream is up to the caller
+            with time_outbound("voiceflow", "interact_stream") as call:
+                resp = await http.send(request, stream=True)
+                call["status"] = resp.status_code
+            try:
+                # Fall back to the buffered API only if streaming isn't available for this project
+                if resp.status_code >= 400 and resp.status_code not in STREAM_UNSUPPORTED_STATUSES:
+                    await resp.aread()
+                    raise VoiceflowError(resp.status_code, resp.text)
+                if resp.status_code < 400:
+                    event = None
+                    data = []
+                    async for line in resp.aiter_lines():
+                        if line.startswith("event:"):
+                            event = line[len("event:"):].strip()
+                        elif line.startswith("data:"):
+                            data.append(line[len("data:"):].strip())
+                        elif line == "":
+                            # A blank line ends the event
+                            if event == "end":
+                                return
+                            if data and event in (None, "trace"):
+                                yield json.loads("\n".join(data))
+                            event = None
+                            data = []
+                    return
+            finally:
+                await resp.aclose()
+
+        resp = await self.interact(user_id, payload)
+        if resp.status_code >= 400:
+            raise VoiceflowError(resp.status_code, resp.text)
+        traces = resp.json()
+        for t in traces if isinstance(traces, list) else []:
+            yield t
+
+    # Get the saved state of a user
+    async def get_state(self, user_id):
+        return await self.request("get_state", "GET", self.user_url(user_id))
+
+    # Replace the saved state of a user
+    async def put_state(self, user_id, state):
+        return await self.request("put_state", "PUT", self.user_url(user_id), json=state)
+
+    # Delete the saved state of a user so the flow starts fresh
+    async def reset(self, user_id):
+        return await self.request("reset", "DELETE", self.user_url(user_id))
+
+    async def close(self):
+        if self.http is not None:
+            await self.http.aclose()
+            self.http = None
+
+
+# Runtime credentials are read once when the server starts
+async_voiceflow_client = AsyncVoiceflowClient(
+    os.environ.get("VOICEFLOW_API_KEY"),
+    os.environ.get("VOICEFLOW_VERSION_ID")
+)
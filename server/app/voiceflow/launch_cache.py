@@ -0,0 +1,143 @@
+from dotenv import load_dotenv
+import copy
+import json
+import os
+import threading
+import time
+
+
+# Load environment variables
+load_dotenv()
+
+# The traces and state a launch produces are the same for every user of a version, so they're cached here
+# On a hit the cached state is written to the user's Voiceflow state instead of running the launch again
+# The TTL (in seconds) can be changed with VOICEFLOW_LAUNCH_CACHE_TTL, set it to 0 to turn the cache off
+VOICEFLOW_LAUNCH_CACHE_TTL = float(os.getenv("VOICEFLOW_LAUNCH_CACHE_TTL", 3600))
+
+launch_cache_lock = threading.Lock()
+launch_cache = {
+    "version_id": None,
+    "entries": {},
+    "hits": 0,
+    "misses": 0,
+    "fallbacks": 0,
+    "invalidations": 0
+}
+
+
+
+#####################
+# All Methods Below #
+#####################
+
+
+# Cache key for a launch of a version with a given request payload
+def launch_cache_key(version_id, payload):
+    return (version_id, json.dumps(payload, sort_keys=True))
+
+# Get the cached launch entry, clearing every entry if the version ID changed since they were stored
+def get_cached_launch(version_id, payload):
+    with launch_cache_lock:
+        if launch_cache["version_id"] != version_id:
+            if launch_cache["entries"]:
+                launch_cache["invalidations"] += 1
+            launch_cache["entries"] = {}
+            launch_cache["version_id"] = version_id
+
+        entry = launch_cache["entries"].get(launch_cache_key(version_id, payload))
+        if entry and time.monotonic() - entry["stored_at"] < VOICEFLOW_LAUNCH_CACHE_TTL:
+            launch_cache["hits"] += 1
+            return entry
+
+        launch_cache["misses"] += 1
+        return None
+
+# Save the traces and resulting state of a launch
+def store_launch(version_id, payload, traces, state):
+    with launch_cache_lock:
+        if launch_cache["version_id"] != version_id:
+            launch_cache["entries"] = {}
+            launch_cache["version_id"] = version_id
+        launch_cache["entries"][launch_cache_key(version_id, payload)] = {
+            "traces": traces,
+            "state": state,
+            "stored_at": time.monotonic()
+        }
+
+# Drop every cached launch
+def invalidate_launch_cache():
+    with launch_cache_lock:
+        launch_cache["entries"] = {}
+        launch_cache["invalidations"] += 1
+
+# The cached state belongs to whichever user launched first, so swap in the built in variables of this user
+def personalize_state(state, user_id):
+    state = copy.deepcopy(state)
+    variables = state.get("variables")
+    if isinstance(variables, dict):
+        variables["user_id"] = user_id
+        variables["timestamp"] = int(time.time())
+    return state
+
+# Whether launches are cached at all
+def launch_cache_enabled():
+    return VOICEFLOW_LAUNCH_CACHE_TTL > 0
+
+# Cached launch to serve for a payload, None when the cache is off or has no fresh entry for it
+def launch_cache_entry(version_id, payload):
+    if not launch_cache_enabled():
+        return None
+    return get_cached_launch(version_id, payload)
+
+# Traces of a cached launch once put_state answered with resp, None when the user's state couldn't be written
+def cached_launch_traces(entry, resp):
+    if resp.status_code >= 400:
+        # The caller runs a normal launch instead
+        with launch_cache_lock:
+            launch_cache["fallbacks"] += 1
+        return None
+    return entry["traces"]
+
+# Save a normal launch once get_state answered with resp, the user's state right after it
+def store_launch_state(version_id, payload, traces, resp):
+    if resp.status_code < 400:
+        store_launch(version_id, payload, traces, resp.json())
+
+# Caching is best effort, the launch itself already succeeded
+def launch_cache_error(e):
+    print(f"Error caching voiceflow launch: {e}")
+
+
+# The Voiceflow calls below are the synchronous side, voiceflow/async_voiceflow.py has the same ones for httpx.AsyncClient
+
+# Serve a launch from the cache, bringing the user's Voiceflow state forward to where the launch leaves it
+# Returns the cached traces, or None when the launch has to go to Voiceflow
+def serve_cached_launch(client, user_id, payload):
+    entry = launch_cache_entry(client.version_id, payload)
+    if entry is None:
+        return None
+    return cached_launch_traces(entry, client.put_state(user_id, personalize_state(entry["state"], user_id)))
+
+# After a normal launch save its traces and the user's resulting state for the next launches
+def remember_launch(client, user_id, payload, traces):
+    if not launch_cache_enabled():
+        return
+    try:
+        store_launch_state(client.version_id, payload, traces, client.get_state(user_id))
+    except Exception as e:
+        launch_cache_error(e)
+
+# Hit rate and counters of the launch cache
+def launch_cache_stats():
+    with launch_cache_lock:
+        lookups = launch_cache["hits"] + launch_cache["misses"]
+        return {
+            "version_id": launch_cache["version_id"],
+            "entries": len(launch_cache["entries"]),
+            "ttl_seconds": VOICEFLOW_LAUNCH_CACHE_TTL,
+            "hits": launch_cache["hits"],
+            "misses": launch_cache["misses"],
+            "fallbacks": launch_cache["fallbacks"],
+            "invalidations": launch_cache["invalidations"],
+            "hit_rate": launch_cache["hits"] / lookups if lookups else 0.0
+        }
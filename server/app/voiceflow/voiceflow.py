@@ -1,120 +1,224 @@
-from flask import Blueprint, request, jsonify, Response
+from flask import Blueprint, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
-from dotenv import load_dotenv
-from pymongo import MongoClient
 import requests
-import os
 import json
 
-# Load environment variables
-load_dotenv()
+# Shared Voiceflow client, keeps connections alive between chat turns
+from voiceflow.voiceflow_client import voiceflow_client, VoiceflowError
+from voiceflow.launch_cache import serve_cached_launch, remember_launch, launch_cache_stats
+
+# The chat endpoints are only for logged in users, the user comes from their session token
+from auth.session_tokens import require_session
 
 # Create Blueprint and enable CORS on this scope
 voiceflow = Blueprint('voiceflow', __name__)
 
 
+#####################
+# All Methods Below #
+#####################
+
+
+# Pull the text messages and choice buttons out of a single voiceflow trace
+# Every other trace type (debug, path, flow, end...) gives nothing back
+def parse_trace(t):
+    messages = []
+    buttons = []
+    t_type = t.get("type")
+    payload = t.get("payload") or {}
+
+    if t_type in ("speak", "text"):
+        msg = payload.get("message") or payload.get("text")
+        if msg:
+            messages.append(msg)
+
+    elif t_type == "choice":
+        for b in payload.get("buttons") or []:
+            label = ((b.get("request") or {}).get("payload") or {}).get("label")
+            buttons.append({
+                "label": b.get("name") or label,  # Display text for the button
+                "value": label or b.get("name")   # Value sent when button is clicked
+            })
+
+    return messages, buttons
+
+# Go through the voiceflow traces once and pull out the text messages and the choice buttons
+def parse_traces(traces):
+    messages = []
+    buttons = []
+    for t in traces if isinstance(traces, list) else []:
+        trace_messages, trace_buttons = parse_trace(t)
+        messages.extend(trace_messages)
+        buttons.extend(trace_buttons)
+    return messages, buttons
+
+# Build the voiceflow request from the request body
+# Returns None for a text request without a message
+def build_request_payload(data):
+    # If user has logged out and logs back in or the browser refreshes need to restart the flow in voiceflow
+    if data.get("launch"):
+        return {"request": {"type": "launch"}}
+
+    message = data.get("message")
+    if not message:
+        return None
+    # Request format for a text input
+    return {"request": {"type": "text", "payload": message}}
+
+# Format a server sent event
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+
+#######################
+# API Endpoints Below #
+#######################
+
+
 # Endpoint to send messages to and recieve responses from voiceflow chatbot
 @voiceflow.route('/interact', methods=['POST'])
+@require_session
 def voiceflow_interact():
-    # Parse runtime credentials at the start
-    VOICEFLOW_API_KEY = os.environ.get("VOICEFLOW_API_KEY")
-    VOICEFLOW_VERSION_ID = os.environ.get("VOICEFLOW_VERSION_ID") 
-    if not VOICEFLOW_API_KEY or not VOICEFLOW_VERSION_ID:
+    # Runtime credentials are read once at startup by the Voiceflow client
+    if not voiceflow_client.is_configured():
         return jsonify({
             "success": False,
             "message": "VOICEFLOW_API_KEY or VOICEFLOW_VERSION_ID not configured"
         }), 500
 
-    # Save all the data from request body
+    # Save all the data from request body, the user is the one the session token was issued to
     data = request.get_json() or {}
-    user_id = data.get("user_email")
-
-    # If user has logged out and logs back in or the browser refreshes need to restart the flow in voiceflow
-    request_type = "launch" if data.get("launch") else "text"
-    if request_type == "text":
-        message = data.get("message")
-        # Require a user message to send the request
-        if not message:
-            return jsonify({
-                "success": False, 
-                "message": "message (text) is required"
-                }), 400
-        # Request format for a text input
-        payload = {"request": {"type": "text", "payload": message}}
-    else:
-        payload = {"request": {"type": "launch"}}
-
+    user_id = g.session["email"]
 
-    # Voiceflow endpoint for a specific version and user
-    url = f"https://general-runtime.voiceflow.com/state/{VOICEFLOW_VERSION_ID}/user/{user_id}/interact"
-
-    # Authorization header expects the runtime API key
-    headers = {
-        "Authorization": VOICEFLOW_API_KEY,
-        "Content-Type": "application/json",
-    }
-
-    try:
-        # Send request to voiceflow
-        resp = requests.post(url, headers=headers, json=payload, timeout=15)
-        if resp.status_code >= 400:
-            return jsonify({
-                "success": False,
-                "message": f"Voiceflow error {resp.status_code}",
-                "detail": resp.text
+    # Require a user message to send a text request
+    payload = build_request_payload(data)
+    if payload is None:
+        return jsonify({
+            "success": False, 
+            "message": "message (text) is required"
             }), 400
 
-        # Parse voiceflow traces and extract response(s) to the messages array
-        traces = resp.json()
-        messages = []
-        for t in traces if isinstance(traces, list) else []:
-            t_type = t.get("type")
-            payload = t.get("payload") or {}
+    try:
+        # Launches are the same for every user so serve them from the launch cache when possible
+        is_launch = payload["request"]["type"] == "launch"
+        traces = serve_cached_launch(voiceflow_client, user_id, payload) if is_launch else None
+
+        if traces is None:
+            # Send request to voiceflow
+            resp = voiceflow_client.interact(user_id, payload)
+            if resp.status_code >= 400:
+                return jsonify({
+                    "success": False,
+                    "message": f"Voiceflow error {resp.status_code}",
+                    "detail": resp.text
+                }), 400
+            traces = resp.json()
+            if is_launch:
+                remember_launch(voiceflow_client, user_id, payload, traces)
 
-            if t_type in ("speak", "text"):
-                msg = payload.get("message") or payload.get("text")
-                if msg:
-                    messages.append(msg)
+        # Parse voiceflow traces and extract the messages and buttons
+        messages, buttons = parse_traces(traces)
 
-        # Return messages array plus traces for debugging
-        return jsonify({
+        response = {
             "success": True,
             "messages": messages,
-            "raw": traces
-        }), 200
+            "buttons": buttons
+        }
+
+        # Only send the full traces back when debugging
+        if data.get("debug"):
+            response["raw"] = traces
+
+        return jsonify(response), 200
 
     except requests.RequestException as e:
         # Network error reaching voiceflow
         return jsonify({"success": False, "message": f"Network error: {str(e)}"}), 500
 
 
+# Streaming version of /interact, every message and set of buttons is sent to the browser as a
+# server sent event as soon as its trace has been parsed
+# Events: "message" {"message": ...}, "buttons" {"buttons": [...]}, "error" {"message": ...} and a final "end" {}
+@voiceflow.route('/interact/stream', methods=['POST'])
+@require_session
+def voiceflow_interact_stream():
+    # Runtime credentials are read once at startup by the Voiceflow client
+    if not voiceflow_client.is_configured():
+        return jsonify({
+            "success": False,
+            "message": "VOICEFLOW_API_KEY or VOICEFLOW_VERSION_ID not configured"
+        }), 500
+
+    # Save all the data from request body, the user is the one the session token was issued to
+    data = request.get_json() or {}
+    user_id = g.session["email"]
+
+    # Require a user message to send a text request
+    payload = build_request_payload(data)
+    if payload is None:
+        return jsonify({
+            "success": False, 
+            "message": "message (text) is required"
+            }), 400
+
+    def generate():
+        try:
+            # Launches are the same for every user so serve them from the launch cache when possible
+            traces = None
+            if payload["request"]["type"] == "launch":
+                traces = serve_cached_launch(voiceflow_client, user_id, payload)
+            if traces is None:
+                traces = voiceflow_client.interact_stream(user_id, payload)
+
+            for t in traces:
+                messages, buttons = parse_trace(t)
+                for msg in messages:
+                    yield sse_event("message", {"message": msg})
+                if buttons:
+                    yield sse_event("buttons", {"buttons": buttons})
+
+        except VoiceflowError as e:
+            yield sse_event("error", {"message": str(e), "detail": e.detail})
+        except requests.RequestException as e:
+            # Network error reaching voiceflow
+            yield sse_event("error", {"message": f"Network error: {str(e)}"})
+
+        yield sse_event("end", {})
+
+    # Disable proxy buffering so each event reaches the browser straight away
+    return Response(stream_with_context(generate()), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+# Hit rate of the launch cache
+@voiceflow.route('/launch_cache_stats', methods=['GET'])
+def launch_cache_stats_endpoint():
+    return jsonify({
+        "success": True,
+        **launch_cache_stats()
+    }), 200
+
+
 # Endpoint to reset the vocieflow flow for user
 @voiceflow.route('/reset', methods=["POST"])
+@require_session
 def reset():
-    # Parse runtime credentials at the start
-    VOICEFLOW_API_KEY = os.environ.get("VOICEFLOW_API_KEY")
-    VOICEFLOW_VERSION_ID = os.environ.get("VOICEFLOW_VERSION_ID") 
-    if not VOICEFLOW_API_KEY or not VOICEFLOW_VERSION_ID:
+    # Runtime credentials are read once at startup by the Voiceflow client
+    if not voiceflow_client.is_configured():
         return jsonify({
             "success": False,
             "message": "VOICEFLOW_API_KEY or VOICEFLOW_VERSION_ID not configured"
         }), 500
 
-    # Save all the data from request body
+    # Save all the data from request body, the user is the one the session token was issued to
     data = request.get_json() or {}
-    user_id = data.get("user_email")
-
-    # Voiceflow endpoint for a specific version and user
-    url = f"https://general-runtime.voiceflow.com/state/{VOICEFLOW_VERSION_ID}/user/{user_id}"
-
-    # Authorization header expects the runtime API key
-    headers = {
-        "Authorization": VOICEFLOW_API_KEY,
-        "Content-Type": "application/json",
-    }
+    user_id = g.session["email"]
 
     try:
-        resp = requests.delete(url, headers=headers, timeout=15)
+        resp = voiceflow_client.reset(user_id)
         if resp.status_code >= 400:
             return jsonify({
                 "success": False,
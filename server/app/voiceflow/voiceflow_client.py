@@ -0,0 +1,177 @@
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+from metrics.metrics import time_outbound
+import requests
+import json
+import os
+
+
+# Load environment variables
+load_dotenv()
+
+# Connection settings for the Voiceflow runtime API, all of them can be changed with environment variables
+VOICEFLOW_BASE_URL = os.getenv("VOICEFLOW_BASE_URL", "https://general-runtime.voiceflow.com")
+VOICEFLOW_POOL_SIZE = int(os.getenv("VOICEFLOW_POOL_SIZE", 20))
+VOICEFLOW_MAX_RETRIES = int(os.getenv("VOICEFLOW_MAX_RETRIES", 3))
+VOICEFLOW_RETRY_BACKOFF = float(os.getenv("VOICEFLOW_RETRY_BACKOFF", 0.3))
+VOICEFLOW_TIMEOUT = float(os.getenv("VOICEFLOW_TIMEOUT", 15))
+
+# The streaming interact API is addressed by project instead of version, it's only used when a project ID is set
+VOICEFLOW_PROJECT_ID = os.getenv("VOICEFLOW_PROJECT_ID")
+VOICEFLOW_ENVIRONMENT = os.getenv("VOICEFLOW_ENVIRONMENT", "production")
+
+
+# Status codes that are worth retrying, and the methods that can be sent again after a 5xx
+# A POST interact isn't idempotent, Voiceflow may have run the turn before the 5xx or the dropped response,
+# so it's only sent again after a 429 or when it never reached Voiceflow
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+IDEMPOTENT_METHODS = frozenset(["GET", "PUT", "DELETE"])
+
+# Statuses of the streaming interact API that mean streaming isn't available, Voiceflow hasn't run the turn so the
+# buffered API can be called instead. Any other error may come after the turn ran, so it's raised rather than sent twice
+STREAM_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+
+# Raised when Voiceflow answers with an error status
+class VoiceflowError(Exception):
+    def __init__(self, status_code, detail):
+        super().__init__(f"Voiceflow error {status_code}")
+        self.status_code = status_code
+        self.detail = detail
+
+
+# urllib3 only retries statuses and read errors of the allowed methods, a 429 is retried for a POST as well
+# Connection errors are retried for every method since the request was never sent
+class VoiceflowRetry(Retry):
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429:
+            return True
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+# Client for the Voiceflow Dialog Manager API
+# One requests session is shared by every call so TCP and TLS connections are kept alive and reused
+# Failed requests are retried with exponential backoff honouring Retry-After: any request after a 429 or a connection error,
+# GET, PUT and DELETE after a 5xx or a read error too
+class VoiceflowClient:
+    def __init__(self, api_key, version_id, base_url=VOICEFLOW_BASE_URL, pool_size=VOICEFLOW_POOL_SIZE,
+                 max_retries=VOICEFLOW_MAX_RETRIES, retry_backoff=VOICEFLOW_RETRY_BACKOFF, timeout=VOICEFLOW_TIMEOUT,
+                 project_id=VOICEFLOW_PROJECT_ID, environment=VOICEFLOW_ENVIRONMENT):
+        self.api_key = api_key
+        self.version_id = version_id
+        self.project_id = project_id
+        self.environment = environment
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+        retry = VoiceflowRetry(
+            total=max_retries,
+            backoff_factor=retry_backoff,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=IDEMPOTENT_METHODS,
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Authorization header expects the runtime API key
+        self.session.headers.update({
+            "Authorization": api_key or "",
+            "Content-Type": "application/json"
+        })
+
+    # Both the runtime API key and the version ID are needed for any call
+    def is_configured(self):
+        return bool(self.api_key and self.version_id)
+
+    # Voiceflow endpoint for a specific version and user
+    def user_url(self, user_id):
+        return f"{self.base_url}/state/{self.version_id}/user/{user_id}"
+
+    # Send one request, timed for /metrics with its retries included
+    # Streamed responses are timed until their headers arrive
+    def send(self, operation, method, url, **kwargs):
+        with time_outbound("voiceflow", operation) as call:
+            resp = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            call["status"] = resp.status_code
+        return resp
+
+    # Send a request (launch or text) to the flow for a user
+    def interact(self, user_id, payload):
+        return self.send("interact", "POST", f"{self.user_url(user_id)}/interact", json=payload)
+
+    # Send a request to the flow and yield each trace as soon as it's available
+    # Uses the streaming interact API when a project ID is configured, otherwise the traces of a normal
+    # interact call are yielded one by one, as they are when the project can't stream
+    # Raises VoiceflowError when Voiceflow answers with an error status
+    def interact_stream(self, user_id, payload):
+        if self.project_id:
+            resp = self.send(
+                "interact_stream", "POST",
+                f"{self.base_url}/v2/project/{self.project_id}/user/{user_id}/interact/stream",
+                params={"environment": self.environment},
+                json={"action": payload.get("request")},
+                headers={"Accept": "text/event-stream"},
+                stream=True
+            )
+            if resp.status_code < 400:
+                yield from self.read_event_stream(resp)
+                return
+            # Fall back to the buffered API only if streaming isn't available for this project
+            with resp:
+                if resp.status_code not in STREAM_UNSUPPORTED_STATUSES:
+                    raise VoiceflowError(resp.status_code, resp.text)
+
+        resp = self.interact(user_id, payload)
+        if resp.status_code >= 400:
+            raise VoiceflowError(resp.status_code, resp.text)
+        traces = resp.json()
+        yield from traces if isinstance(traces, list) else []
+
+    # Parse a server sent event stream from Voiceflow, every trace event holds one trace as JSON
+    @staticmethod
+    def read_event_stream(resp):
+        event = None
+        data = []
+        with resp:
+            for line in resp.iter_lines(decode_unicode=True):
+                if line is None:
+                    continue
+                if line.startswith("event:"):
+                    event = line[len("event:"):].strip()
+                elif line.startswith("data:"):
+                    data.append(line[len("data:"):].strip())
+                elif line == "":
+                    # A blank line ends the event
+                    if event == "end":
+                        return
+                    if data and event in (None, "trace"):
+                        yield json.loads("\n".join(data))
+                    event = None
+                    data = []
+
+    # Get the saved state of a user
+    def get_state(self, user_id):
+        return self.send("get_state", "GET", self.user_url(user_id))
+
+    # Replace the saved state of a user
+    def put_state(self, user_id, state):
+        return self.send("put_state", "PUT", self.user_url(user_id), json=state)
+
+    # Delete the saved state of a user so the flow starts fresh
+    def reset(self, user_id):
+        return self.send("reset", "DELETE", self.user_url(user_id))
+
+    def close(self):
+        self.session.close()
+
+
+# Runtime credentials are read once when the server starts
+voiceflow_client = VoiceflowClient(
+    os.environ.get("VOICEFLOW_API_KEY"),
+    os.environ.get("VOICEFLOW_VERSION_ID")
+)
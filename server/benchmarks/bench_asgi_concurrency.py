@@ -0,0 +1,162 @@
+from pymongo import MongoClient
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import httpx
+
+# Drives concurrent chat and grammar traffic at the ASGI server and reports latency and server memory
+# Needs a local mongod, the web_app and grammar databases on it are seeded with synthetic data
+# Voiceflow is replaced by the local stub with a fixed delay per turn so chat requests stay in flight
+# Usage: python benchmarks/bench_asgi_concurrency.py [in flight requests...]
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARKS_DIR, "..", "app")
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, APP_DIR)
+
+# The server and the benchmark share a token secret so the chat requests can be signed here
+os.environ.setdefault("SESSION_TOKEN_SECRET", "bench-session-secret")
+
+from voiceflow_stub import VoiceflowStub
+from auth.session_tokens import issue_session_token
+
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+PORT = int(os.environ.get("BENCH_PORT", 5055))
+WORKERS = int(os.environ.get("BENCH_WORKERS", 4))
+USERS = 1000
+DAYS = 20
+QUESTIONS_PER_DAY = 50
+VOICEFLOW_DELAY = 0.3
+REQUESTS_PER_LEVEL = 2000
+
+
+# Seed users and grammar days
+def seed():
+    client = MongoClient(BENCH_MONGODB_URI)
+    client.drop_database("grammar")
+    for d in range(DAYS):
+        client.grammar[f"day_{d}"].insert_many([{
+            "question": f"Day {d} question {i}",
+            "options": {"option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d"},
+            "answer": "option_a",
+            "reasoning": "Because."
+        } for i in range(QUESTIONS_PER_DAY)])
+
+    client.web_app.users.delete_many({"user.email": {"$regex": "@bench.local$"}})
+    client.web_app.users.insert_many([{
+        "user": {"name": f"User {i}", "email": f"user{i}@bench.local", "password": "pw", "verified": True},
+        "grammar": {"intro_completed": "TRUE", "streak": 0, "incorrectly_answered": [], "correctly_answered": [],
+                    "days_completed": [], "grammar_completed": "FALSE"}
+    } for i in range(USERS)])
+    client.close()
+
+
+# Resident memory of the server and its worker processes in MB
+def server_rss_mb(pid):
+    total = 0
+    pids = [str(pid)]
+    try:
+        pids += subprocess.run(["pgrep", "-P", str(pid)], capture_output=True, text=True).stdout.split()
+    except FileNotFoundError:
+        pass
+    for p in pids:
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except FileNotFoundError:
+            pass
+    return total / 1024
+
+
+# One request from the mix, 40% chat turns and 60% grammar calls
+async def one_request(client):
+    email = f"user{random.randrange(USERS)}@bench.local"
+    roll = random.random()
+    if roll < 0.4:
+        headers = {"Authorization": f"Bearer {issue_session_token(email, True)}"}
+        return await client.post("/voiceflow/interact", json={"message": "next"}, headers=headers)
+    if roll < 0.7:
+        return await client.post("/mongo_grammar/get_random_question", json={"user_email": email, "chosen_day": f"day_{random.randrange(DAYS)}"})
+    if roll < 0.9:
+        return await client.post("/mongo_grammar/get_uncompleted_grammar_day", json={"user_email": email})
+    return await client.post("/mongo_user/get_user_info", json={"user_email": email})
+
+
+# Keep `in_flight` requests open at all times until `total` requests have been sent
+async def run_level(in_flight, total, pid):
+    latencies = []
+    errors = 0
+    peak_rss = 0.0
+    sent = 0
+    limits = httpx.Limits(max_connections=in_flight, max_keepalive_connections=in_flight)
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal sent, errors
+            while sent < total:
+                sent += 1
+                start = time.perf_counter()
+                try:
+                    resp = await one_request(client)
+                    if resp.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        async def sample_memory():
+            nonlocal peak_rss
+            while True:
+                peak_rss = max(peak_rss, server_rss_mb(pid))
+                await asyncio.sleep(0.2)
+
+        sampler = asyncio.create_task(sample_memory())
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(in_flight)))
+        elapsed = time.perf_counter() - start
+        sampler.cancel()
+
+    latencies.sort()
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "errors": errors,
+        "peak_rss_mb": peak_rss
+    }
+
+
+if __name__ == "__main__":
+    levels = [int(a) for a in sys.argv[1:]] or [50, 200, 500]
+    seed()
+
+    stub = VoiceflowStub(latency=VOICEFLOW_DELAY).start()
+    env = dict(os.environ,
+               MONGODB_URI=BENCH_MONGODB_URI,
+               RESEND_API_KEY=os.environ.get("RESEND_API_KEY", "re_benchmark"),
+               VOICEFLOW_API_KEY="VF.DM.bench",
+               VOICEFLOW_VERSION_ID="bench",
+               VOICEFLOW_BASE_URL=stub.url,
+               VOICEFLOW_POOL_SIZE="500")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(PORT), "--workers", str(WORKERS), "--log-level", "warning"],
+        cwd=APP_DIR, env=env
+    )
+
+    try:
+        time.sleep(3)
+        print(f"{'in flight':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'peak RSS MB':>12}")
+        for in_flight in levels:
+            r = asyncio.run(run_level(in_flight, REQUESTS_PER_LEVEL, server.pid))
+            print(f"{in_flight:>9} {r['throughput']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['p99']:>8.1f} {r['errors']:>7} {r['peak_rss_mb']:>12.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+        stub.stop()
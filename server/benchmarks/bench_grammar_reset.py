@@ -0,0 +1,82 @@
+from pymongo import MongoClient
+import os
+import sys
+import time
+
+# Benchmarks the nightly grammar reset against a local mongod
+# Compares the old per user loop with the set based reset used by /mongo_grammar/grammar_reset
+# Usage: python benchmarks/bench_grammar_reset.py [user counts...]
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from mongo.mongo_grammar import reset_grammar_streaks
+
+
+client = MongoClient(BENCH_MONGODB_URI)
+users_collection = client.bench_web_app.users
+
+
+# Insert n synthetic users, half of them completed grammar for the day
+def seed_users(n):
+    users_collection.drop()
+    users_collection.create_index("user.email")
+    batch = []
+    for i in range(n):
+        batch.append({
+            "user": {"email": f"user{i}@bench.local"},
+            "grammar": {
+                "streak": i % 30,
+                "incorrectly_answered": [],
+                "correctly_answered": [],
+                "days_completed": [],
+                "grammar_completed": "TRUE" if i % 2 else "FALSE"
+            }
+        })
+        if len(batch) == 5000:
+            users_collection.insert_many(batch)
+            batch = []
+    if batch:
+        users_collection.insert_many(batch)
+
+
+# The reset as it was before, one find and one update per user
+def legacy_reset():
+    reset_count = 0
+    for user in list(users_collection.find({})):
+        user_email = user.get("user", {}).get("email")
+        doc = users_collection.find_one({"user.email": user_email})
+        if doc["grammar"]["grammar_completed"] == "FALSE":
+            update = {"$set": {"grammar.streak": 0, "grammar.correctly_answered": [], "grammar.incorrectly_answered": []}}
+        else:
+            update = {"$set": {"grammar.grammar_completed": "FALSE"}}
+        users_collection.update_one({"user.email": user_email}, update)
+        reset_count += 1
+    return reset_count
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+
+    print(f"{'users':>8} {'legacy (s)':>12} {'set based (s)':>14} {'count':>8}")
+    for n in sizes:
+        seed_users(n)
+        legacy_count, legacy_time = timed(legacy_reset)
+
+        seed_users(n)
+        counts, set_time = timed(lambda: reset_grammar_streaks(users_collection))
+
+        # Both paths need to report the same number of users updated
+        assert sum(counts) == legacy_count, f"count mismatch {counts} vs {legacy_count}"
+        print(f"{n:>8} {legacy_time:>12.3f} {set_time:>14.3f} {legacy_count:>8}")
+
+    users_collection.drop()
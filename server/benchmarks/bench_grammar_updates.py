@@ -0,0 +1,144 @@
+from pymongo import MongoClient
+import copy
+import os
+import sys
+import time
+
+# Benchmarks /mongo_grammar/updates against a local mongod
+# Compares the old read, $pull, then $set/$addToSet sequence with the real endpoint, called through the Flask test client
+# Commands are counted with the metrics CommandListener, for the endpoint that's the per request count the app records itself
+# Every answer has to be one command, plus one more when it changes the review queue, and both have to leave the user document the same
+# Usage: python benchmarks/bench_grammar_updates.py [answers...]
+# Only run it against a throwaway mongod, the web_app users collection on it is overwritten
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+os.environ.setdefault("SESSION_TOKEN_SECRET", "bench-session-secret")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from main import app
+from metrics.metrics import REQUEST_MONGO_COMMANDS, MongoCommandListener, request_metrics, start_request
+from mongo.mongo_users import get_users_collection
+
+UPDATES_ROUTE = "/mongo_grammar/updates"
+USER_EMAIL = "user@bench.local"
+
+# The old sequence runs on its own client, with the same listener the app's client has
+legacy_client = MongoClient(BENCH_MONGODB_URI, event_listeners=[MongoCommandListener()])
+legacy_users = legacy_client.web_app.users
+test_client = app.test_client()
+
+USER = {
+    "user": {"email": USER_EMAIL},
+    "grammar": {
+        "intro_completed": "FALSE",
+        "streak": 0,
+        "incorrectly_answered": [],
+        "correctly_answered": [],
+        "days_completed": [],
+        "grammar_completed": "FALSE"
+    }
+}
+
+
+# Request bodies the chatbot sends while working through a day, wrong answers are answered correctly later
+# Each body comes with the number of commands the endpoint should send for it: the answer update,
+# plus the review queue write for a wrong answer and for the right answer that moves it to the next interval
+def answers(n):
+    bodies = []
+    for i in range(n):
+        day = f"day_{i // 30}"
+        if i % 3 == 0:
+            bodies.append(({"user_email": USER_EMAIL, "incorrectly_answered": f"q{i}", "day": day}, 2))
+        elif i % 3 == 1:
+            bodies.append(({"user_email": USER_EMAIL, "correctly_answered": f"q{i - 1}", "day": f"day_{(i - 1) // 30}"}, 2))
+        else:
+            bodies.append(({"user_email": USER_EMAIL, "correctly_answered": f"q{i}", "days_completed": day, "day": day}, 1))
+    return bodies
+
+
+def reset_user():
+    users = get_users_collection()
+    users.drop()
+    users.create_index("user.email")
+    users.insert_one(copy.deepcopy(USER))
+
+
+# The answer update as it was before, read the user, maybe $pull, then $set/$addToSet
+def legacy_update(data):
+    doc = legacy_users.find_one({"user.email": USER_EMAIL})
+    incorrectly_answered = doc.get("grammar", {}).get("incorrectly_answered", [])
+    if data.get("correctly_answered") is not None and data["correctly_answered"] in incorrectly_answered:
+        legacy_users.update_one({"user.email": USER_EMAIL}, {"$pull": {"grammar.incorrectly_answered": data["correctly_answered"]}})
+
+    set_updates = {}
+    if "intro_completed" in data:
+        set_updates["grammar.intro_completed"] = data["intro_completed"]
+    push_updates = {}
+    for key in ("days_completed", "correctly_answered", "incorrectly_answered"):
+        if key in data:
+            push_updates[f"grammar.{key}"] = data[key]
+    legacy_users.find_one_and_update({"user.email": USER_EMAIL}, {"$set": set_updates, "$addToSet": push_updates})
+
+
+# Run the old sequence as if it were a request so the listener counts its commands, returns the count
+def legacy_commands(data):
+    current = start_request()
+    try:
+        legacy_update(data)
+    finally:
+        request_metrics.set(None)
+    return current["mongo_commands"]
+
+
+# Commands the app has recorded for every /updates request so far
+def recorded_route_commands():
+    series = REQUEST_MONGO_COMMANDS.series.get(("POST", UPDATES_ROUTE))
+    return series["sum"] if series else 0
+
+# Send one answer to the endpoint, returns the number of commands the app recorded for the request
+def route_commands(data):
+    before = recorded_route_commands()
+    response = test_client.post(UPDATES_ROUTE, json=data)
+    assert response.status_code == 200 and response.get_json()["success"], f"{UPDATES_ROUTE} failed: {response.get_json()}"
+    return recorded_route_commands() - before
+
+
+# Run every answer through one implementation, returns the time, commands per answer, worst case commands and the final document
+# expect_commands checks every answer sent the number of commands it should
+def run(update, bodies, expect_commands=False):
+    reset_user()
+    most = 0
+    total = 0
+    start = time.perf_counter()
+    for data, expected in bodies:
+        count = update(data)
+        if expect_commands:
+            assert count == expected, f"{data} sent {count} commands instead of {expected}"
+        most = max(most, count)
+        total += count
+    elapsed = time.perf_counter() - start
+
+    # The review queue is only kept by the endpoint, leave it out of the comparison
+    doc = get_users_collection().find_one({}, {"_id": 0})
+    doc["grammar"].pop("review", None)
+    doc["grammar"].pop("review_rev", None)
+    return elapsed, total / len(bodies), most, doc
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [300, 3000]
+
+    print(f"{'answers':>8} {'legacy (s)':>11} {'cmds/answer':>12} {'max':>4} {'endpoint (s)':>13} {'cmds/answer':>12} {'max':>4}")
+    for n in sizes:
+        bodies = answers(n)
+        legacy_time, legacy_avg, legacy_max, legacy_doc = run(legacy_commands, bodies)
+        route_time, route_avg, route_max, route_doc = run(route_commands, bodies, expect_commands=True)
+
+        # Both paths need to leave the user in the same state
+        assert legacy_doc == route_doc, f"document mismatch {legacy_doc} vs {route_doc}"
+        print(f"{n:>8} {legacy_time:>11.3f} {legacy_avg:>12.2f} {legacy_max:>4} {route_time:>13.3f} {route_avg:>12.2f} {route_max:>4}")
+
+    get_users_collection().drop()
@@ -0,0 +1,90 @@
+from pymongo import MongoClient
+import os
+import random
+import statistics
+import sys
+import time
+
+# Benchmarks the streak leaderboard against a local mongod
+# Seeds N users with random streaks, then times the top streaks and rank lookups for users on and off the board
+# and checks with explain that ranks below the board are counted from the grammar_streak index, not a collection scan
+# Usage: python benchmarks/bench_leaderboard.py [users...]
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from mongo.indexes import INDEXES
+from mongo.leaderboard import STREAK_INDEX, invalidate_leaderboard, streak_rank, top_streaks
+
+ROUNDS = 200
+SEED_BATCH = 10000
+
+client = MongoClient(BENCH_MONGODB_URI)
+bench_users = client.bench_leaderboard.users
+
+
+# Fill the users collection with n users, most streaks are short and a few are long
+def seed_users(n):
+    bench_users.drop()
+    rng = random.Random(0)
+    for start in range(0, n, SEED_BATCH):
+        bench_users.insert_many([{
+            "user": {"name": f"User {i}", "email": f"user{i}@bench.test"},
+            "grammar": {"streak": int(rng.expovariate(1 / 5)), "grammar_completed": rng.choice(["TRUE", "FALSE"])}
+        } for i in range(start, min(start + SEED_BATCH, n))], ordered=False)
+    index = next(i for i in INDEXES[("web_app", "users")] if i["name"] == STREAK_INDEX)
+    bench_users.create_index(index["keys"], name=index["name"])
+
+
+# Run fn ROUNDS times, return the median and p95 latency in ms
+def measure(fn):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+# Stages of the plan MongoDB picks for counting the users above a streak
+def count_plan(streak):
+    explain = client.bench_leaderboard.command(
+        "explain",
+        {"count": "users", "query": {"grammar.streak": {"$gt": streak}}, "hint": STREAK_INDEX},
+        verbosity="executionStats"
+    )
+    stages = []
+    plan = explain["queryPlanner"]["winningPlan"]
+    while plan:
+        stages.append(plan["stage"])
+        plan = plan.get("inputStage")
+    return stages, explain["executionStats"]["totalDocsExamined"]
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000, 1000000]
+
+    print(f"{'users':>8} {'lookup':>12} {'p50 ms':>8} {'p95 ms':>8}  plan")
+    for n in sizes:
+        seed_users(n)
+        invalidate_leaderboard()
+        board = top_streaks(bench_users, 10)
+        top, low = board[0]["streak"], 0
+
+        for name, fn in (
+            ("top 10", lambda: top_streaks(bench_users, 10)),
+            ("rank top", lambda: streak_rank(bench_users, top)),
+            ("rank 0", lambda: streak_rank(bench_users, low))
+        ):
+            p50, p95 = measure(fn)
+            plan = ""
+            if name == "rank 0":
+                stages, docs_examined = count_plan(low)
+                plan = f"{' <- '.join(stages)}, {docs_examined} documents examined"
+            print(f"{n:>8} {name:>12} {p50:>8.2f} {p95:>8.2f}  {plan}")
+
+    client.drop_database("bench_leaderboard")
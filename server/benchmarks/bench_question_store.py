@@ -0,0 +1,99 @@
+from pymongo import MongoClient
+import os
+import random
+import statistics
+import sys
+import time
+
+# Benchmarks the two grammar question stores against a local mongod as the number of days grows
+# collections  - one collection per day (the original layout)
+# consolidated - one questions collection indexed on (day, _id) plus a days collection with question counts
+# For each size it times listing the days, picking a random unanswered question and loading every question (the question bank)
+# The consolidated store is filled with the migration so that's timed as well
+# Usage: python benchmarks/bench_question_store.py [days...]
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from mongo.mongo_grammar import QUESTION_PROJECTION, sample_unanswered_question
+from mongo.question_store import (
+    CONSOLIDATED_STORE,
+    day_questions,
+    iter_day_questions,
+    list_question_days,
+    migrate_to_consolidated
+)
+
+STORES = ("collections", CONSOLIDATED_STORE)
+QUESTIONS_PER_DAY = int(os.environ.get("BENCH_QUESTIONS_PER_DAY", 20))
+ROUNDS = 200
+LOAD_ROUNDS = 3
+
+client = MongoClient(BENCH_MONGODB_URI)
+
+
+# Fill a fresh grammar database with n days of questions shaped like the real ones, one collection per day
+def seed_days(database, n):
+    client.drop_database(database.name)
+    for d in range(n):
+        database[f"day_{d}"].insert_many([{
+            "question": f"Which option completes sentence number {i} of day {d} correctly?",
+            "options": {
+                "option_a": "their",
+                "option_b": "there",
+                "option_c": "they're",
+                "option_d": "there's"
+            },
+            "answer": "option_a",
+            "reasoning": "The sentence needs the possessive form. " * 4
+        } for i in range(QUESTIONS_PER_DAY)])
+
+
+# Run fn rounds times, return the median and p95 latency in ms
+def measure(fn, rounds=ROUNDS):
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[max(int(len(timings) * 0.95) - 1, 0)]
+
+
+# Pick a random day and a random question of it the user hasn't answered correctly, like get_random_question does
+def random_question(database, store, days, rng):
+    collection, day_filter = day_questions(database, rng.choice(days), store)
+    return sample_unanswered_question(collection, [], day_filter)
+
+
+# Read every question of every day, like loading the question bank
+def load_all(database, store):
+    return sum(1 for _, questions in iter_day_questions(database, QUESTION_PROJECTION, store) for _ in questions)
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [50, 500, 5000]
+    database = client.bench_question_store
+
+    print(f"{'days':>6} {'store':>12} {'operation':>10} {'p50 ms':>9} {'p95 ms':>9}")
+    for n in sizes:
+        seed_days(database, n)
+        migration = migrate_to_consolidated(database, verbose=False)
+        print(f"{n:>6} {CONSOLIDATED_STORE:>12} {'migrate':>10} {migration['seconds'] * 1000:>9.1f} {'':>9}")
+
+        rng = random.Random(0)
+        for store in STORES:
+            days = list_question_days(database, store)
+            assert len(days) == n, f"{store} listed {len(days)} days instead of {n}"
+            for name, fn, rounds in (
+                ("list_days", lambda: list_question_days(database, store), ROUNDS),
+                ("random", lambda: random_question(database, store, days, rng), ROUNDS),
+                ("load_all", lambda: load_all(database, store), LOAD_ROUNDS)
+            ):
+                p50, p95 = measure(fn, rounds)
+                print(f"{n:>6} {store:>12} {name:>10} {p50:>9.2f} {p95:>9.2f}")
+
+    client.drop_database(database.name)
@@ -0,0 +1,84 @@
+from bson import json_util
+from pymongo import MongoClient
+import os
+import random
+import statistics
+import sys
+import time
+
+# Benchmarks get_random_question against a local mongod
+# Compares loading the whole day into Python with the $match + $sample aggregation
+# Usage: python benchmarks/bench_random_question.py [questions per day...]
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from mongo.mongo_grammar import sample_unanswered_question
+
+ROUNDS = 200
+
+client = MongoClient(BENCH_MONGODB_URI)
+bench_database = client.bench_grammar
+
+
+# Create a grammar day with n questions shaped like the real ones, plus an admin field the client never renders
+def seed_day(n):
+    day = bench_database[f"day_{n}"]
+    day.drop()
+    day.insert_many([{
+        "question": f"Which option completes sentence number {i} correctly?",
+        "options": {
+            "option_a": "their",
+            "option_b": "there",
+            "option_c": "they're",
+            "option_d": "there's"
+        },
+        "answer": "option_a",
+        "reasoning": "The sentence needs the possessive form. " * 4,
+        "source_notes": "Imported from the OSSLT practice booklet. " * 10
+    } for i in range(n)])
+    return day
+
+
+# The old path, every question in the day is copied into Python before one is picked
+def legacy_question(day, correctly_answered):
+    correctly_answered = set(str(x) for x in correctly_answered)
+    grammar_questions = list(day.find())
+    unanswered_questions = [a for a in grammar_questions if str(a["_id"]) not in correctly_answered]
+    return random.choice(unanswered_questions) if unanswered_questions else None
+
+
+# Run fn ROUNDS times, return the median and p95 latency in ms plus the payload size of the last result
+def measure(fn):
+    timings = []
+    question = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        question = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    payload = len(json_util.dumps(question)) if question else 0
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1], payload
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [20, 500, 5000]
+
+    print(f"{'questions':>9} {'path':>10} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>7}")
+    for n in sizes:
+        day = seed_day(n)
+        # A user that has already answered half of the day correctly
+        ids = [str(a["_id"]) for a in day.find({}, {"_id": 1})]
+        correctly_answered = ids[: n // 2]
+
+        for name, fn in (
+            ("legacy", lambda: legacy_question(day, correctly_answered)),
+            ("sample", lambda: sample_unanswered_question(day, correctly_answered))
+        ):
+            p50, p95, payload = measure(fn)
+            print(f"{n:>9} {name:>10} {p50:>8.2f} {p95:>8.2f} {payload:>7}")
+
+    client.drop_database("bench_grammar")
@@ -0,0 +1,77 @@
+from pymongo import MongoClient
+import heapq
+import os
+import random
+import statistics
+import sys
+import time
+
+# Benchmarks the spaced repetition review queue against a local mongod
+# For queues of growing size it times picking the most overdue question (only the root of the heap is read),
+# scanning the whole queue for the earliest due question the way a plain array would need, and rescheduling an answer
+# Usage: python benchmarks/bench_review_queue.py [queue sizes...]
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+# Let the queue grow to the largest size being measured
+os.environ.setdefault("GRAMMAR_REVIEW_QUEUE_MAX", "100000")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from mongo.review_queue import REVIEW_PROJECTION, review_root, schedule_review_answers
+
+ROUNDS = 200
+EMAIL = "review@bench.test"
+
+client = MongoClient(BENCH_MONGODB_URI)
+bench_users = client.bench_review_queue.users
+
+
+# Create one user whose queue holds n questions with random due times, plus the same history in incorrectly_answered
+def seed_user(n):
+    bench_users.drop()
+    rng = random.Random(0)
+    queue = [[rng.randrange(10 ** 9, 2 * 10 ** 9), f"{i:024x}", f"day_{i % 50}", rng.randrange(5)] for i in range(n)]
+    heapq.heapify(queue)
+    bench_users.insert_one({
+        "user": {"email": EMAIL},
+        "grammar": {"review": queue, "review_rev": 0, "incorrectly_answered": [entry[1] for entry in queue]}
+    })
+    bench_users.create_index("user.email", unique=True)
+    return [entry[1] for entry in queue]
+
+
+# The same pick without the heap, the whole queue is read and scanned for the earliest due question
+def scan_queue():
+    doc = bench_users.find_one({"user.email": EMAIL}, REVIEW_PROJECTION)
+    return min(doc["grammar"]["review"])
+
+
+# Run fn ROUNDS times, return the median and p95 latency in ms
+def measure(fn):
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+if __name__ == "__main__":
+    sizes = [int(a) for a in sys.argv[1:]] or [10, 100, 1000, 10000]
+    rng = random.Random(1)
+
+    print(f"{'queue':>7} {'operation':>10} {'p50 ms':>8} {'p95 ms':>8}")
+    for n in sizes:
+        question_ids = seed_user(n)
+        for name, fn in (
+            ("heap root", lambda: review_root(bench_users, EMAIL)),
+            ("scan", scan_queue),
+            ("answer", lambda: schedule_review_answers(bench_users, EMAIL, [(rng.choice(question_ids), False)], "day_0"))
+        ):
+            p50, p95 = measure(fn)
+            print(f"{n:>7} {name:>10} {p50:>8.2f} {p95:>8.2f}")
+
+    client.drop_database("bench_review_queue")
@@ -0,0 +1,72 @@
+from pymongo import MongoClient
+import os
+import statistics
+import sys
+import time
+
+# Microbenchmark of identifying the caller, checking a signed session token against looking the user up by email
+# The lookup needs a local mongod, the token check runs in memory only
+# Usage: python benchmarks/bench_session_token.py [iterations]
+
+# Point the app modules at the benchmark database before importing them
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+os.environ.setdefault("RESEND_API_KEY", "re_benchmark")
+os.environ.setdefault("SESSION_TOKEN_SECRET", "bench-session-secret")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from auth.session_tokens import issue_session_token, session_from_authorization
+from mongo.mongo_users import USER_LOGIN_PROJECTION
+
+
+client = MongoClient(BENCH_MONGODB_URI)
+users_collection = client.bench_web_app.users
+USER_EMAIL = "user@bench.local"
+
+
+# One user with a grammar history the size of a few months of use
+def seed_user():
+    users_collection.drop()
+    users_collection.create_index("user.email", unique=True)
+    users_collection.insert_one({
+        "user": {"name": "Bench", "email": USER_EMAIL, "password": "pw", "OTP": "123456", "verified": True},
+        "grammar": {
+            "intro_completed": "TRUE",
+            "streak": 90,
+            "incorrectly_answered": [f"{i:024x}" for i in range(200)],
+            "correctly_answered": [f"{i:024x}" for i in range(200, 600)],
+            "days_completed": [f"day_{i}" for i in range(90)],
+            "grammar_completed": "FALSE"
+        }
+    })
+
+
+# Median time of one call in microseconds
+def time_per_call(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(samples)
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    seed_user()
+
+    header = f"Bearer {issue_session_token(USER_EMAIL, True)}"
+    assert session_from_authorization(header)["email"] == USER_EMAIL
+
+    results = [
+        ("token check (HMAC, no DB)", time_per_call(lambda: session_from_authorization(header), iterations)),
+        ("find_user, whole document", time_per_call(lambda: users_collection.find_one({"user.email": USER_EMAIL}), iterations)),
+        ("find_user, login projection", time_per_call(lambda: users_collection.find_one({"user.email": USER_EMAIL}, USER_LOGIN_PROJECTION), iterations)),
+    ]
+
+    token_time = results[0][1]
+    print(f"{'identify caller by':<30} {'median us':>10} {'vs token':>9}")
+    for name, us in results:
+        print(f"{name:<30} {us:>10.1f} {us / token_time:>8.0f}x")
+
+    users_collection.drop()
@@ -0,0 +1,455 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from werkzeug.serving import WSGIRequestHandler, make_server
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+# Reproducible load test of the backend, every scenario is driven over HTTP and reported with
+# throughput, p50/p95/p99 request latency and the number of MongoDB commands it sent
+# The app runs in this process against a local mongod (or mongomock with --memory) seeded with synthetic users and grammar days,
+# either the Flask app on the development server or with --asgi asgi:app under uvicorn, the way the Procfile serves it
+# Voiceflow and Resend are replaced by the local stubs so no real API is called
+# Results are saved as JSON so runs can be compared over time
+# Usage: python benchmarks/bench_suite.py [--asgi] [--memory] [--users N] [--days M] [--scenarios signup grammar_session ...] [--compare old.json]
+# Only run it against a throwaway mongod, the web_app and grammar databases on it are overwritten
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.join(BENCHMARKS_DIR, "..", "app")
+RESULTS_DIR = os.path.join(BENCHMARKS_DIR, "results")
+sys.path.insert(0, BENCHMARKS_DIR)
+sys.path.insert(0, APP_DIR)
+
+from voiceflow_stub import VoiceflowStub
+from resend_stub import ResendStub, wait_for
+
+BENCH_MONGODB_URI = os.environ.get("BENCH_MONGODB_URI", "mongodb://localhost:27017")
+BENCH_DOMAIN = "bench.local"
+PASSWORD = "bench-password"
+QUESTIONS_PER_DAY = 50
+QUESTIONS_PER_SESSION = 10
+CORRECT_RATE = 0.7
+CHAT_TURNS = 3
+
+# Settings that change what the server does, saved with the results so runs are only compared like for like
+RECORDED_SETTINGS = ("USER_CACHE", "USER_CACHE_SIZE", "USER_CACHE_TTL", "GRAMMAR_QUESTION_BANK", "MONGODB_MAX_POOL_SIZE", "VOICEFLOW_POOL_SIZE")
+
+
+
+#####################
+# Environment setup #
+#####################
+
+
+# Point the app at the stubs and the benchmark DB before any app module is imported
+def configure_environment(args, voiceflow_stub, resend_stub):
+    os.environ["MONGODB_URI"] = BENCH_MONGODB_URI
+    os.environ["RESEND_API_KEY"] = "re_benchmark"
+    os.environ["RESEND_API_URL"] = resend_stub.url
+    os.environ["VOICEFLOW_API_KEY"] = "VF.DM.bench"
+    os.environ["VOICEFLOW_VERSION_ID"] = "bench"
+    os.environ["VOICEFLOW_BASE_URL"] = voiceflow_stub.url
+    os.environ.setdefault("SESSION_TOKEN_SECRET", "bench-session-secret")
+    # Every signup comes from the same IP, the rate limiter would turn most of them away
+    os.environ["RATE_LIMIT"] = "FALSE"
+
+    if args.memory:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("--memory needs mongomock, install it with: pip install mongomock")
+
+        # Hand the app an in memory client instead of connecting to MONGODB_URI
+        import mongo.mongo_client as mongo_client
+        mongo_client.client_state["client"] = mongomock.MongoClient()
+        mongo_client.client_state["pid"] = os.getpid()
+
+        # The async endpoints get a motor client over the same in memory data
+        if args.asgi:
+            try:
+                import mongomock_motor
+            except ImportError:
+                sys.exit("--memory with --asgi needs mongomock_motor, install it with: pip install mongomock-motor")
+
+            import mongo.async_mongo_client as async_mongo_client
+            async_mongo_client.async_client_state["client"] = mongomock_motor.AsyncMongoMockClient(mock_mongo_client=mongo_client.client_state["client"])
+            async_mongo_client.async_client_state["pid"] = os.getpid()
+
+
+# Seed N users with some grammar history and M grammar days of questions
+def seed(users, days):
+    from mongo.mongo_client import get_database
+    from mongo.indexes import build_indexes
+    from mongo.question_store import is_consolidated, migrate_to_consolidated
+
+    grammar = get_database("grammar")
+    for name in grammar.list_collection_names():
+        grammar[name].drop()
+    for d in range(days):
+        grammar[f"day_{d}"].insert_many([{
+            "question": f"Day {d} question {i}",
+            "options": {"option_a": "a", "option_b": "b", "option_c": "c", "option_d": "d"},
+            "answer": "option_a",
+            "reasoning": "Because."
+        } for i in range(QUESTIONS_PER_DAY)])
+    # With GRAMMAR_QUESTION_STORE=consolidated the server reads the questions from the consolidated store
+    if is_consolidated():
+        migrate_to_consolidated(grammar, verbose=False)
+
+    web_app = get_database("web_app")
+    web_app.users.drop()
+    web_app.pending_users.drop()
+    build_indexes()
+
+    rng = random.Random(0)
+    web_app.users.insert_many([{
+        "user": {"name": f"User {i}", "email": f"user{i}@{BENCH_DOMAIN}", "password": PASSWORD,
+                 "intro_completed": "TRUE", "OTP": "000000", "verified": True},
+        "grammar": {
+            "intro_completed": "TRUE",
+            "streak": rng.randrange(30),
+            "incorrectly_answered": [],
+            "correctly_answered": [],
+            "days_completed": [f"day_{d}" for d in rng.sample(range(days), rng.randrange(days // 2 + 1))],
+            "grammar_completed": rng.choice(["TRUE", "FALSE"])
+        }
+    } for i in range(users)])
+
+
+# Request handler without the access log line per request
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+# Serve the Flask app on a free local port with a thread per request, like the development server
+# Returns a function that stops the server and the server's URL
+def start_flask_server():
+    from main import app
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.shutdown, f"http://127.0.0.1:{server.server_port}"
+
+
+# Serve asgi:app with uvicorn on a free local port, one worker running in a thread of this process so its commands are counted
+def start_asgi_server():
+    import uvicorn
+    from asgi import app
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    if not wait_for(lambda: server.started, timeout=30):
+        sys.exit("uvicorn didn't start")
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+        sock.close()
+    return stop, f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+# Total MongoDB commands sent by this process, by command name, from the /metrics command listener
+# mongomock doesn't publish command events, so there are no counts with --memory
+def mongo_command_counts():
+    from metrics.metrics import MONGO_COMMANDS, metrics_lock
+    counts = {}
+    with metrics_lock:
+        for (command, outcome), value in MONGO_COMMANDS.values.items():
+            counts[command] = counts.get(command, 0) + value
+    return counts
+
+
+
+#####################
+# Scenarios Below   #
+#####################
+
+
+# HTTP client for one scenario run, every request is timed per endpoint
+class BenchClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = 0
+
+    def session(self):
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def call(self, method, path, body=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        start = time.perf_counter()
+        resp = self.session().request(method, self.base_url + path, json=body, headers=headers, timeout=60)
+        ms = (time.perf_counter() - start) * 1000
+        with self.lock:
+            self.latencies.setdefault(path, []).append(ms)
+            if resp.status_code >= 400:
+                self.errors += 1
+        return resp.json() if resp.headers.get("Content-Type", "").startswith("application/json") else {}
+
+
+# New account: signup, read the OTP from the email sent through the Resend stub, verify it, then log in
+def signup_scenario(client, context, i):
+    email = f"signup{context['run']}-{i}@{BENCH_DOMAIN}"
+    client.call("POST", "/mongo_user/signup", {"user_email": email})
+
+    otp = None
+    def otp_sent():
+        nonlocal otp
+        otp = context["resend"].latest_otp(email)
+        return otp is not None
+    if not wait_for(otp_sent):
+        raise RuntimeError(f"No OTP email was sent to {email}")
+
+    client.call("POST", "/mongo_user/verification", {"user_email": email, "input_otp": otp, "user_name": f"Signup {i}", "user_password": PASSWORD})
+    client.call("POST", "/mongo_user/authentication", {"user_email": email, "user_password": PASSWORD})
+
+
+# A full grammar day the way the chatbot flow runs it: pick a day, answer questions one update at a time, then finish the day
+def grammar_session_scenario(client, context, i):
+    email = f"user{i % context['users']}@{BENCH_DOMAIN}"
+    rng = random.Random(i)
+    day = client.call("POST", "/mongo_grammar/get_uncompleted_grammar_day", {"user_email": email}).get("day")
+    if not day:
+        # Every day was completed, the endpoint has reset the user's days for the next session
+        return
+
+    for _ in range(QUESTIONS_PER_SESSION):
+        question = client.call("POST", "/mongo_grammar/get_random_question", {"user_email": email, "chosen_day": day}).get("question")
+        if not question:
+            break
+        key = "correctly_answered" if rng.random() < CORRECT_RATE else "incorrectly_answered"
+        client.call("POST", "/mongo_grammar/updates", {"user_email": email, key: question["_id"]})
+
+    client.call("POST", "/mongo_grammar/updates", {"user_email": email, "days_completed": day})
+    client.call("POST", "/mongo_grammar/grammar_success", {"user_email": email})
+
+
+# Log in and chat: launch the flow and send a few text turns to the Voiceflow stub
+def chat_scenario(client, context, i):
+    email = f"user{i % context['users']}@{BENCH_DOMAIN}"
+    token = client.call("POST", "/mongo_user/authentication", {"user_email": email, "user_password": PASSWORD}).get("token")
+    client.call("POST", "/voiceflow/interact", {"launch": True}, token)
+    for turn in range(CHAT_TURNS):
+        client.call("POST", "/voiceflow/interact", {"message": f"message {turn}"}, token)
+
+
+# The nightly reset the cron job triggers, over every seeded user
+def grammar_reset_scenario(client, context, i):
+    client.call("POST", "/mongo_grammar/grammar_reset")
+
+
+# name -> (scenario, default iterations, default concurrency)
+SCENARIOS = {
+    "signup": (signup_scenario, 100, 8),
+    "grammar_session": (grammar_session_scenario, 200, 16),
+    "chat": (chat_scenario, 200, 16),
+    "grammar_reset": (grammar_reset_scenario, 5, 1)
+}
+
+
+
+#####################
+# Reporting Below   #
+#####################
+
+
+# Nearest rank percentile of a sorted list
+def percentile(values, p):
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, int(round(p / 100 * len(values))) - 1))]
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    return {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": statistics.fmean(latencies) if latencies else None
+    }
+
+
+# Run one scenario with a fixed number of iterations spread over `concurrency` threads
+def run_scenario(name, base_url, context, iterations, concurrency, count_commands):
+    scenario = SCENARIOS[name][0]
+    client = BenchClient(base_url)
+    iteration_ms = []
+    failures = []
+
+    def one(i):
+        start = time.perf_counter()
+        try:
+            scenario(client, context, i)
+        except Exception as e:
+            failures.append(str(e))
+        iteration_ms.append((time.perf_counter() - start) * 1000)
+
+    commands_before = mongo_command_counts() if count_commands else None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(iterations)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "iterations": iterations,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "iterations_per_s": iterations / elapsed,
+        "requests_per_s": sum(len(v) for v in client.latencies.values()) / elapsed,
+        "errors": client.errors + len(failures),
+        "iteration": summarize(iteration_ms),
+        "requests": summarize([ms for v in client.latencies.values() for ms in v]),
+        "endpoints": {path: summarize(v) for path, v in sorted(client.latencies.items())},
+        "db_commands_per_iteration": None,
+        "db_commands": None
+    }
+    if failures:
+        result["failures"] = failures[:5]
+
+    if count_commands:
+        after = mongo_command_counts()
+        delta = {c: after[c] - commands_before.get(c, 0) for c in after if after[c] - commands_before.get(c, 0)}
+        result["db_commands"] = delta
+        result["db_commands_per_iteration"] = sum(delta.values()) / iterations
+    return result
+
+
+def format_number(value, width):
+    return f"{value:>{width}.1f}" if value is not None else f"{'n/a':>{width}}"
+
+def print_results(results):
+    print(f"{'scenario':<16} {'iter/s':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'DB cmds/iter':>13} {'errors':>7}")
+    for name, r in results.items():
+        req = r["requests"]
+        print(f"{name:<16} {r['iterations_per_s']:>8.1f} {r['requests_per_s']:>8.1f} {format_number(req['p50_ms'], 8)} "
+              f"{format_number(req['p95_ms'], 8)} {format_number(req['p99_ms'], 8)} "
+              f"{format_number(r['db_commands_per_iteration'], 13)} {r['errors']:>7}")
+
+
+# Print the change of the main numbers against an earlier results file
+def print_comparison(results, previous_path):
+    with open(previous_path) as f:
+        previous = json.load(f)
+    if any(previous["config"].get(key) != results["config"][key] for key in ("server", "backend", "settings")):
+        print("Note: the earlier run used a different server, backend or settings")
+
+    print(f"\nCompared with {previous_path} ({previous['config'].get('git_commit')})")
+    print(f"{'scenario':<16} {'req/s':>9} {'p95 ms':>9} {'p99 ms':>9} {'DB cmds/iter':>13}")
+    def change(new, old):
+        if new is None or old is None or old == 0:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.0f}%"
+    for name, r in results["scenarios"].items():
+        old = previous["scenarios"].get(name)
+        if old is None:
+            continue
+        print(f"{name:<16} {change(r['requests_per_s'], old['requests_per_s']):>9} "
+              f"{change(r['requests']['p95_ms'], old['requests']['p95_ms']):>9} "
+              f"{change(r['requests']['p99_ms'], old['requests']['p99_ms']):>9} "
+              f"{change(r['db_commands_per_iteration'], old['db_commands_per_iteration']):>13}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCHMARKS_DIR).stdout.strip() or None
+    except OSError:
+        return None
+
+
+# The Resend stub with a lookup of the last OTP sent to an address
+class OTPResendStub(ResendStub):
+    def latest_otp(self, email):
+        with self.lock:
+            for sent in reversed(self.emails):
+                if email in sent.get("to", []):
+                    match = re.search(r"<div>(\d{6})</div>", sent.get("html", ""))
+                    return match.group(1) if match else None
+        return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the backend with synthetic users and stubbed external APIs")
+    parser.add_argument("--asgi", action="store_true", help="serve asgi:app with uvicorn like the Procfile instead of the Flask app on the development server")
+    parser.add_argument("--memory", action="store_true", help="use mongomock instead of a local mongod (no DB command counts)")
+    parser.add_argument("--users", type=int, default=1000, help="synthetic users to seed")
+    parser.add_argument("--days", type=int, default=20, help="grammar days to seed")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--iterations", type=int, help="iterations of every scenario instead of its default")
+    parser.add_argument("--concurrency", type=int, help="threads per scenario instead of its default")
+    parser.add_argument("--voiceflow-latency", type=float, default=0.05, help="seconds the Voiceflow stub waits per call")
+    parser.add_argument("--resend-latency", type=float, default=0.05, help="seconds the Resend stub waits per call")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the scenarios")
+    parser.add_argument("--output", help="results file, defaults to benchmarks/results/bench_suite-<time>.json")
+    parser.add_argument("--compare", help="earlier results file to compare with")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    voiceflow_stub = VoiceflowStub(latency=args.voiceflow_latency).start()
+    resend_stub = OTPResendStub(latency=args.resend_latency).start()
+    configure_environment(args, voiceflow_stub, resend_stub)
+
+    stop_server, base_url = start_asgi_server() if args.asgi else start_flask_server()
+    print(f"Seeding {args.users} users and {args.days} grammar days ({'mongomock' if args.memory else BENCH_MONGODB_URI})")
+    seed(args.users, args.days)
+
+    run_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    context = {"users": args.users, "run": run_id, "resend": resend_stub}
+    scenario_results = {}
+    try:
+        for name in args.scenarios:
+            _, iterations, concurrency = SCENARIOS[name]
+            scenario_results[name] = run_scenario(name, base_url, context, args.iterations or iterations,
+                                                  args.concurrency or concurrency, count_commands=not args.memory)
+    finally:
+        stop_server()
+        voiceflow_stub.stop()
+        resend_stub.stop()
+
+    results = {
+        "config": {
+            "run": run_id,
+            "git_commit": git_commit(),
+            "server": "uvicorn asgi:app" if args.asgi else "flask main:app",
+            "backend": "mongomock" if args.memory else "mongod",
+            "users": args.users,
+            "days": args.days,
+            "questions_per_day": QUESTIONS_PER_DAY,
+            "questions_per_session": QUESTIONS_PER_SESSION,
+            "chat_turns": CHAT_TURNS,
+            "voiceflow_latency_s": args.voiceflow_latency,
+            "resend_latency_s": args.resend_latency,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "settings": {name: os.environ.get(name) for name in RECORDED_SETTINGS}
+        },
+        "scenarios": scenario_results
+    }
+
+    print()
+    print_results(scenario_results)
+    if args.compare:
+        print_comparison(results, args.compare)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench_suite-{run_id}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {output}")
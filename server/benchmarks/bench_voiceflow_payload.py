@@ -0,0 +1,66 @@
+import json
+import os
+import sys
+
+# Measures the bytes per chat turn sent back by /voiceflow/interact before and after trimming the raw traces
+# Usage:
+#   python benchmarks/bench_voiceflow_payload.py                 (stub traces, offline)
+#   python benchmarks/bench_voiceflow_payload.py --live [turns]  (walks the published ChatbotFlow.vf with the
+#                                                                 VOICEFLOW_API_KEY / VOICEFLOW_VERSION_ID in .env)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from voiceflow.voiceflow import parse_traces
+from voiceflow.voiceflow_client import voiceflow_client
+from voiceflow_stub import stub_traces
+
+
+# Size of the JSON body the endpoint returns for a set of traces, the old shape and the new one
+def response_sizes(traces):
+    messages, buttons = parse_traces(traces)
+    before = len(json.dumps({"success": True, "messages": messages, "raw": traces}))
+    after = len(json.dumps({"success": True, "messages": messages, "buttons": buttons}))
+    return before, after
+
+
+# Launch the flow and keep picking the first button (or saying "next") to walk a real conversation
+def live_conversation(turns):
+    user_id = "payload-benchmark@local"
+    voiceflow_client.reset(user_id)
+
+    traces = voiceflow_client.interact(user_id, {"request": {"type": "launch"}}).json()
+    yield "launch", traces
+    for i in range(turns):
+        _, buttons = parse_traces(traces)
+        text = buttons[0]["value"] if buttons else "next"
+        traces = voiceflow_client.interact(user_id, {"request": {"type": "text", "payload": text}}).json()
+        yield text, traces
+
+    voiceflow_client.reset(user_id)
+
+
+# Offline conversation made of the stub traces
+def stub_conversation(turns):
+    yield "launch", stub_traces("launch")
+    for i in range(turns):
+        yield f"turn {i}", stub_traces("text", f"turn {i}")
+
+
+if __name__ == "__main__":
+    live = "--live" in sys.argv
+    numbers = [int(a) for a in sys.argv[1:] if a.isdigit()]
+    turns = numbers[0] if numbers else 10
+
+    conversation = live_conversation(turns) if live else stub_conversation(turns)
+    total_before = total_after = count = 0
+
+    print(f"{'turn':<30} {'before':>8} {'after':>8}")
+    for label, traces in conversation:
+        before, after = response_sizes(traces)
+        total_before += before
+        total_after += after
+        count += 1
+        print(f"{label[:30]:<30} {before:>8} {after:>8}")
+
+    print(f"{'average bytes per turn':<30} {total_before / count:>8.0f} {total_after / count:>8.0f}")
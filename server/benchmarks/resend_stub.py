@@ -0,0 +1,126 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+
+# Local stand in for the Resend API so the email queue can be checked offline
+# Records every single and batch send, and can be told to fail the next N requests
+# Usage: python benchmarks/resend_stub.py  (runs the batching and retry checks)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+
+class ResendStub:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.lock = threading.Lock()
+        self.single_sends = 0
+        self.batch_sends = 0
+        self.emails = []
+        self.fail_next = 0
+        self.latency = latency
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"null")
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                with stub.lock:
+                    fail = stub.fail_next > 0
+                    if fail:
+                        stub.fail_next -= 1
+                if fail:
+                    # Same error shape as the real API so the resend package raises
+                    self.send_json(500, {"statusCode": 500, "name": "application_error", "message": "injected failure"})
+                    return
+
+                with stub.lock:
+                    if self.path == "/emails/batch":
+                        stub.batch_sends += 1
+                        stub.emails.extend(body)
+                        response = {"data": [{"id": f"stub-{len(stub.emails) - i}"} for i in range(len(body))]}
+                    elif self.path == "/emails":
+                        stub.single_sends += 1
+                        stub.emails.append(body)
+                        response = {"id": f"stub-{len(stub.emails)}"}
+                    else:
+                        self.send_json(404, {"statusCode": 404, "name": "not_found", "message": "not found"})
+                        return
+                self.send_json(200, response)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# Wait for every queued email to be sent or given up on
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+if __name__ == "__main__":
+    stub = ResendStub(latency=0.05).start()
+    os.environ["RESEND_API_URL"] = stub.url
+    os.environ.setdefault("RESEND_API_KEY", "re_stub")
+    os.environ["EMAIL_RETRY_BACKOFF"] = "0.05"
+
+    from auth.auth import queue_OTP_email
+    from auth.email_queue import get_email_queue_stats
+
+    # A burst of signups should go out in a few batch calls instead of one call per email
+    start = time.perf_counter()
+    for i in range(40):
+        queue_OTP_email(f"user{i}@stub.local", "123456")
+    enqueue_ms = (time.perf_counter() - start) * 1000
+    assert wait_for(lambda: get_email_queue_stats()["sent"] == 40)
+    print(f"40 OTP emails queued in {enqueue_ms:.1f}ms, sent with {stub.batch_sends} batch and {stub.single_sends} single call(s)")
+    assert stub.batch_sends + stub.single_sends < 40
+
+    # Failed sends are retried with backoff until they go through
+    stub.fail_next = 2
+    queue_OTP_email("retry@stub.local", "654321")
+    assert wait_for(lambda: get_email_queue_stats()["sent"] == 41)
+    stats = get_email_queue_stats()
+    print(f"Email that failed twice was sent after {stats['retries']} retries")
+    assert stats["retries"] == 2 and stats["failed"] == 0
+
+    # An email that keeps failing is given up on after the maximum number of attempts
+    stub.fail_next = 100
+    queue_OTP_email("broken@stub.local", "000000")
+    assert wait_for(lambda: get_email_queue_stats()["failed"] == 1)
+    stub.fail_next = 0
+
+    print(get_email_queue_stats())
+    stub.stop()
+    print("Email queue checks passed")
@@ -0,0 +1,185 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import sys
+import threading
+import time
+
+# Local stand in for the Voiceflow runtime API so the Voiceflow client can be checked offline
+# Counts TCP connections and requests, and can be told to fail the next N requests with a status code
+# Usage: python benchmarks/voiceflow_stub.py  (runs the connection reuse and retry checks)
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+
+# Traces shaped like the ones the real chatbot flow returns
+def stub_traces(request_type, message=None):
+    if request_type == "launch":
+        return [
+            {"type": "speak", "payload": {"message": "Hi! I'm your OSSLT study buddy."}},
+            {"type": "choice", "payload": {"buttons": [
+                {"name": "Grammar", "request": {"type": "path-grammar", "payload": {"label": "Grammar"}}},
+                {"name": "Reading", "request": {"type": "path-reading", "payload": {"label": "Reading"}}}
+            ]}},
+            {"type": "path", "payload": {"path": "choice:grammar"}},
+            {"type": "debug", "payload": {"type": "flow", "message": "entered flow"}}
+        ]
+    return [
+        {"type": "text", "payload": {"message": f"You said: {message}"}},
+        {"type": "debug", "payload": {"type": "flow", "message": "handled text"}},
+        {"type": "end"}
+    ]
+
+
+class VoiceflowStub:
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.fail_next = 0
+        self.fail_status = 503
+        self.latency = latency
+        self.streaming = True
+        self.stream_delay = 0.05
+        self.states = {}
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.1 so connections are kept alive between requests
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub.lock:
+                    stub.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.end_headers()
+                self.wfile.write(data)
+
+            def read_body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            # Count the request and decide if it should fail, returns True when the request was answered with an error
+            def injected_failure(self):
+                with stub.lock:
+                    stub.requests += 1
+                    fail = stub.fail_next > 0
+                    if fail:
+                        stub.fail_next -= 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if fail:
+                    self.send_json(stub.fail_status, {"error": "injected failure"})
+                return fail
+
+            def do_POST(self):
+                body = self.read_body()
+                if self.injected_failure():
+                    return
+                parts = self.path.split("?")[0].strip("/").split("/")
+                request = body.get("request", {})
+                if parts[-1] == "stream" and stub.streaming:
+                    self.send_stream(stub_traces(body.get("action", {}).get("type"), body.get("action", {}).get("payload")))
+                elif parts[-1] == "interact" and len(parts) >= 5:
+                    user_id = parts[3]
+                    with stub.lock:
+                        stub.states[user_id] = {"stack": [], "variables": {"turns": stub.requests}}
+                    self.send_json(200, stub_traces(request.get("type"), request.get("payload")))
+                else:
+                    self.send_json(404, {"error": "not found"})
+
+            # Streaming interact API, one trace event per trace with a pause between them
+            def send_stream(self, traces):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for t in traces:
+                    self.wfile.write(f"event: trace\nid: 1\ndata: {json.dumps(t)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(stub.stream_delay)
+                self.wfile.write(b"event: end\nid: 2\ndata: {}\n\n")
+                self.close_connection = True
+
+            def do_GET(self):
+                if self.injected_failure():
+                    return
+                user_id = self.path.strip("/").split("/")[3]
+                with stub.lock:
+                    state = stub.states.get(user_id)
+                self.send_json(200 if state else 404, state or {"error": "no state"})
+
+            def do_PUT(self):
+                body = self.read_body()
+                if self.injected_failure():
+                    return
+                user_id = self.path.strip("/").split("/")[3]
+                with stub.lock:
+                    stub.states[user_id] = body
+                self.send_json(200, body)
+
+            def do_DELETE(self):
+                if self.injected_failure():
+                    return
+                user_id = self.path.strip("/").split("/")[3]
+                with stub.lock:
+                    stub.states.pop(user_id, None)
+                self.send_json(200, {})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == "__main__":
+    from voiceflow.voiceflow_client import VoiceflowClient
+
+    stub = VoiceflowStub().start()
+    client = VoiceflowClient("VF.DM.stub", "stub-version", base_url=stub.url, retry_backoff=0.01)
+
+    # Connection reuse, every turn should go over the same keep-alive connection
+    for i in range(20):
+        resp = client.interact("user@stub.local", {"request": {"type": "text", "payload": f"hello {i}"}})
+        assert resp.status_code == 200, resp.status_code
+    print(f"20 turns used {stub.connections} connection(s)")
+    assert stub.connections == 1
+
+    # Retry, the first two attempts fail and the third one succeeds
+    for status in (503, 429):
+        before = stub.requests
+        stub.fail_next, stub.fail_status = 2, status
+        resp = client.interact("user@stub.local", {"request": {"type": "launch"}})
+        print(f"{status} twice then success: final status {resp.status_code} after {stub.requests - before} attempts")
+        assert resp.status_code == 200 and stub.requests - before == 3
+
+    # Bounded retry, a request that keeps failing gives up after max_retries + 1 attempts
+    before = stub.requests
+    stub.fail_next, stub.fail_status = 100, 502
+    resp = client.reset("user@stub.local")
+    print(f"502 every time: final status {resp.status_code} after {stub.requests - before} attempts")
+    assert resp.status_code == 502 and stub.requests - before == client.session.get_adapter(stub.url).max_retries.total + 1
+    stub.fail_next = 0
+
+    client.close()
+    stub.stop()
+    print("Voiceflow client checks passed")